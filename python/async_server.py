@@ -0,0 +1,716 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from catalog import SQLITE_PROBE_QUERY
+from db_pool import mysql_connector, pool_from_env
+from facets import FilterError
+from http_cache import cache_from_env, dump_json
+from image_proxy import image_response, image_store_from_env
+from log_pipeline import REQUEST_ID_HEADER, begin_request, configure_logging, current_request_id, end_request
+from metrics import CONTENT_TYPE, IN_FLIGHT, REGISTRY, catalog_collector, observe_request, stage, stats_collector
+from orders import build_order_record, order_store_from_env
+from popularity import parse_events, popularity_from_env, record_events, record_order
+from recommend_cache import recommend_cache_from_env
+from reviews import build_review_record, review_log_from_env, sentiment_store_from_env
+from service import (STORE_MENU_PAGE_QUERY, STORE_MENU_QUERY, STORES_LIST_QUERY, STORES_PAGE_QUERY, catalog_from_env,
+                     filter_dishes, keyset_query, nearby_store_records, parse_filter_request, parse_recommend_request,
+                     recommend_dishes_batch, cached_recommendation, search_batches, search_page, search_records)
+from streaming import (MAX_PAGE_LIMIT, STREAM_BATCH_SIZE, BatchEncoder, clamp_limit, split_page, stream_format,
+                       stream_mimetype)
+
+# asyncio 기반 서버 (flask_server.py 와 같은 엔드포인트 / JSON 형식)
+#   DB 조회는 이벤트 루프에서 비동기로, 점수 계산 같은 CPU 작업은 스레드 풀에서 실행
+#   DB_BACKEND=mysql (기본, aiomysql) | sqlite (aiosqlite, SQLITE_PATH)
+
+# 환경 변수 로드
+load_dotenv()
+
+# 로깅 설정 (큐 기반 백그라운드 기록, JSON 라인, 요청 ID / DEBUG 샘플링은 log_pipeline 참고)
+configure_logging()
+logger = logging.getLogger()
+
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'bapsim.db')
+
+
+def _dumps(data):
+    return dump_json(data).decode('utf-8')
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=_dumps)
+
+
+# MariaDB 비동기 연결 풀
+class MySQLBackend:
+    def __init__(self):
+        self._pool = None
+
+    async def start(self):
+        import aiomysql
+        self._pool = await aiomysql.create_pool(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', '1111'),
+            db=os.getenv('DB_NAME', 'bapsim'),
+            minsize=int(os.getenv('DB_POOL_MIN', '1')),
+            maxsize=int(os.getenv('DB_POOL_MAX', '10')),
+            pool_recycle=int(float(os.getenv('DB_POOL_MAX_LIFETIME', '3600'))),
+            autocommit=True,
+        )
+
+    async def fetch_all(self, query, params=()):
+        import aiomysql
+        async with self._pool.acquire() as connection:
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                return list(await cursor.fetchall())
+
+    # 서버 측 커서로 batch_size 행씩 조회 (중간에 멈추면 남은 행을 읽지 않고 연결을 닫음)
+    async def stream(self, query, params=(), batch_size=STREAM_BATCH_SIZE):
+        import aiomysql
+        async with self._pool.acquire() as connection:
+            finished = False
+            try:
+                cursor = await connection.cursor(aiomysql.SSDictCursor)
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+                await cursor.close()
+                finished = True
+            finally:
+                if not finished:
+                    connection.close()
+
+    def stats(self):
+        return {'size': self._pool.size, 'idle': self._pool.freesize,
+                'in_use': self._pool.size - self._pool.freesize, 'max_size': self._pool.maxsize}
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+
+    # 카탈로그 로드용 동기 연결 (스레드 풀에서 사용)
+    def sync_connect(self):
+        return pool_from_env(mysql_connector()).acquire
+
+
+# 로컬 개발 / 부하 테스트용 SQLite 대체 DB (연결 여러 개를 큐로 돌려 씀)
+class SQLiteBackend:
+    def __init__(self, path, size=4):
+        self._path = path
+        self._size = size
+        self._connections = []
+        self._idle = None
+
+    async def start(self):
+        import aiosqlite
+        self._idle = asyncio.Queue()
+        for _ in range(self._size):
+            connection = await aiosqlite.connect(self._path)
+            connection.row_factory = sqlite3.Row
+            self._connections.append(connection)
+            self._idle.put_nowait(connection)
+
+    async def fetch_all(self, query, params=()):
+        connection = await self._idle.get()
+        try:
+            async with connection.execute(query.replace('%s', '?'), params) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def stream(self, query, params=(), batch_size=STREAM_BATCH_SIZE):
+        connection = await self._idle.get()
+        try:
+            async with connection.execute(query.replace('%s', '?'), params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [dict(row) for row in rows]
+        finally:
+            self._idle.put_nowait(connection)
+
+    def stats(self):
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {'size': len(self._connections), 'idle': idle,
+                'in_use': len(self._connections) - idle, 'max_size': self._size}
+
+    async def close(self):
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
+
+    def sync_connect(self):
+        return lambda: sqlite3.connect(self._path, check_same_thread=False)
+
+
+def create_backend():
+    if DB_BACKEND == 'sqlite':
+        return SQLiteBackend(SQLITE_PATH, size=int(os.getenv('DB_POOL_MAX', '4')))
+    return MySQLBackend()
+
+
+# CPU 작업(점수 계산, 카탈로그 로드)을 이벤트 루프 밖에서 실행 (요청 ID 가 로그에 남도록 컨텍스트 복사)
+async def run_blocking(request, func, *args):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(request.app['executor'], functools.partial(context.run, func, *args))
+
+
+async def get_snapshot(request):
+    return await run_blocking(request, request.app['catalog'].get)
+
+
+def _query_int(request, name, default=None):
+    try:
+        return int(request.query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _query_float(request, name, default=None):
+    try:
+        return float(request.query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+# flask_cors 의 CORS(app) 와 같이 모든 출처 허용 (preflight 포함)
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = request.headers['Access-Control-Request-Method']
+        if 'Access-Control-Request-Headers' in request.headers:
+            response.headers['Access-Control-Allow-Headers'] = request.headers['Access-Control-Request-Headers']
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+# 요청 ID (X-Request-ID 헤더가 있으면 이어서 사용) 를 로그 레코드와 응답 헤더에 포함
+@web.middleware
+async def request_id_middleware(request, handler):
+    request_id, tokens = begin_request(request.headers.get(REQUEST_ID_HEADER))
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        e.headers[REQUEST_ID_HEADER] = request_id
+        raise
+    finally:
+        end_request(tokens)
+    if not response.prepared:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+# 요청 수 / 상태 코드 / 지연 시간 기록 (라우트 템플릿 단위, 스트리밍 응답은 전송 완료까지)
+@web.middleware
+async def metrics_middleware(request, handler):
+    started = time.perf_counter()
+    IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        IN_FLIGHT.dec()
+        resource = request.match_info.route.resource
+        endpoint = resource.canonical if resource is not None else 'unmatched'
+        observe_request(endpoint, request.method, status, time.perf_counter() - started)
+
+
+routes = web.RouteTableDef()
+
+
+# 카탈로그 상태 조회 (버전, 로드 시각, 행 수)
+@routes.get('/admin/catalog')
+async def catalog_status(request):
+    try:
+        snapshot = await get_snapshot(request)
+        return json_response(snapshot.summary())
+    except Exception as e:
+        logger.error(f"Error loading catalog: {e}")
+        return json_response({"error": "Failed to load catalog"}, status=500)
+
+
+def is_admin_request(request):
+    admin_token = os.getenv('ADMIN_TOKEN')
+    return not admin_token or request.headers.get('X-Admin-Token') == admin_token
+
+
+# 카탈로그 강제 재로드 (DB 조회와 인덱스 생성은 스레드 풀에서 실행)
+@routes.post('/admin/catalog/reload')
+async def reload_catalog(request):
+    if not is_admin_request(request):
+        return json_response({"error": "Forbidden"}, status=403)
+    try:
+        snapshot = await run_blocking(request, request.app['catalog'].reload, True)
+        return json_response(snapshot.summary())
+    except Exception as e:
+        logger.error(f"Error reloading catalog: {e}")
+        return json_response({"error": "Failed to reload catalog"}, status=500)
+
+
+# 연결 풀 상태 조회
+@routes.get('/admin/db_pool')
+async def db_pool_status(request):
+    return json_response(request.app['backend'].stats())
+
+
+def image_base_url(request):
+    return os.getenv('IMAGE_PROXY_BASE_URL') or str(request.url.origin())
+
+
+# 응답 행의 image_url 을 /img 프록시 URL 로 바꾸는 함수 (IMAGE_PROXY_ENABLED=0 이면 그대로)
+def image_rewriter(request, snapshot):
+    if request.app['image_store'] is None:
+        return lambda rows: rows
+    images = snapshot.extras['images']
+    base_url = image_base_url(request)
+    return lambda rows: images.rewrite(rows, base_url)
+
+
+# 카탈로그 버전별 응답 캐시 조회, 없으면 DB 에서 읽어 채움
+async def cached_response(request, key, query, params=(), rewrite=None):
+    cache = request.app['response_cache']
+    snapshot = await get_snapshot(request)
+    payload = cache.lookup(snapshot, key)
+    if payload is None:
+        with stage(f'sql.{key[0]}'):
+            rows = await request.app['backend'].fetch_all(query, params)
+        payload = cache.put(snapshot, key, rewrite(rows) if rewrite else rows)
+    status, body, headers = cache.respond(
+        payload,
+        if_none_match=request.headers.get('If-None-Match'),
+        if_modified_since=request.headers.get('If-Modified-Since'),
+        accept_encoding=request.headers.get('Accept-Encoding'),
+    )
+    return web.Response(body=body, status=status, headers=headers)
+
+
+# 키셋 페이지 응답 (다음 페이지가 있으면 X-Next-After-Id, Link 헤더 추가)
+def page_response(request, rows, next_after_id):
+    response = json_response(rows)
+    if next_after_id is not None:
+        url = request.url.update_query(after_id=int(next_after_id))
+        response.headers['X-Next-After-Id'] = str(int(next_after_id))
+        response.headers['Link'] = f'<{url}>; rel="next"'
+    return response
+
+
+# 키셋 페이지 조회 (다음 페이지 확인용으로 limit + 1 행 조회)
+async def fetch_page(request, query, params, after_id, limit, key, rewrite=None):
+    limit = clamp_limit(limit or MAX_PAGE_LIMIT)
+    query, params = keyset_query(query, params, after_id, limit + 1)
+    with stage('sql.page'):
+        rows = await request.app['backend'].fetch_all(query, params)
+    rows, next_after_id = split_page(rows, limit, key)
+    return page_response(request, rewrite(rows) if rewrite else rows, next_after_id)
+
+
+# 배치가 나오는 대로 내보내는 스트리밍 응답
+async def stream_response(request, batches, fmt, rewrite=None):
+    response = web.StreamResponse(headers={'Content-Type': stream_mimetype(fmt),
+                                           REQUEST_ID_HEADER: current_request_id() or ''})
+    await response.prepare(request)
+    encoder = BatchEncoder(fmt)
+    await response.write(encoder.start())
+    try:
+        async for batch in batches:
+            chunk = encoder.encode(rewrite(batch) if rewrite else batch)
+            if chunk:
+                await response.write(chunk)
+    except Exception as e:
+        # 헤더를 이미 보냈으므로 로그만 남기고 응답을 끊음
+        logger.error(f"Error streaming query results: {e}")
+        return response
+    await response.write(encoder.end())
+    await response.write_eof()
+    return response
+
+
+async def _iterate(batches):
+    for batch in batches:
+        yield batch
+
+
+def is_paged_request(request):
+    return 'after_id' in request.query or 'limit' in request.query
+
+
+def request_stream_format(request):
+    return stream_format(request.query.get('stream'), request.headers.get('Accept'))
+
+
+# 추천 캐시 상태 조회
+@routes.get('/admin/recommend_cache')
+async def recommend_cache_status(request):
+    cache = request.app['recommend_cache']
+    return json_response(cache.stats() if cache is not None else {"enabled": False})
+
+
+# 응답 캐시 상태 조회
+@routes.get('/admin/http_cache')
+async def http_cache_status(request):
+    return json_response(request.app['response_cache'].stats())
+
+
+# 이미지 캐시 상태 조회
+@routes.get('/admin/image_cache')
+async def image_cache_status(request):
+    store = request.app['image_store']
+    return json_response(store.stats() if store is not None else {"enabled": False})
+
+
+@routes.get('/stores/{store_id:\\d+}/dishes')
+async def fetch_dishes_by_store(request):
+    store_id = int(request.match_info['store_id'])
+    after_id = _query_int(request, 'after_id')
+    limit = _query_int(request, 'limit')
+    try:
+        snapshot = await get_snapshot(request)
+        # 메뉴 첫 페이지 조회를 가게 조회 이벤트로 기록
+        popularity = request.app['popularity']
+        if popularity is not None and after_id is None:
+            record_events(popularity, parse_events({'type': 'view', 'store_id': store_id}, snapshot))
+        rewrite = image_rewriter(request, snapshot)
+        fmt = request_stream_format(request)
+        if fmt is not None:
+            query, params = keyset_query(STORE_MENU_PAGE_QUERY, (store_id,), after_id, limit)
+            return await stream_response(request, request.app['backend'].stream(query, params), fmt, rewrite)
+        if is_paged_request(request):
+            return await fetch_page(request, STORE_MENU_PAGE_QUERY, (store_id,), after_id, limit, 'dish_id',
+                                    rewrite)
+        return await cached_response(request, ('store_dishes', store_id, image_base_url(request)), STORE_MENU_QUERY,
+                                     (store_id,), rewrite)
+    except Exception as e:
+        logger.error(f"Error fetching dishes for store {store_id}: {e}")
+        return json_response({"error": f"Failed to fetch dishes for store {store_id}"}, status=500)
+
+
+@routes.get('/fetch_stores')
+async def fetch_stores(request):
+    after_id = _query_int(request, 'after_id')
+    limit = _query_int(request, 'limit')
+    try:
+        # 가게별 리뷰 감성 점수 / 리뷰 수 추가 (집계가 바뀌면 캐시 키도 바뀜)
+        sentiment = request.app['sentiment']
+        rewrite = sentiment.annotate_stores
+        fmt = request_stream_format(request)
+        if fmt is not None:
+            query, params = keyset_query(STORES_PAGE_QUERY, (), after_id, limit)
+            return await stream_response(request, request.app['backend'].stream(query, params), fmt, rewrite)
+        if is_paged_request(request):
+            return await fetch_page(request, STORES_PAGE_QUERY, (), after_id, limit, 'id', rewrite)
+        return await cached_response(request, ('stores', sentiment.version), STORES_LIST_QUERY, rewrite=rewrite)
+    except Exception as e:
+        logger.error(f"Error fetching stores: {e}")
+        return json_response({"error": "Failed to fetch stores"}, status=500)
+
+
+@routes.get('/stores/nearby')
+async def fetch_nearby_stores(request):
+    lat = _query_float(request, 'lat')
+    lon = _query_float(request, 'lon')
+    radius_km = _query_float(request, 'radius_km')
+    limit = _query_int(request, 'limit', 20)
+    if lat is None or lon is None:
+        return json_response({"error": "lat and lon are required"}, status=400)
+    try:
+        snapshot = await get_snapshot(request)
+        records = await run_blocking(request, nearby_store_records, snapshot, lat, lon, radius_km, limit)
+        return json_response(request.app['sentiment'].annotate_stores(records))
+    except Exception as e:
+        logger.error(f"Error fetching nearby stores: {e}")
+        return json_response({"error": "Failed to fetch nearby stores"}, status=500)
+
+
+@routes.get('/search_dishes')
+async def search_dishes(request):
+    query = request.query.get('query', '')
+    limit = _query_int(request, 'limit')
+    offset = max(_query_int(request, 'offset', 0), 0)
+    fuzzy = request.query.get('fuzzy', 'true').lower() != 'false'
+    after_id = _query_int(request, 'after_id')
+    try:
+        snapshot = await get_snapshot(request)
+        rewrite = image_rewriter(request, snapshot)
+        fmt = request_stream_format(request)
+        if fmt is not None:
+            batches = await run_blocking(request, search_batches, snapshot, query, limit, offset, fuzzy,
+                                         STREAM_BATCH_SIZE)
+            return await stream_response(request, _iterate(batches), fmt, rewrite)
+        if after_id is not None:
+            rows, next_after_id = await run_blocking(request, search_page, snapshot, query, after_id or None, limit,
+                                                     fuzzy)
+            return page_response(request, rewrite(rows), next_after_id)
+        return json_response(rewrite(await run_blocking(request, search_records, snapshot, query, limit, offset,
+                                                        fuzzy)))
+    except Exception as e:
+        logger.error(f"Error searching dishes: {e}")
+        return json_response({"error": "Failed to search dishes"}, status=500)
+
+
+@routes.get('/search_dishes/autocomplete')
+async def autocomplete_dishes(request):
+    prefix = request.query.get('prefix', '')
+    limit = _query_int(request, 'limit', 10)
+    try:
+        snapshot = await get_snapshot(request)
+        return json_response(snapshot.extras['search'].autocomplete(prefix, limit))
+    except Exception as e:
+        logger.error(f"Error autocompleting dishes: {e}")
+        return json_response({"error": "Failed to autocomplete dishes"}, status=500)
+
+
+@routes.route('GET', '/dishes/filter')
+@routes.route('POST', '/dishes/filter')
+async def filter_dishes_endpoint(request):
+    try:
+        data = await request.json() if request.method == 'POST' else dict(request.query)
+    except ValueError:
+        return json_response({"error": "request body must be valid JSON"}, status=400)
+    if not isinstance(data, dict):
+        return json_response({"error": "request body must be a JSON object"}, status=400)
+    try:
+        options = parse_filter_request(data)
+    except (ValueError, TypeError) as e:
+        return json_response({"error": str(e)}, status=400)
+    try:
+        snapshot = await get_snapshot(request)
+        with stage('facets.filter'):
+            result = await run_blocking(request, filter_dishes, snapshot, options['expression'], options['facets'],
+                                        options['limit'], options['after_id'])
+        result['dishes'] = image_rewriter(request, snapshot)(result['dishes'])
+        return json_response(result)
+    except FilterError as e:
+        return json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error filtering dishes: {e}")
+        return json_response({"error": "Failed to filter dishes"}, status=500)
+
+
+@routes.post('/recommend')
+async def recommend(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return json_response({"error": "request body must be valid JSON"}, status=400)
+    logger.debug("Received data: %s", data)
+    if not isinstance(data, dict):
+        return json_response({"error": "request body must be a JSON object"}, status=400)
+    try:
+        params = parse_recommend_request(data)
+    except (ValueError, TypeError) as e:
+        return json_response({"error": str(e)}, status=400)
+    try:
+        snapshot = await get_snapshot(request)
+        results = await run_blocking(request, cached_recommendation, params, snapshot, request.app['recommend_cache'],
+                                     request.app['orders'], request.app['popularity'], request.app['sentiment'])
+        results = image_rewriter(request, snapshot)(results)
+        with stage('recommend.serialize'):
+            return json_response(results)
+    except FilterError as e:
+        return json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Unhandled error: {e}")
+        return json_response({"error": f"An unexpected error occurred: {e}"}, status=500)
+
+
+@routes.post('/recommend/batch')
+async def recommend_batch(request):
+    try:
+        data = await request.json()
+        payloads = data.get('requests', []) if isinstance(data, dict) else data
+        if not isinstance(payloads, list):
+            return json_response({"error": "requests must be a list"}, status=400)
+        logger.debug("Received batch of %d requests", len(payloads))
+
+        snapshot = await get_snapshot(request)
+        results = await run_blocking(request, recommend_dishes_batch, payloads, snapshot, 2 ** 22,
+                                     request.app['recommend_cache'], request.app['orders'], request.app['popularity'],
+                                     request.app['sentiment'])
+        rewrite = image_rewriter(request, snapshot)
+        return json_response({"results": [rewrite(result) if isinstance(result, list) else result
+                                          for result in results]})
+    except Exception as e:
+        logger.error(f"Unhandled error in batch: {e}")
+        return json_response({"error": f"An unexpected error occurred: {e}"}, status=500)
+
+
+# 장바구니 주문을 로그에 추가하고 동시 주문 인덱스 갱신 (파일 쓰기와 인덱스 갱신은 스레드 풀에서 실행)
+@routes.post('/orders')
+async def create_order(request):
+    try:
+        data = await request.json()
+        snapshot = await get_snapshot(request)
+        record = build_order_record(data, snapshot.extras['scoring'])
+    except (ValueError, TypeError) as e:
+        return json_response({"error": str(e)}, status=400)
+    try:
+        await run_blocking(request, request.app['orders'].record, record)
+        if request.app['popularity'] is not None:
+            record_order(request.app['popularity'], snapshot, record, data)
+        matched = sum(1 for item in record['items'] if item['dish_id'] is not None)
+        return json_response({"order_id": record['order_id'], "items": len(record['items']), "matched": matched},
+                             status=201)
+    except Exception as e:
+        logger.error(f"Error recording order: {e}")
+        return json_response({"error": "Failed to record order"}, status=500)
+
+
+# 조회 / 추천 클릭 / 주문 이벤트를 인기도 카운터에 반영 (큐에 넣고 바로 응답)
+@routes.post('/events')
+async def record_popularity_events(request):
+    popularity = request.app['popularity']
+    if popularity is None:
+        return json_response({"error": "Popularity tracking is disabled"}, status=404)
+    try:
+        events = parse_events(await request.json(), await get_snapshot(request))
+    except (ValueError, TypeError) as e:
+        return json_response({"error": str(e)}, status=400)
+    record_events(popularity, events)
+    return json_response({"accepted": len(events)}, status=202)
+
+
+@routes.get('/admin/popularity')
+async def popularity_status(request):
+    popularity = request.app['popularity']
+    if popularity is None:
+        return json_response({"enabled": False})
+    return json_response(popularity.summary(_query_int(request, 'limit', 10)))
+
+
+# 리뷰를 로그에 추가만 함 (감성 점수는 review_sentiment.py 파이프라인이 반영, 파일 쓰기는 스레드 풀에서 실행)
+@routes.post('/reviews')
+async def create_review(request):
+    try:
+        record = build_review_record(await request.json(), await get_snapshot(request))
+    except (ValueError, TypeError) as e:
+        return json_response({"error": str(e)}, status=400)
+    try:
+        with stage('reviews.append'):
+            await run_blocking(request, request.app['review_log'].append, record)
+        return json_response({"review_id": record['review_id'], "store_id": record['store_id'],
+                              "dish_id": record['dish_id']}, status=201)
+    except Exception as e:
+        logger.error(f"Error recording review: {e}")
+        return json_response({"error": "Failed to record review"}, status=500)
+
+
+@routes.get('/admin/reviews')
+async def review_sentiment_status(request):
+    return json_response(request.app['sentiment'].summary(_query_int(request, 'limit', 10)))
+
+
+# Prometheus 텍스트 형식 지표 (요청 수/지연 시간, 추천 단계별 시간, 연결 풀/캐시 상태)
+@routes.get('/metrics')
+async def metrics(request):
+    return web.Response(body=REGISTRY.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+
+# /img/<dish_id> 엔드포인트 (?size=thumb|card&format=webp|jpeg&v=원본 해시)
+#   원본 다운로드와 Pillow 변환은 스레드 풀에서 실행
+@routes.get('/img/{dish_id:\\d+}')
+async def dish_image(request):
+    dish_id = int(request.match_info['dish_id'])
+    store = request.app['image_store']
+    if store is None:
+        return json_response({"error": "Image proxy is disabled"}, status=404)
+    try:
+        snapshot = await get_snapshot(request)
+        status, body, headers = await run_blocking(
+            request, image_response, store, snapshot.extras['images'], dish_id,
+            request.query.get('size'), request.query.get('format'), request.query.get('v'),
+            request.headers.get('If-None-Match')
+        )
+    except Exception as e:
+        logger.error(f"Error serving image for dish {dish_id}: {e}")
+        return json_response({"error": f"Failed to serve image for dish {dish_id}"}, status=500)
+    if isinstance(body, dict):
+        return json_response(body, status=status)
+    return web.Response(body=body, status=status, headers=headers)
+
+
+async def on_startup(app):
+    for collect in app['metrics_collectors']:
+        REGISTRY.register_collector(collect)
+    await app['backend'].start()
+    try:
+        # 첫 요청이 카탈로그 로드를 기다리지 않도록 미리 로드
+        await asyncio.get_running_loop().run_in_executor(app['executor'], app['catalog'].get)
+    except Exception as e:
+        logger.warning(f"Could not preload catalog: {e}")
+    app['catalog'].start_background_refresh()
+    app['orders'].start_background_refresh()
+    app['sentiment'].start_background_refresh()
+
+
+async def on_cleanup(app):
+    for collect in app['metrics_collectors']:
+        REGISTRY.unregister_collector(collect)
+    await app['backend'].close()
+    app['executor'].shutdown(wait=False)
+
+
+def create_app(backend=None):
+    backend = backend or create_backend()
+    app = web.Application(middlewares=[metrics_middleware, request_id_middleware, cors_middleware])
+    app['backend'] = backend
+    app['response_cache'] = cache_from_env()
+    app['recommend_cache'] = recommend_cache_from_env()
+    app['image_store'] = image_store_from_env()
+    app['executor'] = ThreadPoolExecutor(max_workers=int(os.getenv('ASYNC_WORKERS', '4')),
+                                         thread_name_prefix='bapsim-cpu')
+    probe_query = SQLITE_PROBE_QUERY if isinstance(backend, SQLiteBackend) else None
+    app['catalog'] = catalog_from_env(backend.sync_connect(), probe_query=probe_query)
+    app['orders'] = order_store_from_env()
+    app['popularity'] = popularity_from_env()
+    app['review_log'] = review_log_from_env()
+    app['sentiment'] = sentiment_store_from_env()
+    # /metrics 에서 조회 시점에 읽는 연결 풀 / 캐시 / 카탈로그 게이지 (앱 시작 시 등록)
+    app['metrics_collectors'] = [
+        stats_collector('db_pool', backend.stats, 'Database connection pool stats'),
+        stats_collector('http_cache', app['response_cache'].stats, 'Response cache stats'),
+        catalog_collector(app['catalog']),
+        stats_collector('order_index', app['orders'].stats, 'Order co-occurrence index stats'),
+        stats_collector('review_sentiment', app['sentiment'].stats, 'Review sentiment aggregate stats'),
+    ]
+    if app['recommend_cache'] is not None:
+        app['metrics_collectors'].append(
+            stats_collector('recommend_cache', app['recommend_cache'].stats, 'Recommendation cache stats'))
+    if app['popularity'] is not None:
+        app['metrics_collectors'].append(
+            stats_collector('popularity', app['popularity'].stats, 'Popularity tracker stats'))
+    if app['image_store'] is not None:
+        app['metrics_collectors'].append(
+            stats_collector('image_cache', app['image_store'].stats, 'Image cache stats'))
+    app.add_routes(routes)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import SEASONS, generate_catalog
+
+# HTTP 부하 테스트 (열린 루프: 응답을 기다리지 않고 정해진 도착률로 세션 시작)
+#   1) python -m benchmarks.seed_db 100k --sqlite data/loadtest.db
+#   2) DB_BACKEND=sqlite SQLITE_PATH=data/loadtest.db python async_server.py
+#      (또는 seed_db --mysql 로 채운 MariaDB 로 python flask_server.py)
+#   3) python -m benchmarks.loadtest --url http://127.0.0.1:5000 --scale 100k --rates 20,50,100 --duration 30
+#   --scale / --seed 는 seed_db 와 같게 (같은 합성 카탈로그에서 반찬 이름과 가게 id 를 고름)
+logger = logging.getLogger(__name__)
+
+# 세션 종류별 비율 (앱 화면 흐름 기준)
+DEFAULT_MIX = {
+    'recommend': 0.35,
+    'search_burst': 0.30,
+    'store_list': 0.10,
+    'store_menu': 0.25,
+}
+
+# 검색창 입력 간격 (초)
+KEYSTROKE_INTERVAL = (0.08, 0.25)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown scenario: {name.strip()}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+# 요청 결과 모음 (엔드포인트 이름별 지연 시간 / 상태 코드 / 오류)
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self.dropped = 0
+        self.lag = []
+
+    def record(self, endpoint, latency, status=None, error=None):
+        self.latencies.setdefault(endpoint, []).append(latency)
+        statuses = self.statuses.setdefault(endpoint, {})
+        key = str(status) if status is not None else type(error).__name__
+        statuses[key] = statuses.get(key, 0) + 1
+        if error is not None or status is None or status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, seconds):
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            latencies = np.asarray(self.latencies[endpoint]) * 1000
+            count = len(latencies)
+            errors = self.errors.get(endpoint, 0)
+            endpoints[endpoint] = {
+                'requests': count,
+                'throughput': round((count - errors) / seconds, 2),
+                'error_rate': round(errors / count, 4) if count else 0.0,
+                'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+                'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+                'max_ms': round(float(latencies.max()), 2),
+                'statuses': self.statuses[endpoint],
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        total_errors = sum(self.errors.values())
+        lag = np.asarray(self.lag) * 1000 if self.lag else np.zeros(1)
+        return {
+            'seconds': round(seconds, 2),
+            'requests': total,
+            'throughput': round((total - total_errors) / seconds, 2),
+            'error_rate': round(total_errors / total, 4) if total else 0.0,
+            # 클라이언트가 예정 시각보다 늦게 보낸 정도 (크면 부하 생성기 자체가 포화)
+            'client_lag_p99_ms': round(float(np.percentile(lag, 99)), 2),
+            'dropped_sessions': self.dropped,
+            'endpoints': endpoints,
+        }
+
+
+# 합성 카탈로그에서 요청 내용 생성 (RecommendationResultScreen 과 같은 형태의 /recommend 본문 등)
+class TrafficModel:
+    def __init__(self, dishes, stores, rng):
+        self.rng = rng
+        self.dish_names = list(dishes['name'])
+        # 자주 검색/선택되는 반찬은 인기 반찬 쪽으로 치우치게
+        weights = 1.0 / np.arange(1, len(self.dish_names) + 1) ** 0.8
+        self.dish_weights = list(weights / weights.sum())
+        self.store_ids = [int(store_id) for store_id in stores['id']]
+
+    def dish_name(self):
+        return self.rng.choices(self.dish_names, weights=self.dish_weights)[0]
+
+    def recommend_payload(self):
+        return {
+            'user_dishes': [self.dish_name() for _ in range(self.rng.randint(1, 4))],
+            'include_soup_option': self.rng.random() < 0.6,
+            'num_recommendations': self.rng.choice([3, 5, 5, 7]),
+            'selected_season': self.rng.choice(SEASONS),
+            'vegan_only': self.rng.random() < 0.1,
+        }
+
+    # 반찬 이름을 한 글자씩 입력하는 검색어 목록 (오타 한 번 섞기도 함)
+    def keystrokes(self):
+        name = self.dish_name()
+        prefixes = [name[:length] for length in range(1, len(name) + 1)]
+        if len(name) > 2 and self.rng.random() < 0.2:
+            prefixes.insert(-1, name[:-1] + '가')
+        return prefixes
+
+    def store_id(self):
+        return self.rng.choice(self.store_ids)
+
+
+class LoadGenerator:
+    def __init__(self, base_url, model, recorder, timeout=10.0, max_in_flight=1000):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.recorder = recorder
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.session = None
+
+    # scheduled: 세션 첫 요청의 예정 시각 (늦게 보낸 만큼도 지연 시간에 포함, coordinated omission 방지)
+    async def request(self, endpoint, method, path, scheduled=None, **kwargs):
+        import aiohttp
+        started = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url + path, **kwargs) as response:
+                await response.read()
+                self.recorder.record(endpoint, time.perf_counter() - started, response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.recorder.record(endpoint, time.perf_counter() - started, error=e)
+
+    async def recommend(self, scheduled):
+        await self.request('POST /recommend', 'POST', '/recommend', scheduled,
+                           json=self.model.recommend_payload())
+
+    # 입력할 때마다 자동완성, 마지막 입력에서 검색 (앱 검색창의 연속 요청)
+    async def search_burst(self, scheduled):
+        prefixes = self.model.keystrokes()
+        for prefix in prefixes[:-1]:
+            await self.request('GET /search_dishes/autocomplete', 'GET', '/search_dishes/autocomplete',
+                               scheduled, params={'prefix': prefix})
+            scheduled = None
+            await asyncio.sleep(self.model.rng.uniform(*KEYSTROKE_INTERVAL))
+        await self.request('GET /search_dishes', 'GET', '/search_dishes', scheduled,
+                           params={'query': prefixes[-1]})
+
+    async def store_list(self, scheduled):
+        await self.request('GET /fetch_stores', 'GET', '/fetch_stores', scheduled)
+
+    # 가게 목록 화면에서 가게 하나를 눌러 메뉴 조회
+    async def store_menu(self, scheduled):
+        await self.request('GET /stores/<id>/dishes', 'GET', f'/stores/{self.model.store_id()}/dishes', scheduled)
+
+    async def _session(self, scenario, scheduled):
+        self.recorder.lag.append(max(time.perf_counter() - scheduled, 0.0))
+        self.in_flight += 1
+        try:
+            await getattr(self, scenario)(scheduled)
+        finally:
+            self.in_flight -= 1
+
+    # rate 세션/초의 포아송 도착으로 duration 초 동안 실행 (응답 대기와 무관하게 예정 시각에 시작)
+    async def run(self, rate, duration, mix):
+        import aiohttp
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        tasks = set()
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as self.session:
+            started = time.perf_counter()
+            scheduled = started
+            while True:
+                scheduled += self.model.rng.expovariate(rate)
+                if scheduled - started >= duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.in_flight >= self.max_in_flight:
+                    # 서버가 따라오지 못해 동시 세션이 상한에 닿으면 버린 세션으로 집계
+                    self.recorder.dropped += 1
+                    continue
+                scenario = self.model.rng.choices(scenarios, weights=weights)[0]
+                task = asyncio.ensure_future(self._session(scenario, scheduled))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks, timeout=self.timeout + 1)
+            return time.perf_counter() - started
+
+
+def print_summary(rate, summary):
+    print(f"\n=== {rate:g} sessions/s: {summary['requests']} requests in {summary['seconds']}s, "
+          f"{summary['throughput']} ok req/s, errors {summary['error_rate']:.2%}, "
+          f"client lag p99 {summary['client_lag_p99_ms']} ms, dropped {summary['dropped_sessions']}")
+    print(f"{'endpoint':<32}{'reqs':>7}{'ok/s':>9}{'err':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for endpoint, stats in summary['endpoints'].items():
+        print(f"{endpoint:<32}{stats['requests']:>7}{stats['throughput']:>9}{stats['error_rate']:>8.2%}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}")
+
+
+async def run_steps(args, model, mix):
+    steps = []
+    for rate in [float(rate) for rate in args.rates.split(',')]:
+        recorder = Recorder()
+        generator = LoadGenerator(args.url, model, recorder, args.timeout, args.max_in_flight)
+        if args.warmup:
+            await LoadGenerator(args.url, model, Recorder(), args.timeout, args.max_in_flight).run(
+                rate, args.warmup, mix)
+        seconds = await generator.run(rate, args.duration, mix)
+        summary = recorder.summary(seconds)
+        summary['rate'] = rate
+        print_summary(rate, summary)
+        steps.append(summary)
+    return steps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop HTTP load test against a running bapsim server")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--scale', default='100k', help="scale used for seed_db (to pick dish names / store ids)")
+    parser.add_argument('--seed', type=int, default=42, help="seed used for seed_db")
+    parser.add_argument('--rates', default='20', help="comma separated session arrival rates per second")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per rate step")
+    parser.add_argument('--warmup', type=float, default=5.0, help="unrecorded seconds before each step")
+    parser.add_argument('--mix', help="scenario weights, e.g. recommend=0.5,search_burst=0.5")
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--max-in-flight', type=int, default=1000)
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--output', help="write the step summaries as JSON")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    stores, dishes, _ = generate_catalog(args.scale, args.seed)
+    model = TrafficModel(dishes, stores, random.Random(args.random_seed))
+    steps = asyncio.run(run_steps(args, model, mix))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'scale': args.scale, 'mix': mix, 'steps': steps}, f,
+                      ensure_ascii=False, indent=2)
+        logger.info(f"Results saved to: {args.output}")
+    return 1 if any(step['error_rate'] > 0 for step in steps) else 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
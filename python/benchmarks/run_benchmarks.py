@@ -0,0 +1,325 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import build_snapshot, generate_catalog, scale_sizes
+from compat import build_compat_matrix
+from scoring import SERVER_WEIGHTS, encode_catalog, score_dishes, score_dishes_batch
+from search_index import build_search_index
+from service import (parse_recommend_request, row_distances, run_recommendation, search_records, select_slate)
+from spatial import build_store_index, haversine_km
+
+# 추천 핵심 로직 마이크로벤치마크 (규모별 시간 + 최대 메모리, 기준값 대비 회귀 시 실패)
+#   python -m benchmarks.run_benchmarks --scales 1k,100k
+#   python -m benchmarks.run_benchmarks --scales 1k,100k,1m --save-baseline
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+# 사용자 위치 (관악구)
+USER_LAT = 37.4783
+USER_LON = 126.9516
+
+# 이름 -> setup(snapshot, rng) (setup 은 측정할 인자 없는 함수를 반환)
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _user_dishes(snapshot, rng, count=3):
+    names = snapshot.dishes['name'].to_numpy()
+    return list(rng.choice(names, size=min(count, len(names)), replace=False))
+
+
+@case('build.scoring')
+def _build_scoring(snapshot, rng):
+    return lambda: encode_catalog(snapshot)
+
+
+@case('build.spatial')
+def _build_spatial(snapshot, rng):
+    return lambda: build_store_index(snapshot)
+
+
+@case('build.search')
+def _build_search(snapshot, rng):
+    return lambda: build_search_index(snapshot)
+
+
+@case('scoring.single')
+def _scoring_single(snapshot, rng):
+    encoded = snapshot.extras['scoring']
+    user_dishes = _user_dishes(snapshot, rng)
+    return lambda: score_dishes(encoded, user_dishes, '겨울', SERVER_WEIGHTS)
+
+
+@case('scoring.batch64')
+def _scoring_batch(snapshot, rng):
+    encoded = snapshot.extras['scoring']
+    users = [_user_dishes(snapshot, rng, int(rng.integers(1, 6))) for _ in range(64)]
+    seasons = [['봄', '여름', '가을', '겨울', None][i % 5] for i in range(64)]
+    return lambda: score_dishes_batch(encoded, users, seasons, SERVER_WEIGHTS)
+
+
+@case('scoring.compat')
+def _scoring_compat(snapshot, rng):
+    compat = snapshot.extras.get('compat')
+    if compat is None:
+        return None
+    encoded = snapshot.extras['scoring']
+    user_dishes = _user_dishes(snapshot, rng)
+    return lambda: compat.score(encoded, user_dishes, '겨울', SERVER_WEIGHTS)
+
+
+@case('selection.slate')
+def _selection_slate(snapshot, rng):
+    encoded = snapshot.extras['scoring']
+    frame = snapshot.frame
+    rows = np.arange(len(frame))
+    scores = rng.integers(0, 20, size=len(frame)).astype(np.int64)
+    distances = row_distances(frame, USER_LAT, USER_LON, snapshot.extras['spatial'])
+    return lambda: select_slate(frame, encoded, rows, scores, distances, 10, pin_soup=True, max_per_store=2)
+
+
+@case('selection.recommend')
+def _selection_recommend(snapshot, rng):
+    params = parse_recommend_request({'user_dishes': _user_dishes(snapshot, rng), 'selected_season': '겨울',
+                                      'num_recommendations': 5})
+    return lambda: run_recommendation(params, snapshot)
+
+
+@case('selection.recommend_radius')
+def _selection_recommend_radius(snapshot, rng):
+    params = parse_recommend_request({'user_dishes': _user_dishes(snapshot, rng), 'num_recommendations': 5,
+                                      'radius_km': 2.0})
+    return lambda: run_recommendation(params, snapshot)
+
+
+@case('distance.haversine')
+def _distance_haversine(snapshot, rng):
+    latitudes = snapshot.frame['latitude'].to_numpy(dtype=np.float64)
+    longitudes = snapshot.frame['longitude'].to_numpy(dtype=np.float64)
+    return lambda: haversine_km(USER_LAT, USER_LON, latitudes, longitudes)
+
+
+@case('distance.rows_radius')
+def _distance_rows_radius(snapshot, rng):
+    return lambda: row_distances(snapshot.frame, USER_LAT, USER_LON, snapshot.extras['spatial'], 2.0)
+
+
+@case('distance.nearest')
+def _distance_nearest(snapshot, rng):
+    return lambda: snapshot.extras['spatial'].nearest(USER_LAT, USER_LON, 20)
+
+
+@case('search.name')
+def _search_name(snapshot, rng):
+    return lambda: search_records(snapshot, '감자볶음', limit=20)
+
+
+@case('search.chosung')
+def _search_chosung(snapshot, rng):
+    return lambda: search_records(snapshot, 'ㄷㅂ', limit=20)
+
+
+@case('search.typo')
+def _search_typo(snapshot, rng):
+    return lambda: search_records(snapshot, '감자볶은', limit=20)
+
+
+# 색인에 없는 n-gram 만으로 된 검색어 (오류 없이 빈 결과여야 함)
+@case('search.unknown')
+def _search_unknown(snapshot, rng):
+    if search_records(snapshot, 'xyzw', limit=20):
+        raise RuntimeError("search for unknown n-grams returned rows")
+    return lambda: search_records(snapshot, 'xyzw', limit=20)
+
+
+# 가게 이름 검색 (그 가게에서 파는 행만 결과에 포함되어야 함)
+@case('search.store')
+def _search_store(snapshot, rng):
+    store_name = snapshot.stores['name'].iloc[int(rng.integers(len(snapshot.stores)))]
+    if {row['store_name'] for row in search_records(snapshot, store_name)} - {store_name}:
+        raise RuntimeError(f"store name search for {store_name!r} returned rows from other stores")
+    return lambda: search_records(snapshot, store_name, limit=20)
+
+
+@case('search.autocomplete')
+def _search_autocomplete(snapshot, rng):
+    return lambda: snapshot.extras['search'].autocomplete('고추', 10)
+
+
+# 반복 측정 (최소 repeat 번, min_seconds 가 지날 때까지) -> 초 단위 측정값 목록
+def measure_time(func, repeat=5, min_seconds=0.2, max_repeat=1000):
+    func()  # 준비 실행 (지연 생성되는 구조 등)
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or (time.perf_counter() - started < min_seconds and len(timings) < max_repeat):
+        begin = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - begin)
+    return timings
+
+
+# 한 번 실행하는 동안 새로 할당된 최대 메모리 (MB, numpy 배열 포함)
+def measure_peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run_scale(scale, only=None, repeat=5, min_seconds=0.2, seed=42, compat_max_dishes=5000):
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    stores, dishes, store_dishes = generate_catalog(scale, seed)
+    generated = time.perf_counter() - started
+    snapshot = build_snapshot(stores, dishes, store_dishes, [
+        ('scoring', encode_catalog, False),
+        ('spatial', build_store_index, False),
+        ('search', build_search_index, True),
+    ])
+    if len(dishes) <= compat_max_dishes:
+        snapshot.extras['compat'] = build_compat_matrix(snapshot.dishes, snapshot.version)
+    logger.info(f"[{scale}] {len(stores)} stores, {len(dishes)} dishes, {len(snapshot.frame)} rows "
+                f"(generated in {generated:.2f}s, snapshot in {snapshot.load_seconds:.2f}s)")
+
+    results = {}
+    for name, setup in CASES.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        func = setup(snapshot, rng)
+        if func is None:
+            continue
+        timings = measure_time(func, repeat, min_seconds)
+        results[name] = {
+            'median_seconds': statistics.median(timings),
+            'min_seconds': min(timings),
+            'repeat': len(timings),
+            'peak_mb': round(measure_peak_memory(func), 3),
+        }
+        logger.info(f"[{scale}] {name:<28} {results[name]['median_seconds'] * 1000:10.3f} ms "
+                    f"(min {results[name]['min_seconds'] * 1000:.3f}, n={len(timings)}) "
+                    f"peak {results[name]['peak_mb']:.2f} MB")
+    return {
+        'rows': len(snapshot.frame),
+        'stores': len(stores),
+        'dishes': len(dishes),
+        'cases': results,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'node': platform.node(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+# 기준값과 비교 -> 회귀 목록 (시간은 비율 + 절대 차이, 메모리는 비율 + MB 차이를 모두 넘어야 회귀)
+#   시간은 잡음이 적은 최솟값으로 비교하고, 아주 짧은 작업은 절대 차이(min_delta 초) 조건으로 걸러냄
+def compare(results, baseline, tolerance=0.25, memory_tolerance=0.25, min_delta=0.001, min_mb=1.0):
+    regressions = []
+    for scale, current_scale in results['scales'].items():
+        baseline_cases = baseline.get('scales', {}).get(scale, {}).get('cases', {})
+        for name, current in current_scale['cases'].items():
+            base = baseline_cases.get(name)
+            if base is None:
+                continue
+            slower = current['min_seconds'] / max(base['min_seconds'], 1e-9)
+            if slower > 1 + tolerance and current['min_seconds'] - base['min_seconds'] > min_delta:
+                regressions.append(f"{scale} {name}: {base['min_seconds'] * 1000:.3f} ms -> "
+                                   f"{current['min_seconds'] * 1000:.3f} ms ({slower:.2f}x)")
+            larger = current['peak_mb'] / max(base['peak_mb'], 1e-9)
+            if larger > 1 + memory_tolerance and current['peak_mb'] - base['peak_mb'] > min_mb:
+                regressions.append(f"{scale} {name}: peak {base['peak_mb']:.2f} MB -> "
+                                   f"{current['peak_mb']:.2f} MB ({larger:.2f}x)")
+    return regressions
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring, selection, distance and search")
+    parser.add_argument('--scales', default='1k,100k', help="comma separated scales (1k, 100k, 1m or e.g. 250k)")
+    parser.add_argument('--only', help="comma separated case name prefixes (e.g. scoring,search.name)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-seconds', type=float, default=0.2, help="minimum measuring time per case")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="results JSON path (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown ratio (0.25 = 25%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip().lower() for scale in args.scales.split(',') if scale.strip()]
+    for scale in scales:
+        scale_sizes(scale)  # 잘못된 규모 이름은 측정 전에 실패
+    only = [prefix.strip() for prefix in args.only.split(',')] if args.only else None
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'seed': args.seed,
+        'scales': {scale: run_scale(scale, only, args.repeat, args.min_seconds, args.seed) for scale in scales},
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    write_json(output, results)
+    logger.info(f"Results saved to: {output}")
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        logger.info(f"Baseline saved to: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        logger.warning(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('node') != results['environment']['node']:
+        logger.warning("Baseline was recorded on a different machine; timings may not be comparable")
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    if regressions:
+        logger.error(f"PERFORMANCE REGRESSION: {len(regressions)} case(s) worse than baseline")
+        for regression in regressions:
+            logger.error(f"  {regression}")
+        return 1
+    logger.info("No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    # 측정 대상 모듈의 요청 단위 로그는 숨기고 벤치마크 결과만 출력
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import argparse
+import logging
+import os
+import sqlite3
+import time
+
+from benchmarks.synthetic import generate_catalog
+from catalog import DISH_COLUMNS, STORE_COLUMNS, STORE_DISH_COLUMNS
+
+# 부하 테스트용 DB 채우기 (합성 카탈로그 -> SQLite 파일 또는 로컬 MariaDB)
+#   python -m benchmarks.seed_db 100k --sqlite data/loadtest.db
+#   python -m benchmarks.seed_db 100k --mysql --replace      (DB_HOST / DB_NAME 등 환경 변수의 DB)
+logger = logging.getLogger(__name__)
+
+SQLITE_SCHEMA = """
+    CREATE TABLE stores (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        location TEXT,
+        telephone_number TEXT,
+        latitude REAL,
+        longitude REAL
+    );
+    CREATE TABLE dishes (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        image_url TEXT,
+        season TEXT,
+        category TEXT,
+        characteristics TEXT,
+        main_ingredients TEXT,
+        cooking_method TEXT,
+        flavor TEXT
+    );
+    CREATE TABLE store_dishes (
+        store_id INTEGER NOT NULL,
+        dish_id INTEGER NOT NULL,
+        price INTEGER,
+        PRIMARY KEY (store_id, dish_id)
+    );
+    CREATE INDEX store_dishes_dish ON store_dishes (dish_id);
+"""
+
+MYSQL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS stores (
+        id INT PRIMARY KEY,
+        name VARCHAR(255),
+        location VARCHAR(255),
+        telephone_number VARCHAR(32),
+        latitude DOUBLE,
+        longitude DOUBLE
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dishes (
+        id INT PRIMARY KEY AUTO_INCREMENT,
+        name VARCHAR(255),
+        image_url TEXT,
+        season VARCHAR(32),
+        category VARCHAR(64),
+        characteristics VARCHAR(255),
+        main_ingredients TEXT,
+        cooking_method VARCHAR(64),
+        flavor VARCHAR(255),
+        INDEX (name)
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS store_dishes (
+        store_id INT NOT NULL,
+        dish_id INT NOT NULL,
+        price INT,
+        PRIMARY KEY (store_id, dish_id),
+        INDEX (dish_id)
+    ) DEFAULT CHARSET = utf8mb4
+    """,
+]
+
+TABLES = [('stores', STORE_COLUMNS), ('dishes', DISH_COLUMNS), ('store_dishes', STORE_DISH_COLUMNS)]
+
+
+# DataFrame -> DB 드라이버가 받는 파이썬 값 튜플 (결측값은 None)
+def _rows(frame, columns):
+    frame = frame[columns].astype(object)
+    return list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+def _insert(cursor, table, columns, rows, placeholder, chunk_size=10000):
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))})"
+    for start in range(0, len(rows), chunk_size):
+        cursor.executemany(query, rows[start:start + chunk_size])
+
+
+# 새 SQLite 파일로 저장 (기존 파일은 교체)
+def seed_sqlite(path, stores, dishes, store_dishes):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SQLITE_SCHEMA)
+        cursor = connection.cursor()
+        for (table, columns), frame in zip(TABLES, (stores, dishes, store_dishes)):
+            _insert(cursor, table, columns, _rows(frame, columns), '?')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+# MariaDB 에 저장 (replace=False 이면 테이블에 데이터가 있을 때 중단)
+def seed_mysql(connection, stores, dishes, store_dishes, replace=False):
+    cursor = connection.cursor()
+    try:
+        for statement in MYSQL_SCHEMA:
+            cursor.execute(statement)
+        if not replace:
+            for table, _ in TABLES:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                if cursor.fetchone()[0]:
+                    raise ValueError(f"Table {table} is not empty; use --replace to overwrite it")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table, _ in reversed(TABLES):
+            cursor.execute(f"DELETE FROM {table}")
+        for (table, columns), frame in zip(TABLES, (stores, dishes, store_dishes)):
+            _insert(cursor, table, columns, _rows(frame, columns), '%s')
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Seed a local database with a synthetic catalog")
+    parser.add_argument('scale', help="1k, 100k, 1m or a row count such as 250k")
+    parser.add_argument('--seed', type=int, default=42)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--sqlite', help="SQLite file to create (for async_server.py with DB_BACKEND=sqlite)")
+    target.add_argument('--mysql', action='store_true', help="use the MariaDB configured by DB_* variables")
+    parser.add_argument('--replace', action='store_true', help="delete existing MariaDB rows first")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stores, dishes, store_dishes = generate_catalog(args.scale, args.seed)
+    if args.sqlite:
+        seed_sqlite(args.sqlite, stores, dishes, store_dishes)
+    else:
+        from db_pool import pool_from_env
+        db_pool = pool_from_env(charset='utf8mb4')
+        connection = db_pool.acquire()
+        try:
+            seed_mysql(connection, stores, dishes, store_dishes, args.replace)
+        finally:
+            connection.close()
+            db_pool.close()
+    logger.info(f"Seeded {len(stores)} stores, {len(dishes)} dishes, {len(store_dishes)} store_dishes rows "
+                f"in {time.perf_counter() - started:.1f}s")
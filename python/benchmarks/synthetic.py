@@ -0,0 +1,197 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import DISH_COLUMNS, STORE_COLUMNS, STORE_DISH_COLUMNS, CatalogSnapshot, content_version, join_catalog
+
+# 결정적인 합성 카탈로그 생성기 (같은 seed / 규모면 항상 같은 데이터)
+#   반찬 이름은 수식어 + 주재료 + 조리 접미사 조합, 가게 좌표는 서울 자치구 중심 주변에 분포
+#   python -m benchmarks.synthetic 100k --csv out/   (bulk_load.py 로 적재할 수 있는 CSV 저장)
+
+# 규모 이름 -> (가게 수, 반찬 수, store_dishes 행 수)
+SCALES = {
+    '1k': (20, 200, 1_000),
+    '100k': (2_000, 2_000, 100_000),
+    '1m': (20_000, 5_000, 1_000_000),
+}
+
+MODIFIERS = ['', '매콤', '간장', '들기름', '고추장', '된장', '마늘', '참깨', '양념', '궁중', '시골', '엄마표',
+             '부드러운', '바삭', '매실', '유자', '깻잎', '버터', '치즈', '청양', '생강', '들깨', '흑임자', '꿀',
+             '즉석', '옛날', '전라도', '경상도', '제주', '강원']
+
+# 주재료, 재료 분류(특징)
+INGREDIENTS = [
+    ('소고기', '육류'), ('돼지고기', '육류'), ('닭고기', '육류'), ('오리고기', '육류'), ('차돌박이', '육류'),
+    ('고등어', '해산물'), ('갈치', '해산물'), ('오징어', '해산물'), ('멸치', '해산물'), ('새우', '해산물'),
+    ('명태', '해산물'), ('꽁치', '해산물'), ('홍합', '해산물'), ('미역', '해산물'), ('김', '해산물'),
+    ('어묵', '해산물'), ('두부', '비건'), ('감자', '비건'), ('애호박', '비건'), ('가지', '비건'),
+    ('시금치', '비건'), ('콩나물', '비건'), ('숙주', '비건'), ('무', '비건'), ('버섯', '비건'),
+    ('연근', '비건'), ('우엉', '비건'), ('고사리', '비건'), ('도라지', '비건'), ('브로콜리', '비건'),
+    ('깻잎', '비건'), ('배추', '비건'), ('오이', '비건'), ('당근', '비건'), ('양배추', '비건'),
+    ('계란', '채소'), ('메추리알', '채소'), ('김치', '채소'), ('파', '비건'), ('취나물', '비건'),
+]
+SEASONINGS = ['간장', '마늘', '양파', '대파', '고춧가루', '고추장', '된장', '참기름', '들기름', '설탕', '식초',
+              '깨', '생강', '물엿', '청양고추', '후추', '소금', '멸치액젓', '새우젓', '버터']
+
+# 접미사, 분류, 조리방법, 국물요리 여부
+DISH_TYPES = [
+    ('볶음', '밑반찬', '볶음', False),
+    ('조림', '밑반찬', '조림', False),
+    ('무침', '밑반찬', '무침', False),
+    ('나물', '밑반찬', '무침', False),
+    ('구이', '메인반찬', '구이', False),
+    ('튀김', '메인반찬', '튀김', False),
+    ('찜', '메인반찬', '찜', False),
+    ('전', '메인반찬', '기타', False),
+    ('장아찌', '밑반찬', '기타', False),
+    ('국', '국', '밀키트', True),
+    ('찌개', '찌개', '밀키트', True),
+    ('탕', '국', '밀키트', True),
+]
+FLAVORS = ['달콤함', '짭짤함', '매움', '담백함', '고소함', '새콤함', '감칠맛']
+SEASONS = ['봄', '여름', '가을', '겨울', '사계절']
+SEASON_WEIGHTS = [0.15, 0.15, 0.15, 0.15, 0.4]
+
+# 서울 자치구 중심 좌표 (가게는 이 주변 약 1.5km 안에 분포)
+DISTRICTS = [
+    ('관악구', 37.4784, 126.9516), ('동작구', 37.5124, 126.9393), ('서초구', 37.4837, 127.0324),
+    ('강남구', 37.5172, 127.0473), ('송파구', 37.5145, 127.1059), ('강동구', 37.5301, 127.1238),
+    ('마포구', 37.5663, 126.9019), ('서대문구', 37.5791, 126.9368), ('은평구', 37.6027, 126.9291),
+    ('종로구', 37.5735, 126.9790), ('중구', 37.5641, 126.9979), ('용산구', 37.5326, 126.9905),
+    ('성동구', 37.5634, 127.0371), ('광진구', 37.5385, 127.0823), ('동대문구', 37.5744, 127.0396),
+    ('성북구', 37.5894, 127.0167), ('노원구', 37.6542, 127.0568), ('영등포구', 37.5264, 126.8962),
+    ('구로구', 37.4954, 126.8874), ('양천구', 37.5170, 126.8665), ('강서구', 37.5509, 126.8495),
+]
+STORE_WORDS = ['엄마손', '할매', '정성', '집밥', '오늘', '든든', '맛있는', '소문난', '행복', '바른', '착한', '우리집',
+               '골목', '시장', '새벽', '한끼']
+
+
+def scale_sizes(scale):
+    if scale in SCALES:
+        return SCALES[scale]
+    # '250k' 같은 임의 규모: 가게당 50행, 반찬은 행 수의 제곱근 비례 (최대 5000)
+    rows = int(float(scale.lower().rstrip('km')) * (1_000_000 if scale.lower().endswith('m') else 1_000))
+    return max(rows // 50, 1), min(max(int(rows ** 0.5) * 6, 50), 5_000), rows
+
+
+def generate_dishes(count, rng):
+    dishes = []
+    names = set()
+    while len(dishes) < count:
+        modifier = MODIFIERS[rng.integers(len(MODIFIERS))]
+        ingredient, kind = INGREDIENTS[rng.integers(len(INGREDIENTS))]
+        suffix, category, cooking, soup = DISH_TYPES[rng.integers(len(DISH_TYPES))]
+        name = f'{modifier}{ingredient}{suffix}'
+        if name in names:
+            # 조합이 모자라면 번호를 붙여 고유 이름 유지
+            name = f'{name}{len(dishes)}'
+        names.add(name)
+        seasonings = rng.choice(SEASONINGS, size=rng.integers(2, 5), replace=False)
+        flavors = rng.choice(FLAVORS, size=rng.integers(1, 3), replace=False)
+        characteristics = [kind] + (['국물요리'] if soup else [])
+        dishes.append({
+            'id': len(dishes) + 1,
+            'name': name,
+            'image_url': f'https://blogfiles.pstatic.net/synthetic/{len(dishes) + 1}.jpg?type=w966',
+            'season': SEASONS[rng.choice(len(SEASONS), p=SEASON_WEIGHTS)],
+            'category': category,
+            'characteristics': ', '.join(characteristics),
+            'main_ingredients': ', '.join([ingredient] + list(seasonings)),
+            'cooking_method': cooking,
+            'flavor': ', '.join(flavors),
+        })
+    return pd.DataFrame(dishes, columns=DISH_COLUMNS)
+
+
+def generate_stores(count, rng):
+    district_index = rng.integers(len(DISTRICTS), size=count)
+    centers = np.array([(lat, lon) for _, lat, lon in DISTRICTS])[district_index]
+    # 위도 0.01도 ~ 1.1km, 자치구 중심 주변 정규 분포
+    latitudes = np.round(centers[:, 0] + rng.normal(0, 0.012, count), 6)
+    longitudes = np.round(centers[:, 1] + rng.normal(0, 0.015, count), 6)
+    words = rng.integers(len(STORE_WORDS), size=count)
+    return pd.DataFrame({
+        'id': np.arange(1, count + 1),
+        'name': [f'{STORE_WORDS[word]}반찬 {DISTRICTS[district][0][:-1]}{store_id}호점'
+                 for store_id, word, district in zip(range(1, count + 1), words, district_index)],
+        'location': [f'서울 {DISTRICTS[district][0]} 반찬로 {number}'
+                     for district, number in zip(district_index, rng.integers(1, 300, size=count))],
+        'telephone_number': [f'02-{number // 10000:04d}-{number % 10000:04d}'
+                             for number in rng.integers(20_000_000, 99_999_999, size=count)],
+        'latitude': latitudes,
+        'longitude': longitudes,
+    }, columns=STORE_COLUMNS)
+
+
+# (가게, 반찬) 쌍 rows 개 (인기 반찬일수록 많은 가게에서 판매, 쌍 중복 없음)
+def generate_store_dishes(store_count, dish_count, rows, rng):
+    popularity = 1.0 / np.arange(1, dish_count + 1) ** 0.8
+    popularity = popularity[rng.permutation(dish_count)]
+    popularity /= popularity.sum()
+    pairs = pd.DataFrame(columns=['store_id', 'dish_id'])
+    while len(pairs) < rows:
+        needed = int((rows - len(pairs)) * 1.3) + 16
+        batch = pd.DataFrame({
+            'store_id': rng.integers(1, store_count + 1, size=needed),
+            'dish_id': rng.choice(dish_count, size=needed, p=popularity) + 1,
+        })
+        pairs = pd.concat([pairs, batch], ignore_index=True).drop_duplicates().astype(np.int64)
+        if len(pairs) >= store_count * dish_count:
+            break
+    pairs = pairs.iloc[:rows].sort_values(['store_id', 'dish_id'], kind='stable').reset_index(drop=True)
+    pairs['price'] = rng.integers(20, 150, size=len(pairs)) * 100
+    return pairs[STORE_DISH_COLUMNS]
+
+
+# 규모 이름 -> (stores, dishes, store_dishes)
+def generate_catalog(scale='1k', seed=42):
+    store_count, dish_count, rows = scale_sizes(scale)
+    rng = np.random.default_rng(seed)
+    dishes = generate_dishes(dish_count, rng)
+    stores = generate_stores(store_count, rng)
+    store_dishes = generate_store_dishes(store_count, dish_count, min(rows, store_count * dish_count), rng)
+    return stores, dishes, store_dishes
+
+
+# DB 없이 CatalogStore.reload 와 같은 방식으로 스냅샷과 파생 구조 생성
+#   builders: [(이름, 빌더, incremental)] (service.create_catalog 에 등록하는 것과 같은 형태)
+def build_snapshot(stores, dishes, store_dishes, builders=()):
+    started = time.perf_counter()
+    snapshot = CatalogSnapshot(
+        stores, dishes, join_catalog(stores, dishes, store_dishes),
+        content_version(stores, dishes, store_dishes), 'synthetic', 1, time.time(), 0.0
+    )
+    for name, builder, incremental in builders:
+        snapshot.extras[name] = builder(snapshot, None) if incremental else builder(snapshot)
+    snapshot.load_seconds = time.perf_counter() - started
+    return snapshot
+
+
+# bulk_load.py 로 적재할 수 있는 CSV (dishes: 번호/이름/..., store_dishes: store_id/dish_id/price) + 가게 CSV
+def write_csv(directory, stores, dishes, store_dishes):
+    os.makedirs(directory, exist_ok=True)
+    dishes.rename(columns={'id': '번호', 'name': '이름', 'main_ingredients': '주요재료', 'category': '분류',
+                           'flavor': '맛', 'characteristics': '특징', 'season': '계절',
+                           'cooking_method': '조리방법'}).to_csv(
+        os.path.join(directory, 'dishes.csv'), index=False, encoding='utf-8-sig')
+    stores.to_csv(os.path.join(directory, 'stores.csv'), index=False, encoding='utf-8-sig')
+    store_dishes.to_csv(os.path.join(directory, 'store_dishes.csv'), index=False, encoding='utf-8-sig')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic catalog")
+    parser.add_argument('scale', help=f"one of {sorted(SCALES)} or a row count such as 250k")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--csv', help="directory to write stores.csv / dishes.csv / store_dishes.csv")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stores, dishes, store_dishes = generate_catalog(args.scale, args.seed)
+    print(f"{len(stores)} stores, {len(dishes)} dishes, {len(store_dishes)} store_dishes rows "
+          f"in {time.perf_counter() - started:.2f}s")
+    if args.csv:
+        write_csv(args.csv, stores, dishes, store_dishes)
+        print(f"CSV files saved to: {args.csv}")
@@ -0,0 +1,184 @@
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from db_pool import pool_from_env
+
+# CSV 대량 적재 (청크 단위 읽기 + executemany 다중 행 upsert, 다시 실행해도 중복 없음)
+#   python bulk_load.py dishes data/dish_db.csv
+#   python bulk_load.py images data/dish_images.csv
+#   python bulk_load.py store_dishes menu_feed.csv
+logger = logging.getLogger(__name__)
+
+# 한글/변형 헤더 -> 컬럼 이름
+HEADER_ALIASES = {
+    '번호': 'id',
+    '이름': 'name',
+    '반찬이름': 'name',
+    'dish_name': 'name',
+    '주요재료': 'main_ingredients',
+    '분류': 'category',
+    '맛': 'flavor',
+    '특징': 'characteristics',
+    '계절': 'season',
+    '조리방법': 'cooking_method',
+    '이미지': 'image_url',
+    '이미지url': 'image_url',
+    '가게번호': 'store_id',
+    '가게id': 'store_id',
+    '반찬번호': 'dish_id',
+    '반찬id': 'dish_id',
+    '가격': 'price',
+}
+
+DISH_COLUMNS = ['name', 'main_ingredients', 'category', 'flavor', 'characteristics', 'season', 'cooking_method']
+
+
+def normalize_header(header):
+    key = str(header).replace('\ufeff', '').strip()
+    compact = key.replace(' ', '').replace('_', '').lower()
+    return HEADER_ALIASES.get(key, HEADER_ALIASES.get(compact, key.lower()))
+
+
+# CSV 를 chunk_size 행씩 읽어 정규화된 헤더와 None 결측값으로 반환
+def read_chunks(path, chunk_size=10000, encoding='utf-8-sig'):
+    reader = pd.read_csv(path, dtype=str, chunksize=chunk_size, encoding=encoding, skipinitialspace=True)
+    for chunk in reader:
+        chunk = chunk.rename(columns=normalize_header)
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        for column in chunk.columns:
+            chunk[column] = chunk[column].str.strip()
+        yield chunk.astype(object).where(chunk.notna() & (chunk != ''), None)
+
+
+def _require(chunk, columns, kind):
+    missing = [column for column in columns if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"{kind} feed is missing columns: {missing}")
+
+
+def _rows(chunk, columns):
+    return list(chunk[columns].itertuples(index=False, name=None))
+
+
+# 반찬: 번호(id) 가 있으면 id 기준 upsert, 없으면 이름 기준 병합 (임시 테이블 + UPDATE JOIN / INSERT SELECT)
+def load_dishes_chunk(cursor, chunk):
+    _require(chunk, ['name'], 'dishes')
+    columns = [column for column in DISH_COLUMNS + ['image_url'] if column in chunk.columns]
+    chunk = chunk[chunk['name'].notna()]
+    if 'id' in chunk.columns:
+        chunk = chunk.drop_duplicates(subset='id', keep='last')
+        all_columns = ['id'] + columns
+        updates = ', '.join(f"{column} = VALUES({column})" for column in columns)
+        cursor.executemany(
+            f"INSERT INTO dishes ({', '.join(all_columns)}) VALUES ({', '.join(['%s'] * len(all_columns))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}",
+            _rows(chunk, all_columns)
+        )
+        return len(chunk)
+
+    duplicates = int(chunk['name'].duplicated(keep='last').sum())
+    if duplicates:
+        logger.warning(f"{duplicates} duplicate dish names in chunk; keeping the last row for each")
+    chunk = chunk.drop_duplicates(subset='name', keep='last')
+    _stage(cursor, 'dish_stage', columns, _rows(chunk, columns))
+    updates = ', '.join(f"d.{column} = s.{column}" for column in columns if column != 'name')
+    if updates:
+        cursor.execute(f"UPDATE dishes d JOIN dish_stage s ON d.name = s.name SET {updates}")
+    cursor.execute(
+        f"INSERT INTO dishes ({', '.join(columns)}) "
+        f"SELECT {', '.join('s.' + column for column in columns)} FROM dish_stage s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM dishes d WHERE d.name = s.name)"
+    )
+    return len(chunk)
+
+
+# 이미지: 이름이 같은 반찬의 image_url 갱신 (임시 테이블에 모은 뒤 UPDATE JOIN 한 번)
+def load_images_chunk(cursor, chunk):
+    _require(chunk, ['name', 'image_url'], 'images')
+    chunk = chunk[chunk['name'].notna() & chunk['image_url'].notna()].drop_duplicates(subset='name', keep='last')
+    _stage(cursor, 'image_stage', ['name', 'image_url'], _rows(chunk, ['name', 'image_url']))
+    cursor.execute("UPDATE dishes d JOIN image_stage s ON d.name = s.name SET d.image_url = s.image_url")
+    return len(chunk)
+
+
+# 가게별 메뉴: (store_id, dish_id) 기준 가격 upsert
+def load_store_dishes_chunk(cursor, chunk):
+    _require(chunk, ['store_id', 'dish_id', 'price'], 'store_dishes')
+    chunk = chunk.dropna(subset=['store_id', 'dish_id']).drop_duplicates(subset=['store_id', 'dish_id'], keep='last')
+    cursor.executemany(
+        "INSERT INTO store_dishes (store_id, dish_id, price) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE price = VALUES(price)",
+        _rows(chunk, ['store_id', 'dish_id', 'price'])
+    )
+    return len(chunk)
+
+
+# 청크마다 비우고 다시 채우는 연결 단위 임시 테이블
+def _stage(cursor, table, columns, rows):
+    definitions = ', '.join(f"{column} {'VARCHAR(255)' if column == 'name' else 'TEXT'}" for column in columns)
+    cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table} ({definitions}, INDEX (name))")
+    cursor.execute(f"DELETE FROM {table}")
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})", rows
+    )
+
+
+LOADERS = {
+    'dishes': load_dishes_chunk,
+    'images': load_images_chunk,
+    'store_dishes': load_store_dishes_chunk,
+}
+
+
+# 청크 하나를 트랜잭션 하나로 적재 (실패한 청크만 롤백) -> 적재 통계
+def bulk_load(connection, kind, path, chunk_size=10000, encoding='utf-8-sig'):
+    load_chunk = LOADERS[kind]
+    started = time.perf_counter()
+    total = 0
+    chunks = 0
+    cursor = connection.cursor()
+    try:
+        for chunk in read_chunks(path, chunk_size, encoding):
+            try:
+                total += load_chunk(cursor, chunk)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            chunks += 1
+            elapsed = time.perf_counter() - started
+            logger.info(f"{kind}: {total} rows in {chunks} chunks ({total / max(elapsed, 1e-9):.0f} rows/sec)")
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'kind': kind,
+        'path': path,
+        'rows': total,
+        'chunks': chunks,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(total / max(elapsed, 1e-9), 1),
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Bulk load catalog CSV feeds")
+    parser.add_argument('kind', choices=sorted(LOADERS))
+    parser.add_argument('path')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--encoding', default='utf-8-sig')
+    args = parser.parse_args()
+
+    db_pool = pool_from_env(charset='utf8mb4')
+    connection = db_pool.acquire()
+    try:
+        stats = bulk_load(connection, args.kind, args.path, args.chunk_size, args.encoding)
+        logger.info(f"Loaded {stats['rows']} {args.kind} rows in {stats['seconds']}s "
+                    f"({stats['rows_per_second']} rows/sec)")
+    finally:
+        connection.close()
+        db_pool.close()
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# 카탈로그 테이블 컬럼 정의 (빈 테이블이어도 동일한 스키마 유지)
+STORE_COLUMNS = ['id', 'name', 'location', 'telephone_number', 'latitude', 'longitude']
+DISH_COLUMNS = ['id', 'name', 'image_url', 'season', 'category', 'characteristics',
+                'main_ingredients', 'cooking_method', 'flavor']
+STORE_DISH_COLUMNS = ['store_id', 'dish_id', 'price']
+
+STORES_QUERY = "SELECT id, name, location, telephone_number, latitude, longitude FROM stores"
+DISHES_QUERY = """
+    SELECT id, name, image_url, season, category, characteristics,
+           main_ingredients, cooking_method, flavor
+    FROM dishes
+"""
+STORE_DISHES_QUERY = "SELECT store_id, dish_id, CAST(price AS SIGNED) as price FROM store_dishes"
+
+# 변경 감지용 프로브 (행 수 + 카탈로그가 읽는 컬럼 전체의 행별 CRC32 합)
+#   information_schema.TABLES.UPDATE_TIME 은 InnoDB 에서 재시작 시 초기화되고 갱신이 늦게 반영될 수 있어
+#   내용 체크섬으로 판단 (행 수가 같은 가격 / 이름 / 이미지 수정도 감지, 데이터를 가져오지 않고 DB 안에서 한 번 훑음)
+#   합이 우연히 같아지는 수정은 놓칠 수 있으므로 그때는 POST /admin/catalog/reload 로 강제 갱신
+PROBE_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM stores) as stores,
+        (SELECT COUNT(*) FROM dishes) as dishes,
+        (SELECT COUNT(*) FROM store_dishes) as store_dishes,
+        (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', id, name, location, telephone_number, latitude, longitude))), 0)
+         FROM stores) as stores_checksum,
+        (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', id, name, image_url, season, category, characteristics,
+                                              main_ingredients, cooking_method, flavor))), 0)
+         FROM dishes) as dishes_checksum,
+        (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', store_id, dish_id, price))), 0)
+         FROM store_dishes) as store_dishes_checksum
+"""
+
+# SQLite 대체 DB 용 프로브 (CRC32 가 없으므로 probe() 가 연결에 같은 이름의 함수를 등록)
+SQLITE_PROBE_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM stores) as stores,
+        (SELECT COUNT(*) FROM dishes) as dishes,
+        (SELECT COUNT(*) FROM store_dishes) as store_dishes,
+        (SELECT COALESCE(SUM(crc32(id, name, location, telephone_number, latitude, longitude)), 0)
+         FROM stores) as stores_checksum,
+        (SELECT COALESCE(SUM(crc32(id, name, image_url, season, category, characteristics,
+                                   main_ingredients, cooking_method, flavor)), 0)
+         FROM dishes) as dishes_checksum,
+        (SELECT COALESCE(SUM(crc32(store_id, dish_id, price)), 0) FROM store_dishes) as store_dishes_checksum
+"""
+
+
+# SQLite 프로브용 행 체크섬 (MariaDB 의 CRC32(CONCAT_WS('|', ...)) 와 같은 방식, NULL 은 건너뜀)
+def _crc32(*values):
+    return zlib.crc32('|'.join(str(value) for value in values if value is not None).encode('utf-8'))
+
+# 한 시점의 카탈로그 (요청 간 공유되는 읽기 전용 데이터)
+class CatalogSnapshot:
+    def __init__(self, stores, dishes, frame, version, fingerprint, generation, loaded_at, load_seconds):
+        self.stores = stores
+        self.dishes = dishes
+        self.frame = frame
+        self.version = version
+        self.fingerprint = fingerprint
+        self.generation = generation
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+        # 스냅샷과 함께 만들어지는 파생 구조 (인덱스 등)
+        self.extras = {}
+
+    @property
+    def row_counts(self):
+        return {
+            'stores': len(self.stores),
+            'dishes': len(self.dishes),
+            'store_dishes': len(self.frame),
+        }
+
+    # 반찬 id -> 카탈로그 행 번호 배열
+    def dish_rows(self):
+        return {dish_id: np.asarray(rows) for dish_id, rows in
+                self.frame.groupby('dish_id', sort=False).indices.items()}
+
+    # 가게 이름 -> id (요청 본문에 가게 이름만 있는 경우, 처음 호출할 때 한 번 생성, 없으면 None)
+    def store_id(self, name):
+        names = self.__dict__.get('_store_ids')
+        if names is None:
+            names = self.__dict__['_store_ids'] = dict(zip(self.stores['name'], self.stores['id']))
+        store_id = names.get(name)
+        return int(store_id) if store_id is not None else None
+
+    def summary(self):
+        return {
+            'version': self.version,
+            'generation': self.generation,
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 4),
+            'row_counts': self.row_counts,
+            'extras': sorted(self.extras),
+        }
+
+
+def _fetch_frame(connection, query, columns, table):
+    cursor = connection.cursor()
+    try:
+        with stage(f'sql.catalog_{table}'):
+            cursor.execute(query)
+            rows = list(cursor.fetchall())
+        return pd.DataFrame(rows, columns=columns)
+    finally:
+        cursor.close()
+
+
+# store_dishes JOIN stores JOIN dishes 를 메모리에서 수행
+def join_catalog(stores, dishes, store_dishes):
+    store_part = stores[['id', 'name', 'latitude', 'longitude']].rename(
+        columns={'id': 'store_id', 'name': 'store_name'}
+    )
+    dish_part = dishes.rename(columns={'id': 'dish_id'})
+    frame = store_dishes.merge(store_part, on='store_id', how='inner')
+    frame = frame.merge(dish_part, on='dish_id', how='inner')
+    return frame.reset_index(drop=True)
+
+
+# 테이블 내용 기반 버전 (워커가 달라도 같은 데이터면 같은 값)
+def content_version(*frames):
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(str(len(frame)).encode())
+        if len(frame):
+            hashed = pd.util.hash_pandas_object(frame.astype(str), index=False)
+            digest.update(hashed.values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class CatalogStore:
+    def __init__(self, connect, refresh_interval=30, probe_query=None):
+        self._connect = connect
+        self._probe_query = probe_query or PROBE_QUERY
+        self._refresh_interval = refresh_interval
+        self._reload_lock = threading.Lock()
+        self._snapshot = None
+        self._generation = 0
+        self._builders = []
+        self._refresh_thread = None
+
+    # 스냅샷 로드 시 함께 만들 파생 구조 등록
+    # incremental=True 이면 builder(snapshot, previous) 로 이전 스냅샷의 구조를 넘겨 변경분만 반영
+    def register_builder(self, name, builder, incremental=False):
+        self._builders.append((name, builder, incremental))
+        snapshot = self._snapshot
+        if snapshot is not None and name not in snapshot.extras:
+            snapshot.extras[name] = builder(snapshot, None) if incremental else builder(snapshot)
+
+    # 로드된 스냅샷 (없으면 None, 로드를 일으키지 않음)
+    def peek(self):
+        return self._snapshot
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.reload(force=False)
+        return snapshot
+
+    def probe(self, connection):
+        if isinstance(connection, sqlite3.Connection):
+            connection.create_function('crc32', -1, _crc32, deterministic=True)
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self._probe_query)
+            return repr(tuple(cursor.fetchone()))
+        finally:
+            cursor.close()
+
+    # force=False 이면 프로브 결과가 같을 때 기존 스냅샷 유지
+    def reload(self, force=True):
+        with self._reload_lock:
+            current = self._snapshot
+            started = time.perf_counter()
+            connection = self._connect()
+            try:
+                fingerprint = self.probe(connection)
+                if not force and current is not None and current.fingerprint == fingerprint:
+                    return current
+                stores = _fetch_frame(connection, STORES_QUERY, STORE_COLUMNS, 'stores')
+                dishes = _fetch_frame(connection, DISHES_QUERY, DISH_COLUMNS, 'dishes')
+                store_dishes = _fetch_frame(connection, STORE_DISHES_QUERY, STORE_DISH_COLUMNS, 'store_dishes')
+            finally:
+                connection.close()
+
+            version = content_version(stores, dishes, store_dishes)
+            if current is not None and current.version == version:
+                # 내용이 같으면 파생 구조를 다시 만들지 않음
+                current.fingerprint = fingerprint
+                return current
+
+            self._generation += 1
+            snapshot = CatalogSnapshot(
+                stores, dishes, join_catalog(stores, dishes, store_dishes),
+                version, fingerprint, self._generation, time.time(), 0.0
+            )
+            for name, builder, incremental in self._builders:
+                with stage(f'catalog.build_{name}'):
+                    if incremental:
+                        previous = current.extras.get(name) if current is not None else None
+                        snapshot.extras[name] = builder(snapshot, previous)
+                    else:
+                        snapshot.extras[name] = builder(snapshot)
+            snapshot.load_seconds = time.perf_counter() - started
+
+            # 참조 교체는 원자적이므로 진행 중인 요청은 이전 스냅샷을 그대로 사용
+            self._snapshot = snapshot
+            logger.info(f"Catalog loaded: version={version} rows={snapshot.row_counts} "
+                        f"in {snapshot.load_seconds:.3f}s")
+            return snapshot
+
+    def start_background_refresh(self):
+        if self._refresh_interval <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name='catalog-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self._refresh_interval)
+            if self._snapshot is None:
+                continue
+            try:
+                self.reload(force=False)
+            except Exception as e:
+                logger.error(f"Background catalog refresh failed: {e}")
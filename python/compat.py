@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from scoring import SERVER_WEIGHTS, score_dishes, split_tokens
+
+logger = logging.getLogger(__name__)
+
+# 반찬 x 반찬 관계 비트 (행: 사용자 반찬, 열: 후보 반찬)
+SHARED_INGREDIENT = np.uint8(1)
+SAME_COOKING = np.uint8(2)
+SAME_CATEGORY = np.uint8(4)
+SAME_FLAVOR = np.uint8(8)
+
+ATTRIBUTE_COLUMNS = ['cooking_method', 'category', 'flavor', 'main_ingredients']
+
+RELATIONS_FILE = 'compat_relations.npy'
+DISH_IDS_FILE = 'compat_dish_ids.npy'
+META_FILE = 'compat_meta.json'
+
+
+def _value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return str(value)
+
+
+def _attributes(dish):
+    return (
+        _value(dish['cooking_method']),
+        _value(dish['category']),
+        _value(dish['flavor']),
+        tuple(sorted(set(split_tokens(dish['main_ingredients'])))),
+    )
+
+
+# 같은 값 여부 (결측값은 어떤 값과도 같지 않음)
+def _same(values, value):
+    if value is None:
+        return np.zeros(len(values), dtype=bool)
+    return np.fromiter((other == value for other in values), dtype=bool, count=len(values))
+
+
+# 미리 계산한 반찬 간 관계 행렬 (uint8 비트필드, 반찬 수 D 일 때 D x D 바이트)
+#   요청 점수는 사용자 반찬 행들의 OR(재료/조리/카테고리)와 가중 합(맛)만으로 계산
+class CompatMatrix:
+    def __init__(self, dish_ids, attributes, relations, version=None, owned=True):
+        self.dish_ids = np.asarray(dish_ids, dtype=np.int64)
+        self.attributes = list(attributes)
+        self.relations = relations
+        self.version = version
+        # False 이면 relations 를 다른 스냅샷/파일과 공유 중이므로 수정 전에 복사
+        self._owned = owned
+        self._position = {int(dish_id): index for index, dish_id in enumerate(self.dish_ids)}
+        # 카탈로그 반찬 순서 -> 행렬 위치 캐시 (EncodedCatalog, 만들 때의 dish_ids 배열, 위치)
+        #   반찬 추가/삭제 시 dish_ids 배열이 새로 만들어지므로 배열이 바뀌면 다시 계산
+        self._columns_cache = (None, None, None)
+
+    @property
+    def size(self):
+        return len(self.dish_ids)
+
+    def positions(self, dish_ids):
+        return np.array([self._position.get(int(dish_id), -1) for dish_id in dish_ids], dtype=np.int64)
+
+    def _columns(self, encoded):
+        cached_encoded, cached_ids, columns = self._columns_cache
+        if cached_encoded is encoded and cached_ids is self.dish_ids:
+            return columns
+        columns = self.positions(encoded.dish_ids)
+        if (columns < 0).any():
+            raise ValueError("Compatibility matrix is missing dishes from the catalog")
+        self._columns_cache = (encoded, self.dish_ids, columns)
+        return columns
+
+    # 한 반찬과 전체 반찬의 관계 (행/열 갱신용)
+    def _relation_vector(self, attributes):
+        cooking, category, flavor, ingredients = attributes
+        columns = list(zip(*self.attributes)) if self.attributes else [(), (), (), ()]
+        vector = np.zeros(self.size, dtype=np.uint8)
+        vector[_same(columns[0], cooking)] |= SAME_COOKING
+        vector[_same(columns[1], category)] |= SAME_CATEGORY
+        vector[_same(columns[2], flavor)] |= SAME_FLAVOR
+        if ingredients:
+            ingredients = set(ingredients)
+            shared = np.fromiter((not ingredients.isdisjoint(other) for other in columns[3]), dtype=bool,
+                                 count=self.size)
+            vector[shared] |= SHARED_INGREDIENT
+        return vector
+
+    # 새 반찬 자리를 한 번에 확보 (여러 반찬 추가 시 행렬 복사는 한 번만)
+    def _grow(self, dish_ids):
+        dish_ids = [int(dish_id) for dish_id in dish_ids if int(dish_id) not in self._position]
+        if not dish_ids:
+            return
+        size = self.size
+        relations = np.zeros((size + len(dish_ids), size + len(dish_ids)), dtype=np.uint8)
+        relations[:size, :size] = self.relations
+        self.relations = relations
+        self._owned = True
+        self.dish_ids = np.append(self.dish_ids, dish_ids)
+        self.attributes.extend([(None, None, None, ())] * len(dish_ids))
+        for offset, dish_id in enumerate(dish_ids):
+            self._position[dish_id] = size + offset
+
+    # 반찬 추가/수정: 해당 행과 열만 다시 계산
+    def upsert(self, dish):
+        dish_id = int(dish['id'])
+        self._grow([dish_id])
+        if not self._owned or not self.relations.flags.writeable:
+            self.relations = np.array(self.relations)
+            self._owned = True
+        position = self._position[dish_id]
+        attributes = _attributes(dish)
+        self.attributes[position] = attributes
+        vector = self._relation_vector(attributes)
+        self.relations[position, :] = vector
+        self.relations[:, position] = vector
+        return position
+
+    def remove(self, dish_id):
+        position = self._position.pop(int(dish_id), None)
+        if position is None:
+            return
+        keep = np.arange(self.size) != position
+        self.relations = self.relations[np.ix_(keep, keep)]
+        self._owned = True
+        self.dish_ids = self.dish_ids[keep]
+        del self.attributes[position]
+        self._position = {int(dish_id): index for index, dish_id in enumerate(self.dish_ids)}
+
+    # dishes 테이블과 달라진 반찬만 반영 -> 바뀐 반찬 수
+    def sync(self, dishes):
+        records = dishes[['id'] + ATTRIBUTE_COLUMNS].to_dict(orient='records')
+        current = {int(dish['id']) for dish in records}
+        removed = [int(dish_id) for dish_id in self.dish_ids if int(dish_id) not in current]
+        for dish_id in removed:
+            self.remove(dish_id)
+        changed = [dish for dish in records if int(dish['id']) not in self._position
+                   or self.attributes[self._position[int(dish['id'])]] != _attributes(dish)]
+        self._grow([dish['id'] for dish in changed])
+        for dish in changed:
+            self.upsert(dish)
+        return len(changed) + len(removed)
+
+    # 카탈로그 반찬 순서(encoded.dish_ids)의 점수 벡터
+    #   재료/조리/카테고리: 사용자 반찬 행의 OR, 맛: 판매 행 수로 가중한 합
+    def score(self, encoded, user_dishes, selected_season=None, weights=SERVER_WEIGHTS):
+        counts = encoded.user_counts(user_dishes)
+        user_index = np.flatnonzero(counts)
+        n_user_rows = int(counts.sum())
+        columns = self._columns(encoded)
+        rows = self.relations[columns[user_index]][:, columns]
+        any_relation = np.bitwise_or.reduce(rows, axis=0) if len(user_index) else np.zeros(len(columns), np.uint8)
+        scores = np.zeros(encoded.size, dtype=np.int64)
+
+        if n_user_rows and (weights.ingredient_shared or weights.ingredient_new):
+            shared = (any_relation & SHARED_INGREDIENT) > 0
+            scores += np.where(shared, weights.ingredient_shared, weights.ingredient_new)
+
+        if weights.cooking_known or weights.cooking_new:
+            known = (any_relation & SAME_COOKING) > 0
+            scores += np.where(known, weights.cooking_known, weights.cooking_new)
+
+        if weights.category_known or weights.category_new:
+            known = (any_relation & SAME_CATEGORY) > 0
+            factor = n_user_rows if weights.category_per_user_dish else 1
+            scores += np.where(known, weights.category_known, weights.category_new) * factor
+
+        if n_user_rows and (weights.flavor_same or weights.flavor_different):
+            same = ((rows & SAME_FLAVOR) > 0).astype(np.int64).T @ counts[user_index]
+            scores += same * weights.flavor_same + (n_user_rows - same) * weights.flavor_different
+
+        if selected_season and weights.season:
+            season_code = encoded.season_vocab.get(selected_season, -2)
+            scores += np.where(encoded.season_codes == season_code, weights.season, 0)
+
+        return scores
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, RELATIONS_FILE), np.ascontiguousarray(self.relations))
+        np.save(os.path.join(directory, DISH_IDS_FILE), self.dish_ids)
+        with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'attributes': self.attributes}, f, ensure_ascii=False)
+
+    # mmap 으로 열어 여러 워커가 같은 페이지를 공유 (갱신 시에만 복사)
+    @classmethod
+    def load(cls, directory, mmap=True):
+        relations = np.load(os.path.join(directory, RELATIONS_FILE), mmap_mode='r' if mmap else None)
+        dish_ids = np.load(os.path.join(directory, DISH_IDS_FILE))
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        attributes = [(cooking, category, flavor, tuple(ingredients))
+                      for cooking, category, flavor, ingredients in meta['attributes']]
+        return cls(dish_ids, attributes, relations, meta.get('version'), owned=not mmap)
+
+
+# dishes 전체로 행렬을 한 번에 생성 (열 단위 배열 비교, 재료는 64비트 워드 단위 AND)
+def build_compat_matrix(dishes, version=None):
+    attributes = [_attributes(dish) for dish in dishes[['id'] + ATTRIBUTE_COLUMNS].to_dict(orient='records')]
+    size = len(attributes)
+    relations = np.zeros((size, size), dtype=np.uint8)
+    for column, bit in ((0, SAME_COOKING), (1, SAME_CATEGORY), (2, SAME_FLAVOR)):
+        codes, _ = pd.factorize(pd.Series([values[column] for values in attributes], dtype=object),
+                                use_na_sentinel=True)
+        same = (codes[:, None] == codes[None, :]) & (codes >= 0)[:, None]
+        relations[same] |= bit
+
+    vocab = {}
+    for values in attributes:
+        for token in values[3]:
+            vocab.setdefault(token, len(vocab))
+    words = np.zeros((size, max(1, (len(vocab) + 63) // 64)), dtype=np.uint64)
+    for row, values in enumerate(attributes):
+        for token in values[3]:
+            code = vocab[token]
+            words[row, code // 64] |= np.uint64(1) << np.uint64(code % 64)
+    shared = np.zeros((size, size), dtype=bool)
+    for word in words.T:
+        shared |= (word[:, None] & word[None, :]) != 0
+    relations[shared] |= SHARED_INGREDIENT
+    return CompatMatrix(dishes['id'].to_numpy(), attributes, relations, version)
+
+
+# 카탈로그 빌더: 이전 행렬이 있으면 바뀐 반찬의 행/열만 갱신
+#   COMPAT_MATRIX_DIR 이 있으면 처음에는 저장된 행렬을 불러와 동기화
+#   반찬 수가 COMPAT_MAX_DISHES 보다 많으면 (D x D 메모리) 만들지 않고 규칙 기반 점수 사용
+def build_compat(snapshot, previous=None):
+    max_dishes = int(os.getenv('COMPAT_MAX_DISHES', '5000'))
+    if len(snapshot.dishes) > max_dishes:
+        logger.info(f"Skipping compatibility matrix: {len(snapshot.dishes)} dishes > {max_dishes}")
+        return None
+    if previous is None:
+        directory = os.getenv('COMPAT_MATRIX_DIR')
+        if directory and os.path.exists(os.path.join(directory, RELATIONS_FILE)):
+            previous = CompatMatrix.load(directory)
+        else:
+            return build_compat_matrix(snapshot.dishes, snapshot.version)
+    else:
+        previous = CompatMatrix(previous.dish_ids, previous.attributes, previous.relations, previous.version,
+                                owned=False)
+    changed = previous.sync(snapshot.dishes)
+    previous.version = snapshot.version
+    logger.info(f"Compatibility matrix synced: {changed} dishes changed")
+    return previous
+
+
+# 규칙 기반 점수(score_dishes)와 행렬 점수가 같은지 임의 사용자 입력으로 확인 -> 불일치 수
+def check_consistency(compat, encoded, samples=200, max_user_dishes=5, weights=SERVER_WEIGHTS, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(encoded.name_to_dishes)
+    seasons = [None] + list(encoded.season_vocab)
+    mismatches = 0
+    for _ in range(samples):
+        size = int(rng.integers(0, max_user_dishes + 1))
+        user_dishes = list(rng.choice(names, size=min(size, len(names)), replace=False)) if names else []
+        season = seasons[int(rng.integers(0, len(seasons)))]
+        expected = score_dishes(encoded, user_dishes, season, weights)
+        actual = compat.score(encoded, user_dishes, season, weights)
+        if not np.array_equal(expected, actual):
+            mismatches += 1
+            logger.warning(f"Compatibility score mismatch for {user_dishes} / {season}")
+    return mismatches
@@ -0,0 +1,233 @@
+import logging
+import os
+import threading
+import time
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# 풀에서 빌린 연결 (close() 하면 실제로 닫지 않고 풀에 반납)
+class PooledConnection:
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = created_at
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise pymysql.err.InterfaceError("Connection already returned to pool")
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self.created_at)
+
+    # 오류로 상태를 알 수 없는 연결은 풀에 돌려놓지 않고 폐기
+    def discard(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self.created_at, broken=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, max_lifetime=3600, validate_idle=30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate_idle = validate_idle
+
+        self._cond = threading.Condition()
+        self._idle = []  # (raw, created_at, last_used)
+        self._size = 0
+        self._closed = False
+        self._counters = dict.fromkeys(
+            ['created', 'closed', 'acquired', 'waits', 'timeouts', 'validation_failures', 'recycled'], 0
+        )
+        self._wait_seconds = 0.0
+
+    def _open(self):
+        raw = self._connect()
+        with self._cond:
+            self._counters['created'] += 1
+        return raw
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+        with self._cond:
+            self._counters['closed'] += 1
+
+    # 오래 쉰 연결은 빌려주기 전에 ping 으로 확인
+    def _is_alive(self, raw):
+        try:
+            ping = getattr(raw, 'ping', None)
+            if ping is not None:
+                ping(reconnect=False)
+            else:
+                cursor = raw.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed validation: {e}")
+            return False
+
+    # 최소 개수만큼 미리 연결
+    def warm(self):
+        while True:
+            with self._cond:
+                if self._size >= self.min_size or self._closed:
+                    return
+                self._size += 1
+            try:
+                raw = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((raw, time.monotonic(), time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise pymysql.err.InterfaceError("Connection pool is closed")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection available within {timeout}s")
+                    if not waited:
+                        waited = True
+                        self._counters['waits'] += 1
+                    self._cond.wait(remaining)
+
+            now = time.monotonic()
+            if entry is None:
+                try:
+                    raw = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = now
+            else:
+                raw, created_at, last_used = entry
+                # 수명이 다했거나 검증에 실패한 연결은 버리고 다시 시도
+                if self.max_lifetime and now - created_at > self.max_lifetime:
+                    with self._cond:
+                        self._counters['recycled'] += 1
+                    self._drop(raw)
+                    continue
+                if self.validate_idle is not None and now - last_used >= self.validate_idle and not self._is_alive(raw):
+                    with self._cond:
+                        self._counters['validation_failures'] += 1
+                    self._drop(raw)
+                    continue
+
+            with self._cond:
+                self._counters['acquired'] += 1
+                self._wait_seconds += time.monotonic() - started
+            return PooledConnection(self, raw, created_at)
+
+    def _drop(self, raw):
+        self._close_raw(raw)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _release(self, raw, created_at, broken=False):
+        if not broken:
+            try:
+                # 열린 트랜잭션을 정리해 다음 사용자가 오래된 스냅샷을 보지 않도록 함
+                raw.rollback()
+            except Exception as e:
+                logger.warning(f"Rollback on release failed: {e}")
+                broken = True
+        with self._cond:
+            if not broken and not self._closed:
+                self._idle.append((raw, created_at, time.monotonic()))
+                self._cond.notify()
+                return
+        self._drop(raw)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'wait_seconds_total': round(self._wait_seconds, 6),
+            })
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for raw, _, _ in idle:
+            self._drop(raw)
+
+
+# 환경 변수 기반 MariaDB 연결 함수
+def mysql_connector(**kwargs):
+    def connect():
+        return pymysql.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', '1111'),
+            database=os.getenv('DB_NAME', 'bapsim'),
+            **kwargs
+        )
+    return connect
+
+
+# 환경 변수 기반 연결 풀 (DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_MAX_LIFETIME, DB_POOL_VALIDATE_IDLE)
+def pool_from_env(connect=None, **kwargs):
+    return ConnectionPool(
+        connect or mysql_connector(**kwargs),
+        min_size=int(os.getenv('DB_POOL_MIN', '1')),
+        max_size=int(os.getenv('DB_POOL_MAX', '10')),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+        validate_idle=float(os.getenv('DB_POOL_VALIDATE_IDLE', '30')),
+    )
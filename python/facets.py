@@ -0,0 +1,217 @@
+import json
+
+import numpy as np
+
+from scoring import split_tokens
+
+# 반찬 속성 facet 비트셋 인덱스 (카탈로그 로드 시 한 번 생성)
+#   facet 값마다 반찬 수만큼의 비트셋 하나 (64비트 워드 배열), 필터 식은 비트 AND / OR / NOT 으로 계산
+#   요청마다 characteristics 같은 문자열 컬럼을 훑지 않고, 추천 후보 행에는 반찬 -> 행 매핑(row_dish)으로 펼쳐 적용
+#   필터 식: "facet:값" 문자열, 목록(AND), {"and": [...]}, {"or": [...]}, {"not": 식}
+#     {"and": ["characteristics:비건", {"not": {"or": ["allergen:대두", "allergen:밀"]}}]}
+
+# 쉼표 구분 값을 그대로 토큰으로 쓰는 컬럼
+TOKEN_FACETS = ['characteristics', 'season', 'category', 'flavor', 'cooking_method']
+
+# 이름 끝말로 정하는 요리 형태 (긴 끝말부터 확인)
+FORM_SUFFIXES = ['찌개', '볶음', '조림', '무침', '구이', '나물', '김치', '장아찌', '전', '찜', '탕', '국']
+
+# 주요 재료 -> 알레르기 유발 성분 (식품 알레르기 표시 대상 기준), 재료 이름에 포함되면 표시
+#   간장 / 고추장처럼 여러 성분이 들어가거나 해물처럼 섞인 재료는 들어갈 수 있는 성분을 모두 표시
+ALLERGEN_INGREDIENTS = {
+    '계란': ('난류',), '달걀': ('난류',), '메추리알': ('난류',), '마요네즈': ('난류',),
+    '우유': ('우유',), '치즈': ('우유',), '버터': ('우유',), '생크림': ('우유',),
+    '메밀': ('메밀',), '땅콩': ('땅콩',), '호두': ('호두',), '복숭아': ('복숭아',), '토마토': ('토마토',),
+    '콩': ('대두',), '두부': ('대두',), '된장': ('대두',), '청국장': ('대두',), '쌈장': ('대두',), '유부': ('대두',),
+    '간장': ('대두', '밀'), '고추장': ('대두', '밀'),
+    '밀가루': ('밀',), '부침가루': ('밀',), '튀김가루': ('밀',), '빵가루': ('밀',), '국수': ('밀',), '어묵': ('밀',),
+    '소세지': ('돼지고기', '밀'), '돼지': ('돼지고기',), '삼겹살': ('돼지고기',), '베이컨': ('돼지고기',),
+    '소고기': ('쇠고기',), '쇠고기': ('쇠고기',), '차돌': ('쇠고기',), '닭': ('닭고기',),
+    '고등어': ('고등어',), '새우': ('새우',), '꽃게': ('게',), '게살': ('게',), '게장': ('게',),
+    '오징어': ('오징어',), '진미채': ('오징어',),
+    '조개': ('조개류',), '바지락': ('조개류',), '홍합': ('조개류',), '전복': ('조개류',), '꼬막': ('조개류',),
+    '해물': ('새우', '오징어', '조개류', '게'), '해산물': ('새우', '오징어', '조개류', '게'),
+}
+# 한 글자라 다른 재료 이름에 섞이기 쉬운 재료 (재료 이름이 정확히 같을 때만 표시)
+ALLERGEN_EXACT_INGREDIENTS = {'게': ('게',), '굴': ('조개류',), '햄': ('돼지고기',), '잣': ('잣',)}
+
+# 필터 식 크기 제한 (요청 하나가 비트 연산을 과도하게 만들지 않도록)
+MAX_DEPTH = 16
+MAX_TERMS = 256
+
+# 잘못된 필터 식 (서버는 400 으로 응답)
+class FilterError(ValueError):
+    pass
+
+
+# 바이트별 1 비트 수 (np.bitwise_count 가 없는 NumPy 에서도 동작)
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+
+
+def allergens(ingredients):
+    found = []
+    for ingredient in ingredients:
+        for allergen in ALLERGEN_EXACT_INGREDIENTS.get(ingredient, ()):
+            found.append(allergen)
+        for keyword, names in ALLERGEN_INGREDIENTS.items():
+            if keyword in ingredient:
+                found.extend(names)
+    return list(dict.fromkeys(found))
+
+
+def dish_form(name):
+    name = str(name or '')
+    for suffix in FORM_SUFFIXES:
+        if name.endswith(suffix):
+            return [suffix]
+    return []
+
+
+# 반찬 한 행 -> {facet: [값, ...]}
+def dish_facets(dish):
+    values = {facet: split_tokens(dish[facet]) for facet in TOKEN_FACETS}
+    values['allergen'] = allergens(split_tokens(dish['main_ingredients']))
+    values['form'] = dish_form(dish['name'])
+    return values
+
+
+class FacetIndex:
+    def __init__(self, dishes):
+        self.dish_ids = dishes['id'].to_numpy()
+        self.size = len(self.dish_ids)
+        n_words = max(1, (self.size + 63) // 64)
+        # (facet, 값) -> bits 행 번호, facet -> 값 목록 (처음 나온 순서)
+        self.keys = {}
+        self.facets = {facet: [] for facet in TOKEN_FACETS + ['allergen', 'form']}
+        positions = []
+        records = dishes[['name', 'main_ingredients'] + TOKEN_FACETS].to_dict(orient='records')
+        for index, dish in enumerate(records):
+            for facet, values in dish_facets(dish).items():
+                for value in values:
+                    key = (facet, value)
+                    if key not in self.keys:
+                        self.keys[key] = len(self.keys)
+                        self.facets[facet].append(value)
+                    positions.append((self.keys[key], index))
+        self.bits = np.zeros((len(self.keys), n_words), dtype=np.uint64)
+        if positions:
+            rows, dishes_index = np.array(positions, dtype=np.int64).T
+            np.bitwise_or.at(self.bits, (rows, dishes_index // 64),
+                             np.left_shift(np.uint64(1), (dishes_index % 64).astype(np.uint64)))
+        # 실제 반찬 위치만 1 인 비트셋 (NOT 결과에서 마지막 워드의 남는 비트 제거용)
+        self.all = np.zeros(n_words, dtype=np.uint64)
+        full, rest = divmod(self.size, 64)
+        self.all[:full] = np.uint64(2 ** 64 - 1)
+        if rest:
+            self.all[full] = np.uint64(2 ** rest - 1)
+
+    # 공유 카탈로그 저장용 (비트셋 배열, 값 목록) -> shared_state() / from_shared()
+    def shared_state(self):
+        return {'dish_ids': self.dish_ids, 'bits': self.bits, 'all': self.all}, \
+            {'size': self.size, 'keys': self.keys, 'facets': self.facets}
+
+    # shared_state() 로 저장한 값으로 복원 (비트셋은 읽기 전용 mmap 그대로 사용)
+    @classmethod
+    def from_shared(cls, arrays, objects):
+        index = cls.__new__(cls)
+        index.__dict__.update(arrays)
+        index.__dict__.update(objects)
+        return index
+
+    def value_bits(self, facet, value):
+        if facet not in self.facets:
+            raise FilterError(f"unknown facet {facet!r}; expected one of {sorted(self.facets)}")
+        row = self.keys.get((facet, value))
+        return self.bits[row] if row is not None else np.zeros_like(self.all)
+
+    # 필터 식 -> 반찬 비트셋 (None 이면 전체, 인덱스 배열을 그대로 돌려줄 수 있으므로 결과를 수정하지 않음)
+    def evaluate(self, expression):
+        budget = [MAX_TERMS]
+        return self._evaluate(expression, 0, budget)
+
+    def _evaluate(self, expression, depth, budget):
+        if expression is None:
+            return self.all
+        if depth > MAX_DEPTH:
+            raise FilterError(f"filter is nested deeper than {MAX_DEPTH} levels")
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise FilterError(f"filter has more than {MAX_TERMS} terms")
+        if isinstance(expression, str):
+            facet, separator, value = expression.partition(':')
+            if not separator:
+                raise FilterError(f"filter term {expression!r} must look like 'facet:value'")
+            return self.value_bits(facet.strip(), value.strip())
+        if isinstance(expression, list):
+            expression = {'and': expression}
+        if not isinstance(expression, dict) or len(expression) != 1:
+            raise FilterError("filter must be a 'facet:value' string, a list, or an object with one of and / or / not")
+        operator, operand = next(iter(expression.items()))
+        if operator == 'not':
+            return ~self._evaluate(operand, depth + 1, budget) & self.all
+        if operator not in ('and', 'or') or not isinstance(operand, list):
+            raise FilterError(f"'{operator}' must be one of and / or (with a list) or not")
+        if operator == 'and':
+            bits = self.all.copy()
+            for item in operand:
+                bits &= self._evaluate(item, depth + 1, budget)
+        else:
+            bits = np.zeros_like(self.all)
+            for item in operand:
+                bits |= self._evaluate(item, depth + 1, budget)
+        return bits
+
+    # 비트셋 -> 반찬별 bool 배열
+    def dish_mask(self, bits):
+        return np.unpackbits(bits.view(np.uint8), bitorder='little')[:self.size].astype(bool)
+
+    # 비트셋 -> 카탈로그 행별 bool 배열 (row_dish: 행 -> 반찬 위치)
+    def row_mask(self, bits, row_dish):
+        return self.dish_mask(bits)[row_dish]
+
+    def count(self, bits):
+        return int(_POPCOUNT[bits.view(np.uint8)].sum())
+
+    # 결과 비트셋 안에서 facet 값별 반찬 수 (값 전체를 행렬 AND 한 번으로 계산, 0 인 값은 제외)
+    def facet_counts(self, bits, facets=None):
+        counts = _POPCOUNT[(self.bits & bits).view(np.uint8)].sum(axis=1) if len(self.keys) else []
+        result = {}
+        for facet in facets or self.facets:
+            if facet not in self.facets:
+                raise FilterError(f"unknown facet {facet!r}; expected one of {sorted(self.facets)}")
+            values = {value: int(counts[self.keys[(facet, value)]]) for value in self.facets[facet]}
+            result[facet] = {value: count for value, count in sorted(values.items(), key=lambda item: -item[1])
+                             if count}
+        return result
+
+
+def build_facet_index(snapshot):
+    return FacetIndex(snapshot.dishes)
+
+
+# 요청의 filter 값 (JSON 본문의 식 또는 쿼리 문자열) -> 필터 식
+#   쿼리 문자열은 JSON 이거나 "facet:값" 하나
+def parse_filter(value):
+    if value is None or isinstance(value, (list, dict)):
+        return value
+    value = str(value).strip()
+    if not value:
+        return None
+    if value[0] in '[{"':
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            raise FilterError(f"filter is not valid JSON: {e}")
+    return value
+
+
+# 추천 요청 조건 (비건 / 국물요리 제외 / 사용자 필터) 을 필터 식 하나로
+def recommend_filter(vegan_only=False, include_soup_option=True, expression=None):
+    terms = []
+    if vegan_only:
+        terms.append('characteristics:비건')
+    if not include_soup_option:
+        terms.append({'not': 'characteristics:국물요리'})
+    if expression is not None:
+        terms.append(expression)
+    return {'and': terms} if terms else None
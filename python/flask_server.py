@@ -1,11 +1,29 @@
-from flask import Flask, request, jsonify, g
-import pandas as pd
+from flask import Flask, Response, request, jsonify, g
+import numpy as np
 import pymysql
 import logging
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import math
+import time
+from urllib.parse import urlencode
+
+from db_pool import pool_from_env
+from facets import FilterError
+from http_cache import cache_from_env
+from image_proxy import image_response, image_store_from_env
+from log_pipeline import REQUEST_ID_HEADER, begin_request, configure_logging, end_request
+from metrics import CONTENT_TYPE, IN_FLIGHT, REGISTRY, catalog_collector, observe_request, stage, stats_collector
+from orders import build_order_record, order_store_from_env
+from popularity import parse_events, popularity_from_env, record_events, record_order
+from recommend_cache import recommend_cache_from_env
+from reviews import build_review_record, review_log_from_env, sentiment_store_from_env
+from service import (STORE_MENU_PAGE_QUERY, STORE_MENU_QUERY, STORES_LIST_QUERY, STORES_PAGE_QUERY, catalog_from_env,
+                     filter_dishes, keyset_query, nearby_store_records, recommend_dishes_batch, cached_recommendation,
+                     parse_filter_request, parse_recommend_request, search_batches, search_page, search_records)
+from streaming import (MAX_PAGE_LIMIT, STREAM_BATCH_SIZE, clamp_limit, encode_batches, fetch_batches, split_page,
+                       stream_format, stream_mimetype)
+from spatial import haversine_km
 
 # 환경 변수 로드
 load_dotenv()
@@ -14,230 +32,496 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-# 로깅 설정
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# 로깅 설정 (큐 기반 백그라운드 기록, JSON 라인, 요청 ID / DEBUG 샘플링은 log_pipeline 참고)
+configure_logging()
 logger = logging.getLogger()
 
 # MariaDB 연결 관리
+def open_db_connection():
+    return pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', '1111'),
+        database=os.getenv('DB_NAME', 'bapsim')
+    )
+
+# 요청마다 새로 연결하지 않고 풀에서 빌려 씀
+db_pool = pool_from_env(open_db_connection)
+
 def get_db_connection():
     if 'db' not in g:
-        g.db = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', '1111'),
-            database=os.getenv('DB_NAME', 'bapsim')
-        )
+        g.db = db_pool.acquire()
     return g.db
 
 @app.teardown_appcontext
 def close_db_connection(exception):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        if exception is not None:
+            db.discard()
+        else:
+            db.close()
+
+# 프로세스 단위 카탈로그 스냅샷 (첫 요청 시 로드, 이후 변경 감지 시 백그라운드 재로드)
+#   CATALOG_SHARED_DIR 이 있으면 shared_catalog.py 로더가 저장한 배열을 워커끼리 공유
+catalog = catalog_from_env(db_pool.acquire)
+catalog.start_background_refresh()
+
+# 가게 목록 / 메뉴 응답 캐시 (카탈로그 버전이 같으면 DB 조회와 직렬화 생략)
+response_cache = cache_from_env()
+
+# 추천 결과 캐시 (정규화된 요청 + 카탈로그 버전 키, RECOMMEND_CACHE_MAX_ENTRIES=0 이면 사용 안 함)
+recommend_cache = recommend_cache_from_env()
+
+# 주문 로그 + 동시 주문 인덱스 (다른 워커가 추가한 주문은 백그라운드에서 이어 읽음)
+order_store = order_store_from_env()
+order_store.start_background_refresh()
+
+# 반찬 / 가게 / 위치 격자별 실시간 인기도 (POPULARITY_ENABLED=0 이면 사용 안 함)
+popularity = popularity_from_env()
+
+# 리뷰 로그 + 감성 집계 (review_sentiment.py 파이프라인이 저장한 파일을 주기적으로 다시 읽음)
+review_log = review_log_from_env()
+sentiment = sentiment_store_from_env()
+sentiment.start_background_refresh()
+
+# 반찬 이미지 프록시 (IMAGE_PROXY_ENABLED=0 이면 응답에 원본 image_url 을 그대로 사용)
+image_store = image_store_from_env()
+
+def image_base_url():
+    return os.getenv('IMAGE_PROXY_BASE_URL') or request.host_url.rstrip('/')
+
+# 응답 행의 image_url 을 /img 프록시 URL 로 바꾸는 함수 (스트리밍 중에는 요청 컨텍스트가 없으므로 미리 만듦)
+def image_rewriter(snapshot=None):
+    if image_store is None:
+        return lambda rows: rows
+    images = (snapshot or catalog.get()).extras['images']
+    base_url = image_base_url()
+    return lambda rows: images.rewrite(rows, base_url)
+
+# 요청 ID (X-Request-ID 헤더가 있으면 이어서 사용) 를 로그 레코드와 응답 헤더에 포함
+@app.before_request
+def start_request_log_context():
+    g.request_id, g.request_log_tokens = begin_request(request.headers.get(REQUEST_ID_HEADER))
+
+@app.after_request
+def add_request_id_header(response):
+    if 'request_id' in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+@app.teardown_request
+def finish_request_log_context(exception):
+    tokens = g.pop('request_log_tokens', None)
+    if tokens is not None:
+        end_request(tokens)
+
+# 요청 수 / 상태 코드 / 지연 시간 기록 (경로 템플릿 단위라 가게 id 마다 라벨이 늘지 않음)
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe_request(endpoint, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.teardown_request
+def finish_request_timer(exception):
+    if g.pop('request_started', None) is not None:
+        IN_FLIGHT.dec()
+
+# /metrics 에서 조회 시점에 읽는 연결 풀 / 캐시 / 카탈로그 게이지
+REGISTRY.register_collector(stats_collector('db_pool', db_pool.stats, 'Database connection pool stats'))
+REGISTRY.register_collector(stats_collector('http_cache', response_cache.stats, 'Response cache stats'))
+if recommend_cache is not None:
+    REGISTRY.register_collector(stats_collector('recommend_cache', recommend_cache.stats, 'Recommendation cache stats'))
+if image_store is not None:
+    REGISTRY.register_collector(stats_collector('image_cache', image_store.stats, 'Image cache stats'))
+REGISTRY.register_collector(catalog_collector(catalog))
+REGISTRY.register_collector(stats_collector('order_index', order_store.stats, 'Order co-occurrence index stats'))
+if popularity is not None:
+    REGISTRY.register_collector(stats_collector('popularity', popularity.stats, 'Popularity tracker stats'))
+REGISTRY.register_collector(stats_collector('review_sentiment', sentiment.stats, 'Review sentiment aggregate stats'))
+
+def cached_response(key, render):
+    payload = response_cache.get(catalog.get(), key, render)
+    status, body, headers = response_cache.respond(
+        payload,
+        if_none_match=request.headers.get('If-None-Match'),
+        if_modified_since=request.headers.get('If-Modified-Since'),
+        accept_encoding=request.headers.get('Accept-Encoding'),
+    )
+    return Response(body, status=status, headers=headers)
+
+def is_admin_request():
+    admin_token = os.getenv('ADMIN_TOKEN')
+    return not admin_token or request.headers.get('X-Admin-Token') == admin_token
+
+# 카탈로그 상태 조회 (버전, 로드 시각, 행 수)
+@app.route('/admin/catalog', methods=['GET'])
+def catalog_status():
+    try:
+        return jsonify(catalog.get().summary())
+    except Exception as e:
+        logger.error(f"Error loading catalog: {e}")
+        return jsonify({"error": "Failed to load catalog"}), 500
+
+# 연결 풀 상태 조회 (사용 중/유휴 연결 수, 대기 시간, 생성 수)
+@app.route('/admin/db_pool', methods=['GET'])
+def db_pool_status():
+    return jsonify(db_pool.stats())
+
+# 키셋 페이지 응답 (다음 페이지가 있으면 X-Next-After-Id, Link 헤더 추가)
+def page_response(rows, next_after_id):
+    response = jsonify(rows)
+    if next_after_id is not None:
+        args = request.args.to_dict()
+        args['after_id'] = int(next_after_id)
+        response.headers['X-Next-After-Id'] = str(args['after_id'])
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
+
+# 키셋 페이지 조회 (다음 페이지 확인용으로 limit + 1 행 조회)
+def fetch_page(query, params, after_id, limit, key, rewrite=None):
+    limit = clamp_limit(limit or MAX_PAGE_LIMIT)
+    query, params = keyset_query(query, params, after_id, limit + 1)
+    cursor = get_db_connection().cursor(pymysql.cursors.DictCursor)
+    with stage('sql.page'):
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    rows, next_after_id = split_page(rows, limit, key)
+    return page_response(rewrite(rows) if rewrite else rows, next_after_id)
+
+# 서버 측 커서에서 읽는 대로 내보내는 스트리밍 응답 (스트림 동안 전용 연결 사용)
+def stream_query(query, params, fmt, rewrite=None):
+    def generate():
+        connection = db_pool.acquire()
+        finished = False
+        try:
+            cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(query, params)
+            batches = fetch_batches(cursor, STREAM_BATCH_SIZE)
+            yield from encode_batches(map(rewrite, batches) if rewrite else batches, fmt)
+            cursor.close()
+            finished = True
+        except Exception as e:
+            logger.error(f"Error streaming query results: {e}")
+        finally:
+            # 중간에 끊긴 서버 측 커서는 남은 행을 모두 읽어야 하므로 연결째 폐기
+            if finished:
+                connection.close()
+            else:
+                connection.discard()
+    return Response(generate(), mimetype=stream_mimetype(fmt))
+
+def is_paged_request():
+    return 'after_id' in request.args or 'limit' in request.args
+
+def request_stream_format():
+    return stream_format(request.args.get('stream'), request.headers.get('Accept'))
+
+# 응답 캐시 상태 조회 (적중/미적중, 304, gzip 응답 수)
+@app.route('/admin/http_cache', methods=['GET'])
+def http_cache_status():
+    return jsonify(response_cache.stats())
+
+# 추천 캐시 상태 조회 (적중/미적중/제거 수)
+@app.route('/admin/recommend_cache', methods=['GET'])
+def recommend_cache_status():
+    if recommend_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(recommend_cache.stats())
+
+# 이미지 캐시 상태 조회 (적중/변환/다운로드 수, 디스크 사용량)
+@app.route('/admin/image_cache', methods=['GET'])
+def image_cache_status():
+    if image_store is None:
+        return jsonify({"enabled": False})
+    return jsonify(image_store.stats())
+
+# 카탈로그 강제 재로드
+@app.route('/admin/catalog/reload', methods=['POST'])
+def reload_catalog():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        return jsonify(catalog.reload(force=True).summary())
+    except Exception as e:
+        logger.error(f"Error reloading catalog: {e}")
+        return jsonify({"error": "Failed to reload catalog"}), 500
 
-# 거리 계산 함수 (Haversine formula)
+# 거리 계산 함수 (Haversine formula, 배열도 처리 가능)
 def calculate_distance(lat1, lon1, lat2, lon2):
     try:
-        if pd.isna(lat1) or pd.isna(lon1) or pd.isna(lat2) or pd.isna(lon2):
-            return float('inf')  # 거리 계산 불가 시 무한대로 처리
-        R = 6371  # 지구 반지름(km)
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-
-        a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-        return R * c
+        distance = haversine_km(lat1, lon1, lat2, lon2)
+        return float(distance) if np.ndim(distance) == 0 else distance
     except Exception as e:
         logger.error(f"Error in distance calculation: {e}")
         return float('inf')
 
 # /stores/<int:store_id>/dishes 엔드포인트
+# ?after_id=&limit= 이면 키셋 페이지, ?stream=json|ndjson 이면 스트리밍, 둘 다 없으면 캐시된 전체 목록
 @app.route('/stores/<int:store_id>/dishes', methods=['GET'])
 def fetch_dishes_by_store(store_id):
-    try:
+    def render():
         db_connection = get_db_connection()
         cursor = db_connection.cursor(pymysql.cursors.DictCursor)
-        
+
         # Query to fetch dishes for a specific store
-        cursor.execute("""
-            SELECT d.name, d.image_url, CAST(sd.price AS SIGNED) as price, d.cooking_method
-            FROM store_dishes sd
-            JOIN dishes d ON sd.dish_id = d.id
-            WHERE sd.store_id = %s
-        """, (store_id,))
-        dishes = cursor.fetchall()
-
-        # Return the result as JSON
-        return jsonify(dishes)
+        with stage('sql.store_dishes'):
+            cursor.execute(STORE_MENU_QUERY, (store_id,))
+            rows = cursor.fetchall()
+        return rewrite(rows)
+
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    try:
+        # 메뉴 첫 페이지 조회를 가게 조회 이벤트로 기록
+        if popularity is not None and after_id is None:
+            record_events(popularity, parse_events({'type': 'view', 'store_id': store_id}, catalog.get()))
+        rewrite = image_rewriter()
+        fmt = request_stream_format()
+        if fmt is not None:
+            return stream_query(*keyset_query(STORE_MENU_PAGE_QUERY, (store_id,), after_id, limit), fmt, rewrite)
+        if is_paged_request():
+            return fetch_page(STORE_MENU_PAGE_QUERY, (store_id,), after_id, limit, 'dish_id', rewrite)
+        return cached_response(('store_dishes', store_id, image_base_url()), render)
     except Exception as e:
         logger.error(f"Error fetching dishes for store {store_id}: {e}")
         return jsonify({"error": f"Failed to fetch dishes for store {store_id}"}), 500
     
 @app.route('/fetch_stores', methods=['GET'])
 def fetch_stores():
-    try:
+    def render():
         db_connection = get_db_connection()
         cursor = db_connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("SELECT id, name, location, telephone_number, latitude, longitude FROM stores")
-        stores = cursor.fetchall()
-        return jsonify(stores)
+        with stage('sql.stores'):
+            cursor.execute(STORES_LIST_QUERY)
+            rows = cursor.fetchall()
+        return rewrite(rows)
+
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    try:
+        # 가게별 리뷰 감성 점수 / 리뷰 수 추가 (집계가 바뀌면 캐시 키도 바뀜)
+        rewrite = sentiment.annotate_stores
+        fmt = request_stream_format()
+        if fmt is not None:
+            return stream_query(*keyset_query(STORES_PAGE_QUERY, (), after_id, limit), fmt, rewrite)
+        if is_paged_request():
+            return fetch_page(STORES_PAGE_QUERY, (), after_id, limit, 'id', rewrite)
+        return cached_response(('stores', sentiment.version), render)
     except Exception as e:
         logger.error(f"Error fetching stores: {e}")
         return jsonify({"error": "Failed to fetch stores"}), 500
 
-# /search_dishes 엔드포인트
+# /stores/nearby 엔드포인트 (radius_km 가 있으면 반경 검색, 없으면 가까운 순 limit 개)
+@app.route('/stores/nearby', methods=['GET'])
+def fetch_nearby_stores():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radius_km = request.args.get('radius_km', type=float)
+    limit = request.args.get('limit', default=20, type=int)
+    if lat is None or lon is None:
+        return jsonify({"error": "lat and lon are required"}), 400
+    try:
+        return jsonify(sentiment.annotate_stores(nearby_store_records(catalog.get(), lat, lon, radius_km, limit)))
+    except Exception as e:
+        logger.error(f"Error fetching nearby stores: {e}")
+        return jsonify({"error": "Failed to fetch nearby stores"}), 500
+
+# /search_dishes 엔드포인트 (이름/재료/가게 이름, 초성, 오타 허용 검색)
 @app.route('/search_dishes', methods=['GET'])
 def search_dishes():
     query = request.args.get('query', '')
+    limit = request.args.get('limit', type=int)
+    offset = max(request.args.get('offset', default=0, type=int), 0)
+    fuzzy = request.args.get('fuzzy', 'true').lower() != 'false'
+    after_id = request.args.get('after_id', type=int)
     try:
-        db_connection = get_db_connection()
-        cursor = db_connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("""
-            SELECT d.name, s.name as store_name, CAST(sd.price AS SIGNED) as price, d.image_url
-            FROM dishes d
-            JOIN store_dishes sd ON d.id = sd.dish_id
-            JOIN stores s ON sd.store_id = s.id
-            WHERE d.name LIKE %s
-        """, ('%' + query + '%',))
-        results = cursor.fetchall()
-        return jsonify(results)
+        snapshot = catalog.get()
+        rewrite = image_rewriter(snapshot)
+        fmt = request_stream_format()
+        if fmt is not None:
+            batches = search_batches(snapshot, query, limit, offset, fuzzy, STREAM_BATCH_SIZE)
+            return Response(encode_batches(map(rewrite, batches), fmt), mimetype=stream_mimetype(fmt))
+        # after_id 는 마지막으로 받은 요리 id (0 이면 처음부터, 같은 요리의 가게별 행은 한 페이지에 모두 포함)
+        if after_id is not None:
+            rows, next_after_id = search_page(snapshot, query, after_id or None, limit, fuzzy)
+            return page_response(rewrite(rows), next_after_id)
+        return jsonify(rewrite(search_records(snapshot, query, limit, offset, fuzzy)))
     except Exception as e:
         logger.error(f"Error searching dishes: {e}")
         return jsonify({"error": "Failed to search dishes"}), 500
 
-# 반찬 추천 로직
-def recommend_dishes(user_dishes, dish_df, num_recommendations, include_soup_option=False, selected_season=None, vegan_only=False):
-    try:
-        logger.debug("Starting recommendation process")
-        logger.debug(f"User dishes: {user_dishes}, Recommendations needed: {num_recommendations}, Include soup: {include_soup_option}")
-
-        # 사용자 반찬 정보와 후보 데이터 생성
-        user_dishes_info = dish_df[dish_df['name'].isin(user_dishes)]
-        candidate_dishes = dish_df[~dish_df['name'].isin(user_dishes)].copy()
-        logger.debug(f"Initial candidate dishes count: {len(candidate_dishes)}")
-
-        # 비건 필터 적용
-        if vegan_only:
-            candidate_dishes = candidate_dishes[candidate_dishes['characteristics'].str.contains('비건', na=False)]
-
-        candidate_dishes['score'] = 0
-
-        # 사용자 기반 점수 계산
-        if not user_dishes_info.empty:
-            user_categories = user_dishes_info['category'].unique()
-            for _, user_dish in user_dishes_info.iterrows():
-                if 'flavor' in candidate_dishes.columns and 'flavor' in user_dish:
-                    candidate_dishes.loc[candidate_dishes['flavor'] != user_dish['flavor'], 'score'] += 3
-                    candidate_dishes.loc[candidate_dishes['flavor'] == user_dish['flavor'], 'score'] += 2
-                    candidate_dishes.loc[~candidate_dishes['category'].isin(user_categories), 'score'] += 3
-
-        # 계절 필터 적용
-        if selected_season:
-            candidate_dishes.loc[candidate_dishes['season'] == selected_season, 'score'] += 2
-            logger.debug(f"Season filter applied. Season: {selected_season}")
-
-        # 국물요리 포함 여부
-        top_soup = pd.DataFrame()
-        if include_soup_option:
-            soup_dishes = candidate_dishes[candidate_dishes['characteristics'].str.contains('국물요리', na=False)]
-            if not soup_dishes.empty:
-                top_soup = soup_dishes.sort_values(by='score', ascending=False).head(1)
-                candidate_dishes = candidate_dishes[~candidate_dishes['characteristics'].str.contains('국물요리', na=False)]
-                logger.debug(f"Soup dishes count after selection: {len(top_soup)}")
-        else:
-            # 국물요리 완전히 제외
-            candidate_dishes = candidate_dishes[~candidate_dishes['characteristics'].str.contains('국물요리', na=False)]
-
-        # '전'으로 끝나는 반찬 중복 방지
-        jeon_dishes = candidate_dishes[candidate_dishes['name'].str.endswith('전')]
-        top_jeon = pd.DataFrame()
-        if not jeon_dishes.empty:
-            top_jeon = jeon_dishes.sort_values(by='score', ascending=False).head(1)
-            candidate_dishes = candidate_dishes[~candidate_dishes['name'].str.endswith('전')]
-        logger.debug(f"'전' dishes count after selection: {len(top_jeon)}")
-
-        # 나머지 추천 계산
-        num_to_recommend = num_recommendations - len(top_soup) - len(top_jeon)
-        top_recommendations = pd.concat([
-            top_soup,
-            top_jeon,
-            candidate_dishes.sort_values(by='score', ascending=False).head(num_to_recommend)
-        ])
-
-        # 중복 제거 (이름 기준)
-        top_recommendations = top_recommendations.drop_duplicates(subset='name')
-
-        # 부족한 개수 채우기
-        while len(top_recommendations) < num_recommendations:
-            remaining_candidates = candidate_dishes[~candidate_dishes['name'].isin(top_recommendations['name'])]
-            if not remaining_candidates.empty:
-                sampled = remaining_candidates.sample(1, random_state=42)
-                top_recommendations = pd.concat([top_recommendations, sampled]).drop_duplicates(subset='name')
-            else:
-                logger.warning("No more unique candidates to fill recommendations.")
-                break
-
-        # 최종 검증 및 개수 보장
-        top_recommendations = top_recommendations.head(num_recommendations)
-        logger.debug(f"Final recommendations count: {len(top_recommendations)}")
-
-        # 결과 반환
-        return top_recommendations[['name', 'store_name', 'latitude', 'longitude', 'price', 'image_url', 'score']]
+# /search_dishes/autocomplete 엔드포인트 (이름 또는 초성 접두어)
+@app.route('/search_dishes/autocomplete', methods=['GET'])
+def autocomplete_dishes():
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', default=10, type=int)
+    try:
+        return jsonify(catalog.get().extras['search'].autocomplete(prefix, limit))
     except Exception as e:
-        logger.error(f"Error in recommend_dishes: {e}")
-        raise
+        logger.error(f"Error autocompleting dishes: {e}")
+        return jsonify({"error": "Failed to autocomplete dishes"}), 500
 
 @app.route('/recommend', methods=['POST'])
 def recommend():
+    data = request.get_json(silent=True)
+    logger.debug("Received data: %s", data)
+    if not isinstance(data, dict):
+        return jsonify({"error": "request body must be a JSON object"}), 400
     try:
-        data = request.get_json()
-        logger.debug(f"Received data: {data}")
-
-        # 입력 값 검증 및 기본값 설정
-        user_dishes = data.get('user_dishes', [])
-        num_recommendations = data.get('num_recommendations', 5)
-        if num_recommendations <= 0:
-            logger.warning(f"Invalid num_recommendations ({num_recommendations}). Setting to default value 5.")
-            num_recommendations = 5
-
-        include_soup_option = data.get('include_soup_option', True)
-        selected_season = data.get('selected_season', None)
-        vegan_only = data.get('vegan_only', False)
-
-        user_lat = data.get('user_lat', 37.4783)
-        user_lon = data.get('user_lon', 126.9516)
-
-        db_connection = get_db_connection()
-        cursor = db_connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("""
-            SELECT s.name as store_name, s.latitude, s.longitude,
-                   d.name, d.image_url, CAST(sd.price AS SIGNED) as price, d.season, d.category, d.characteristics
-            FROM store_dishes sd
-            JOIN stores s ON sd.store_id = s.id
-            JOIN dishes d ON sd.dish_id = d.id
-        """)
-        dish_data = cursor.fetchall()
-        dish_df = pd.DataFrame(dish_data)
-
-        # 건너뛰기 로직 사용 여부 확인
-        if not user_dishes and selected_season is None:
-            logger.info("No user dishes or selected season provided. Using skip logic.")
-            recommendations = recommend_dishes_skip(dish_df, num_recommendations, user_lat, user_lon)
-        else:
-            recommendations = recommend_dishes(
-                user_dishes, dish_df, num_recommendations,
-                include_soup_option, selected_season, vegan_only
-            )
+        params = parse_recommend_request(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # 공유 카탈로그 스냅샷 사용 (요청마다 JOIN 하지 않음)
+        snapshot = catalog.get()
+        results = image_rewriter(snapshot)(cached_recommendation(params, snapshot, recommend_cache, order_store,
+                                                                     popularity, sentiment))
+        with stage('recommend.serialize'):
+            return jsonify(results)
+    except FilterError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Unhandled error: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
-        # 필요한 데이터만 반환
-        result = recommendations[['name', 'store_name', 'price', 'image_url']].to_dict(orient='records')
+# /dishes/filter 엔드포인트 (facet 필터 식에 맞는 반찬 수, facet 값별 반찬 수, id 순 반찬 목록)
+#   GET ?filter=<JSON 식 또는 facet:값>&facets=allergen,category&limit=&after_id=, POST 는 같은 항목을 JSON 본문으로
+@app.route('/dishes/filter', methods=['GET', 'POST'])
+def filter_dishes_endpoint():
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args.to_dict()
+    if not isinstance(data, dict):
+        return jsonify({"error": "request body must be a JSON object"}), 400
+    try:
+        options = parse_filter_request(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        snapshot = catalog.get()
+        with stage('facets.filter'):
+            result = filter_dishes(snapshot, options['expression'], options['facets'], options['limit'],
+                                   options['after_id'])
+        result['dishes'] = image_rewriter(snapshot)(result['dishes'])
         return jsonify(result)
+    except FilterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        logger.error(f"Unhandled error: {e}")
+        logger.error(f"Error filtering dishes: {e}")
+        return jsonify({"error": "Failed to filter dishes"}), 500
+
+# /recommend/batch 엔드포인트 (요청 목록 -> 요청별 추천 결과 목록)
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    try:
+        data = request.get_json()
+        payloads = data.get('requests', []) if isinstance(data, dict) else data
+        if not isinstance(payloads, list):
+            return jsonify({"error": "requests must be a list"}), 400
+        logger.debug("Received batch of %d requests", len(payloads))
+
+        snapshot = catalog.get()
+        rewrite = image_rewriter(snapshot)
+        results = recommend_dishes_batch(payloads, snapshot, cache=recommend_cache, orders=order_store,
+                                         popularity=popularity, sentiment=sentiment)
+        return jsonify({"results": [rewrite(result) if isinstance(result, list) else result for result in results]})
+    except Exception as e:
+        logger.error(f"Unhandled error in batch: {e}")
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
+# /orders 엔드포인트 (장바구니 주문을 로그에 추가하고 동시 주문 인덱스 갱신)
+@app.route('/orders', methods=['POST'])
+def create_order():
+    try:
+        snapshot = catalog.get()
+        record = build_order_record(request.get_json(silent=True), snapshot.extras['scoring'])
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        order_store.record(record)
+        if popularity is not None:
+            record_order(popularity, snapshot, record, request.get_json(silent=True))
+        matched = sum(1 for item in record['items'] if item['dish_id'] is not None)
+        return jsonify({"order_id": record['order_id'], "items": len(record['items']), "matched": matched}), 201
+    except Exception as e:
+        logger.error(f"Error recording order: {e}")
+        return jsonify({"error": "Failed to record order"}), 500
+
+# /events 엔드포인트 (조회 / 추천 클릭 / 주문 이벤트를 인기도 카운터에 반영, 큐에 넣고 바로 응답)
+@app.route('/events', methods=['POST'])
+def record_popularity_events():
+    if popularity is None:
+        return jsonify({"error": "Popularity tracking is disabled"}), 404
+    try:
+        events = parse_events(request.get_json(silent=True), catalog.get())
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    record_events(popularity, events)
+    return jsonify({"accepted": len(events)}), 202
+
+# 인기도 상태 조회 (상위 반찬 / 가게 / 격자, 현재 시각 기준 감쇠된 횟수)
+@app.route('/admin/popularity', methods=['GET'])
+def popularity_status():
+    if popularity is None:
+        return jsonify({"enabled": False})
+    return jsonify(popularity.summary(request.args.get('limit', 10, type=int)))
+
+# /reviews 엔드포인트 (리뷰를 로그에 추가만 함, 감성 점수는 review_sentiment.py 파이프라인이 반영)
+@app.route('/reviews', methods=['POST'])
+def create_review():
+    try:
+        record = build_review_record(request.get_json(silent=True), catalog.get())
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        with stage('reviews.append'):
+            review_log.append(record)
+        return jsonify({"review_id": record['review_id'], "store_id": record['store_id'],
+                        "dish_id": record['dish_id']}), 201
+    except Exception as e:
+        logger.error(f"Error recording review: {e}")
+        return jsonify({"error": "Failed to record review"}), 500
+
+# 리뷰 감성 집계 상태 조회 (리뷰 수, 집계 시각, 보정 점수 상위 가게 / 반찬)
+@app.route('/admin/reviews', methods=['GET'])
+def review_sentiment_status():
+    return jsonify(sentiment.summary(request.args.get('limit', 10, type=int)))
+
+# Prometheus 텍스트 형식 지표 (요청 수/지연 시간, 추천 단계별 시간, 연결 풀/캐시 상태)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+# /img/<dish_id> 엔드포인트 (?size=thumb|card&format=webp|jpeg&v=원본 해시)
+@app.route('/img/<int:dish_id>', methods=['GET'])
+def dish_image(dish_id):
+    if image_store is None:
+        return jsonify({"error": "Image proxy is disabled"}), 404
+    try:
+        status, body, headers = image_response(
+            image_store, catalog.get().extras['images'], dish_id,
+            size=request.args.get('size'),
+            fmt=request.args.get('format'),
+            token=request.args.get('v'),
+            if_none_match=request.headers.get('If-None-Match'),
+        )
+    except Exception as e:
+        logger.error(f"Error serving image for dish {dish_id}: {e}")
+        return jsonify({"error": f"Failed to serve image for dish {dish_id}"}), 500
+    if isinstance(body, dict):
+        return jsonify(body), status
+    return Response(body, status=status, headers=headers)
+
 if __name__ == '__main__':
+    try:
+        db_pool.warm()
+    except Exception as e:
+        logger.warning(f"Could not pre-open database connections: {e}")
     app.run(debug=True, host='0.0.0.0', port=5000)
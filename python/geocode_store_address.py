@@ -3,6 +3,16 @@ import requests
 import os
 from dotenv import load_dotenv
 import logging
+import argparse
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import pool_from_env
+from rate_limit import RetryableError, TokenBucket, call_with_retries
 
 # 환경 변수 로드
 load_dotenv()
@@ -13,72 +23,214 @@ logger = logging.getLogger(__name__)
 
 # Kakao REST API 키 설정 (환경 변수에서 가져오기)
 KAKAO_API_KEY = os.getenv('KAKAO_API_KEY', '6468d726fb9dca754c7325a4289a4156')
+KAKAO_GEOCODE_URL = 'https://dapi.kakao.com/v2/local/search/address.json'
+
+# 주소 -> 좌표 캐시 파일 (실행 간 유지)
+GEOCODE_CACHE_PATH = os.getenv('GEOCODE_CACHE_PATH', 'data/geocode_cache.db')
+
+# MariaDB 연결 풀 (환경 변수에서 설정 가져오기)
+db_pool = pool_from_env(cursorclass=pymysql.cursors.DictCursor)
+
+
+# 같은 주소가 공백/전각 문자 차이로 따로 캐시되지 않도록 정규화
+def normalize_address(address):
+    if not address:
+        return ''
+    address = unicodedata.normalize('NFKC', str(address))
+    return re.sub(r'\s+', ' ', address).strip()
+
+
+# Kakao 지오코딩 API 호출 (시간 제한, 429/5xx 는 재시도 대상)
+class KakaoGeocoder:
+    def __init__(self, api_key=KAKAO_API_KEY, timeout=5):
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'KakaoAK {api_key}'
+        self.timeout = timeout
+
+    def __call__(self, address):
+        try:
+            response = self.session.get(KAKAO_GEOCODE_URL, params={'query': address}, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise RetryableError(f"Request error for address '{address}': {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After')
+            raise RetryableError(f"HTTP {response.status_code} for address '{address}'",
+                                 float(retry_after) if retry_after and retry_after.isdigit() else None)
+        response.raise_for_status()
+        documents = response.json()['documents']
+        if not documents:
+            return None
+        return float(documents[0]['y']), float(documents[0]['x'])
+
+
+# 테스트용 로컬 지오코더 (표에 있으면 그 좌표, 없으면 주소 해시로 서울 근처 좌표 생성)
+class MockGeocoder:
+    def __init__(self, table=None, delay=0.0):
+        self.table = table or {}
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, address):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if address in self.table:
+            return self.table[address]
+        digest = hashlib.sha1(address.encode('utf-8')).digest()
+        return (37.45 + digest[0] / 255 * 0.15, 126.85 + digest[1] / 255 * 0.25)
+
+
+# 정규화된 주소 -> 좌표 캐시와 가게별 마지막으로 지오코딩한 주소 (SQLite)
+class GeocodeCache:
+    def __init__(self, path=GEOCODE_CACHE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS store_addresses (
+                store_id INTEGER PRIMARY KEY,
+                address TEXT NOT NULL
+            );
+        """)
+
+    # 캐시에 있는 주소 -> {주소: (위도, 경도) 또는 None(결과 없음)}
+    def lookup(self, addresses):
+        found = {}
+        addresses = list(addresses)
+        for start in range(0, len(addresses), 500):
+            chunk = addresses[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT address, latitude, longitude FROM geocodes WHERE address IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for address, latitude, longitude in rows:
+                found[address] = (latitude, longitude) if latitude is not None else None
+        return found
+
+    def store_geocodes(self, results):
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO geocodes (address, latitude, longitude, updated_at) VALUES (?, ?, ?, ?)",
+            [(address, *(coordinates or (None, None)), now) for address, coordinates in results.items()]
+        )
+        self.connection.commit()
 
-# MariaDB 연결 설정 (환경 변수에서 가져오기)
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER', 'root')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '1111')
-DB_NAME = os.getenv('DB_NAME', 'bapsim')
+    def store_addresses(self):
+        return dict(self.connection.execute("SELECT store_id, address FROM store_addresses"))
 
-# Kakao 지오코딩 API 호출 함수
+    def mark_geocoded(self, store_addresses):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO store_addresses (store_id, address) VALUES (?, ?)", list(store_addresses.items())
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+# 좌표가 없거나 마지막 지오코딩 이후 주소가 바뀐 가게만 선택 -> {store_id: 정규화된 주소}
+#   좌표는 있는데 기록이 없는 가게(이전 방식으로 처리된 가게)는 현재 주소를 기록만 함
+def select_stores(stores, geocoded, force=False):
+    pending = {}
+    adopted = {}
+    for store in stores:
+        address = normalize_address(store['location'])
+        if not address:
+            continue
+        has_coordinates = store['latitude'] is not None and store['longitude'] is not None
+        previous = geocoded.get(store['id'])
+        if force or not has_coordinates or (previous is not None and previous != address):
+            pending[store['id']] = address
+        elif previous is None:
+            adopted[store['id']] = address
+    return pending, adopted
+
+
+# 캐시에 없는 주소만 속도 제한 안에서 동시에 지오코딩 -> {주소: 좌표 또는 None}
+def resolve_addresses(addresses, geocoder, bucket, workers=4, retries=3):
+    def resolve(address):
+        def attempt():
+            bucket.acquire()
+            return geocoder(address)
+        try:
+            return address, call_with_retries(attempt, retries)
+        except Exception as e:
+            logger.error(f"Geocoding failed for address '{address}': {e}")
+            return address, False
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geocoder') as executor:
+        for address, coordinates in executor.map(resolve, addresses):
+            # 실패(False)는 캐시하지 않아 다음 실행에서 다시 시도
+            if coordinates is not False:
+                results[address] = coordinates
+                if coordinates is None:
+                    logger.warning(f"No geocode found for address: {address}")
+    return results
+
+
+# Kakao 지오코딩 API 호출 함수 (단건)
 def get_geocode(address):
-    headers = {
-        'Authorization': f'KakaoAK {KAKAO_API_KEY}'
-    }
-    params = {
-        'query': address
-    }
-    url = 'https://dapi.kakao.com/v2/local/search/address.json'
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        result = response.json()
-        if result['documents']:
-            latitude = result['documents'][0]['y']
-            longitude = result['documents'][0]['x']
-            return latitude, longitude
-        else:
-            logger.warning(f"No geocode found for address: {address}")
-    except requests.exceptions.RequestException as e:
+        coordinates = KakaoGeocoder()(address)
+    except (RetryableError, requests.exceptions.RequestException) as e:
         logger.error(f"Request error for address '{address}': {e}")
-    return None, None
+        return None, None
+    if coordinates is None:
+        logger.warning(f"No geocode found for address: {address}")
+        return None, None
+    return coordinates
+
 
-# MariaDB에 연결하고 가게 정보 업데이트
-def update_store_geocodes():
+# MariaDB에 연결하고 가게 정보 업데이트 (변경된 가게만, 한 번의 묶음 UPDATE)
+def update_store_geocodes(geocoder=None, cache=None, rate=10.0, workers=4, force=False):
+    geocoder = geocoder or KakaoGeocoder()
+    cache = cache or GeocodeCache()
+    connection = None
+    started = time.perf_counter()
     try:
-        connection = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        connection = db_pool.acquire()
         cursor = connection.cursor()
 
-        # stores 테이블에서 모든 가게의 주소 가져오기
-        cursor.execute("SELECT id, location FROM stores")
+        # stores 테이블에서 모든 가게의 주소와 현재 좌표 가져오기
+        cursor.execute("SELECT id, location, latitude, longitude FROM stores")
         stores = cursor.fetchall()
 
-        # 각 가게의 주소를 지오코딩하고 결과를 업데이트
-        for store in stores:
-            store_id = store['id']
-            address = store['location']
-            latitude, longitude = get_geocode(address)
-
-            if latitude and longitude:
-                # 위도와 경도를 stores 테이블에 업데이트
-                cursor.execute(
-                    """
-                    UPDATE stores
-                    SET latitude = %s, longitude = %s
-                    WHERE id = %s
-                    """,
-                    (latitude, longitude, store_id)
-                )
-                connection.commit()
-                logger.info(f"Updated store {store_id} with latitude {latitude} and longitude {longitude}")
-            else:
-                logger.warning(f"Failed to get geocode for store {store_id}")
+        pending, adopted = select_stores(stores, cache.store_addresses(), force)
+        cache.mark_geocoded(adopted)
+        addresses = set(pending.values())
+        known = cache.lookup(addresses)
+        misses = sorted(addresses - set(known))
+        logger.info(f"{len(pending)} of {len(stores)} stores need geocoding: "
+                    f"{len(known)} cached addresses, {len(misses)} to resolve")
+
+        resolved = resolve_addresses(misses, geocoder, TokenBucket(rate, burst=max(1, int(rate))), workers)
+        cache.store_geocodes(resolved)
+        known.update(resolved)
+
+        updates = [(known[address][0], known[address][1], store_id)
+                   for store_id, address in pending.items() if known.get(address)]
+        if updates:
+            # 위도와 경도를 stores 테이블에 한 번에 업데이트
+            cursor.executemany(
+                """
+                UPDATE stores
+                SET latitude = %s, longitude = %s
+                WHERE id = %s
+                """,
+                updates
+            )
+            connection.commit()
+        cache.mark_geocoded({store_id: pending[store_id] for _, _, store_id in updates})
+        logger.info(f"Updated {len(updates)} stores in {time.perf_counter() - started:.2f}s "
+                    f"({len(pending) - len(updates)} without a geocode)")
+        return len(updates)
 
     except pymysql.MySQLError as e:
         logger.error(f"Database error: {e}")
@@ -87,4 +239,17 @@ def update_store_geocodes():
             connection.close()
 
 if __name__ == '__main__':
-    update_store_geocodes()
+    parser = argparse.ArgumentParser(description="Geocode stores with missing or changed addresses")
+    parser.add_argument('--rate', type=float, default=float(os.getenv('GEOCODE_RATE', '10')), help="requests per second")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--all', action='store_true', help="geocode every store again")
+    parser.add_argument('--mock', action='store_true', help="use the local mock geocoder")
+    parser.add_argument('--cache', default=GEOCODE_CACHE_PATH, help="geocode cache file (use a separate one with --mock)")
+    args = parser.parse_args()
+
+    geocode_cache = GeocodeCache(args.cache)
+    try:
+        update_store_geocodes(MockGeocoder() if args.mock else None, geocode_cache, args.rate, args.workers, args.all)
+    finally:
+        geocode_cache.close()
+        db_pool.close()
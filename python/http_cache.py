@@ -0,0 +1,159 @@
+import decimal
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+import numpy as np
+
+
+# Flask jsonify 와 같은 방식으로 직렬화 (Decimal 은 문자열, numpy 값은 파이썬 값)
+def json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dump_json(data):
+    return json.dumps(data, default=json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# 한 번 직렬화한 응답 (본문, gzip 본문, 검증자)
+class CachedPayload:
+    def __init__(self, body, version, last_modified, compress_level=6):
+        self.body = body
+        self.version = version
+        self.last_modified = int(last_modified)
+        # 카탈로그 버전 + 본문 해시로 만든 strong ETag
+        self.etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:12]}"'
+        self._compress_level = compress_level
+        self._gzip_body = None
+
+    @property
+    def gzip_body(self):
+        # 처음 gzip 요청이 올 때 한 번만 압축
+        if self._gzip_body is None:
+            self._gzip_body = gzip.compress(self.body, compresslevel=self._compress_level, mtime=0)
+        return self._gzip_body
+
+    @property
+    def gzip_etag(self):
+        return self.etag[:-1] + '-gz"'
+
+
+# 카탈로그 버전별 응답 캐시 (버전이 바뀌면 이전 버전 응답은 모두 버림)
+class ResponseCache:
+    def __init__(self, max_entries=2048, max_age=60, compress_min_bytes=512, compress_level=6):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._counters = dict.fromkeys(['hits', 'misses', 'not_modified', 'gzip', 'evictions'], 0)
+
+    def lookup(self, snapshot, key):
+        with self._lock:
+            if self._version != snapshot.version:
+                self._entries.clear()
+                self._version = snapshot.version
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return payload
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, snapshot, key, data):
+        payload = CachedPayload(dump_json(data), snapshot.version, snapshot.loaded_at, self.compress_level)
+        with self._lock:
+            if self._version == snapshot.version:
+                self._entries[key] = payload
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters['evictions'] += 1
+        return payload
+
+    # render() 는 응답 데이터를 만드는 함수 (캐시에 없을 때만 호출)
+    def get(self, snapshot, key, render):
+        payload = self.lookup(snapshot, key)
+        if payload is None:
+            payload = self.put(snapshot, key, render())
+        return payload
+
+    # 조건부 요청 처리 -> (상태 코드, 본문, 헤더)
+    def respond(self, payload, if_none_match=None, if_modified_since=None, accept_encoding=None):
+        use_gzip = len(payload.body) >= self.compress_min_bytes and accepts_gzip(accept_encoding)
+        headers = {
+            'ETag': payload.gzip_etag if use_gzip else payload.etag,
+            'Last-Modified': formatdate(payload.last_modified, usegmt=True),
+            'Cache-Control': f'public, max-age={self.max_age}',
+            'Vary': 'Accept-Encoding',
+        }
+        if is_not_modified(payload, if_none_match, if_modified_since):
+            with self._lock:
+                self._counters['not_modified'] += 1
+            return 304, b'', headers
+
+        headers['Content-Type'] = 'application/json'
+        if use_gzip:
+            with self._lock:
+                self._counters['gzip'] += 1
+            headers['Content-Encoding'] = 'gzip'
+            return 200, payload.gzip_body, headers
+        return 200, payload.body, headers
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                'version': self._version,
+                'entries': len(self._entries),
+                'bytes': sum(len(payload.body) for payload in self._entries.values()),
+            })
+        return stats
+
+
+def accepts_gzip(accept_encoding):
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            params = params.replace(' ', '')
+            return params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+# If-None-Match 가 있으면 ETag 만 비교 (gzip/원본 ETag 모두 같은 자원으로 취급)
+def is_not_modified(payload, if_none_match=None, if_modified_since=None):
+    if if_none_match:
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag in (payload.etag, payload.gzip_etag):
+                return True
+        return False
+    if if_modified_since:
+        try:
+            return payload.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# 환경 변수 기반 응답 캐시 (HTTP_CACHE_MAX_AGE, HTTP_CACHE_MAX_ENTRIES, HTTP_CACHE_GZIP_MIN_BYTES)
+def cache_from_env():
+    return ResponseCache(
+        max_entries=int(os.getenv('HTTP_CACHE_MAX_ENTRIES', '2048')),
+        max_age=int(os.getenv('HTTP_CACHE_MAX_AGE', '60')),
+        compress_min_bytes=int(os.getenv('HTTP_CACHE_GZIP_MIN_BYTES', '512')),
+    )
@@ -0,0 +1,339 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+# 반찬 이미지 프록시 (/img/<dish_id>)
+#   외부 원본(blogfiles.naver.net, pstatic.net 등)은 한 번만 받아 디스크에 저장하고
+#   고정 크기 썸네일 / WebP 변환본을 만들어 immutable 캐시 헤더로 응답
+SIZES = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+}
+DEFAULT_SIZE = os.getenv('IMAGE_PROXY_SIZE', 'card')
+DEFAULT_FORMAT = os.getenv('IMAGE_PROXY_FORMAT', 'webp')
+
+# URL 에 원본 해시(v)가 들어가므로 원본이 바뀌면 URL 도 바뀜 -> 1년 immutable
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# v 가 현재 원본과 다른 (오래된) URL 은 짧게만 캐시
+STALE_CACHE_CONTROL = 'public, max-age=300'
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+# 기본 fetcher: http(s) 원본 다운로드 -> bytes (max_bytes 초과 시 중단)
+def http_fetcher(timeout=10, max_bytes=10 * 1024 * 1024):
+    import requests
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; bapsim-image-proxy)'
+
+    def fetch(url):
+        try:
+            with session.get(url, timeout=timeout, stream=True) as response:
+                if response.status_code != 200:
+                    raise ImageFetchError(f"HTTP {response.status_code} for {url}")
+                chunks = []
+                size = 0
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ImageFetchError(f"Source image is larger than {max_bytes} bytes: {url}")
+                    chunks.append(chunk)
+                return b''.join(chunks)
+        except requests.exceptions.RequestException as e:
+            raise ImageFetchError(f"Request error for {url}: {e}")
+    return fetch
+
+
+# 테스트/로컬 개발용 fetcher: file:// URL 은 그대로, 그 외 URL 은 root 아래 같은 파일 이름으로 읽음
+def file_fetcher(root):
+    def fetch(url):
+        parsed = urlparse(url)
+        if parsed.scheme == 'file':
+            path = unquote(parsed.path)
+        else:
+            path = os.path.join(root, os.path.basename(unquote(parsed.path)))
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise ImageFetchError(f"Cannot read {path}: {e}")
+    return fetch
+
+
+def source_token(image_url):
+    return hashlib.sha1(image_url.encode('utf-8')).hexdigest()[:10]
+
+
+# 원본 bytes -> 고정 크기(가운데 잘라내기) 변환본 bytes
+def render_variant(source, size, fmt, quality=80):
+    from PIL import Image, ImageOps
+
+    pil_format = FORMATS[fmt][0]
+    with Image.open(io.BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha and pil_format != 'JPEG' else 'RGB')
+        image = ImageOps.fit(image, SIZES[size], method=Image.LANCZOS)
+        output = io.BytesIO()
+        options = {'quality': quality}
+        if pil_format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options['method'] = 4
+        image.save(output, pil_format, **options)
+        return output.getvalue()
+
+
+# 프록시 응답 하나 (본문, ETag, Content-Type)
+class ImageVariant:
+    def __init__(self, body, digest, size, fmt):
+        self.body = body
+        self.etag = f'"{digest[:16]}-{size}-{fmt}"'
+        self.content_type = FORMATS[fmt][1]
+
+
+# 원본 내용 해시로 이름 붙인 디스크 캐시 (전체 크기 max_bytes 를 넘으면 오래 안 쓴 파일부터 삭제)
+#   <hash>.src                원본
+#   <hash>-<size><ext>        변환본
+#   urls/<sha1(url)>          원본 URL -> 원본 해시
+class ImageStore:
+    def __init__(self, directory, fetch, max_bytes=512 * 1024 * 1024, quality=80):
+        self.directory = directory
+        self.fetch = fetch
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._urls_directory = os.path.join(directory, 'urls')
+        os.makedirs(self._urls_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._source_locks = {}
+        self._counters = dict.fromkeys(['hits', 'renders', 'fetches', 'fetch_errors', 'evictions'], 0)
+        # 파일 이름 -> 크기 (오래 안 쓴 순서), 재시작 후에도 순서가 이어지도록 mtime 기준으로 복원
+        self._files = OrderedDict()
+        self._bytes = 0
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._bytes += size
+        self._evict()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _write(self, path, data):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def _read(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                size = self._files.pop(name, None)
+                if size is not None:
+                    self._bytes -= size
+            return None
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+        try:
+            os.utime(self._path(name))
+        except OSError:
+            pass
+        return data
+
+    def _add(self, name, data):
+        self._write(self._path(name), data)
+        with self._lock:
+            self._bytes += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+        self._evict(keep=name)
+
+    # 전체 크기가 max_bytes 이하가 될 때까지 오래 안 쓴 파일 삭제 (방금 쓴 keep 은 남김)
+    def _evict(self, keep=None):
+        evicted = []
+        with self._lock:
+            while self._bytes > self.max_bytes and self._files:
+                oldest, size = next(iter(self._files.items()))
+                if oldest == keep:
+                    break
+                del self._files[oldest]
+                self._bytes -= size
+                evicted.append(oldest)
+            self._counters['evictions'] += len(evicted)
+        for oldest in evicted:
+            try:
+                os.remove(self._path(oldest))
+            except OSError:
+                pass
+
+    def _url_path(self, image_url):
+        return os.path.join(self._urls_directory, hashlib.sha1(image_url.encode('utf-8')).hexdigest())
+
+    def _known_digest(self, image_url):
+        try:
+            with open(self._url_path(image_url), encoding='ascii') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    # 원본 URL -> (원본 해시, 원본 bytes), 디스크에 없을 때만 다운로드
+    def _source(self, image_url):
+        digest = self._known_digest(image_url)
+        if digest is not None:
+            source = self._read(digest + '.src')
+            if source is not None:
+                return digest, source
+        try:
+            source = self.fetch(image_url)
+        except Exception:
+            self._count('fetch_errors')
+            raise
+        self._count('fetches')
+        digest = hashlib.sha256(source).hexdigest()
+        self._add(digest + '.src', source)
+        self._write(self._url_path(image_url), digest.encode('ascii'))
+        return digest, source
+
+    def _cached_variant(self, image_url, suffix):
+        digest = self._known_digest(image_url)
+        if digest is None:
+            return None, None
+        return digest, self._read(digest + suffix)
+
+    def variant(self, image_url, size=DEFAULT_SIZE, fmt=DEFAULT_FORMAT):
+        if size not in SIZES:
+            raise ValueError(f"Unknown image size: {size}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown image format: {fmt}")
+        suffix = f'-{size}{FORMATS[fmt][2]}'
+
+        digest, body = self._cached_variant(image_url, suffix)
+        if body is not None:
+            self._count('hits')
+            return ImageVariant(body, digest, size, fmt)
+
+        # 같은 원본을 여러 요청이 동시에 요청해도 다운로드와 변환은 한 번만
+        with self._lock:
+            source_lock = self._source_locks.setdefault(image_url, threading.Lock())
+        with source_lock:
+            digest, body = self._cached_variant(image_url, suffix)
+            if body is not None:
+                self._count('hits')
+                return ImageVariant(body, digest, size, fmt)
+            digest, source = self._source(image_url)
+            body = render_variant(source, size, fmt, self.quality)
+            self._add(digest + suffix, body)
+            self._count('renders')
+        return ImageVariant(body, digest, size, fmt)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({'files': len(self._files), 'bytes': self._bytes, 'max_bytes': self.max_bytes})
+        return stats
+
+
+# 카탈로그 빌더: 반찬 id <-> 원본 이미지 URL (응답의 image_url 을 프록시 URL 로 바꿀 때 사용)
+class DishImages:
+    def __init__(self, dishes):
+        self.by_id = {}
+        self.by_url = {}
+        for dish_id, image_url in zip(dishes['id'], dishes['image_url']):
+            if isinstance(image_url, str) and image_url.startswith(('http://', 'https://', 'file://')):
+                self.by_id[int(dish_id)] = image_url
+                self.by_url.setdefault(image_url, int(dish_id))
+
+    def source(self, dish_id):
+        return self.by_id.get(int(dish_id))
+
+    def proxied_url(self, image_url, base_url='', size=DEFAULT_SIZE, fmt=DEFAULT_FORMAT):
+        dish_id = self.by_url.get(image_url)
+        if dish_id is None:
+            return image_url
+        query = f'v={source_token(image_url)}&size={quote(size)}'
+        if fmt != DEFAULT_FORMAT:
+            query += f'&format={quote(fmt)}'
+        return f'{base_url}/img/{dish_id}?{query}'
+
+    # image_url 이 있는 행을 프록시 URL 로 바꾼 새 행 목록 (캐시된 원래 행은 수정하지 않음)
+    def rewrite(self, rows, base_url='', size=DEFAULT_SIZE):
+        rewritten = []
+        for row in rows:
+            if isinstance(row, dict) and row.get('image_url') in self.by_url:
+                row = dict(row, image_url=self.proxied_url(row['image_url'], base_url, size))
+            rewritten.append(row)
+        return rewritten
+
+
+def build_dish_images(snapshot):
+    return DishImages(snapshot.dishes)
+
+
+# /img/<dish_id> 요청 처리 -> (상태 코드, 본문, 헤더)
+#   v 가 현재 원본과 다르거나 없으면 짧게만 캐시 (원본이 바뀐 뒤 예전 URL 로 들어온 요청)
+def image_response(store, images, dish_id, size=None, fmt=None, token=None, if_none_match=None):
+    size = size or DEFAULT_SIZE
+    fmt = fmt or DEFAULT_FORMAT
+    if size not in SIZES or fmt not in FORMATS:
+        return 400, {"error": f"size must be one of {sorted(SIZES)} and format one of {sorted(FORMATS)}"}, {}
+    image_url = images.source(dish_id)
+    if image_url is None:
+        return 404, {"error": f"No image for dish {dish_id}"}, {}
+    try:
+        variant = store.variant(image_url, size, fmt)
+    except ImageFetchError as e:
+        logger.error(f"Error fetching image for dish {dish_id}: {e}")
+        return 502, {"error": f"Failed to fetch image for dish {dish_id}"}, {}
+    except (OSError, ValueError) as e:
+        # Pillow 가 읽을 수 없는 원본 (UnidentifiedImageError 는 OSError)
+        logger.error(f"Error converting image for dish {dish_id}: {e}")
+        return 502, {"error": f"Invalid image for dish {dish_id}"}, {}
+
+    headers = {
+        'ETag': variant.etag,
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if token == source_token(image_url) else STALE_CACHE_CONTROL,
+    }
+    if if_none_match and variant.etag in (tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()
+                                          for tag in if_none_match.split(',')):
+        return 304, b'', headers
+    headers['Content-Type'] = variant.content_type
+    return 200, variant.body, headers
+
+
+# 환경 변수 기반 이미지 저장소 (IMAGE_PROXY_ENABLED=0 이면 None)
+#   IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_PROXY_SOURCE_DIR(설정 시 원본을 로컬 파일에서 읽음)
+def image_store_from_env():
+    if os.getenv('IMAGE_PROXY_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        return None
+    source_directory = os.getenv('IMAGE_PROXY_SOURCE_DIR')
+    fetch = file_fetcher(source_directory) if source_directory else http_fetcher(
+        timeout=float(os.getenv('IMAGE_PROXY_TIMEOUT', '10'))
+    )
+    return ImageStore(
+        os.getenv('IMAGE_CACHE_DIR', 'data/image_proxy'),
+        fetch,
+        max_bytes=int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+        quality=int(os.getenv('IMAGE_PROXY_QUALITY', '80')),
+    )
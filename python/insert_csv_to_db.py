@@ -1,39 +1,21 @@
-import pymysql
-import pandas as pd
+import logging
 
-# CSV 파일 읽기
-file_name = "./data/dish_db.csv"
-dish_df = pd.read_csv(file_name)
-
-# MariaDB 연결 설정
-connection = pymysql.connect(
-    host='localhost',
-    user='root',
-    password='1111',  # 설정한 root 비밀번호
-    database='bapsim'
-)
+from bulk_load import bulk_load
+from db_pool import pool_from_env
 
-cursor = connection.cursor()
+# dish_db.csv 적재 (번호 기준 upsert 이므로 다시 실행해도 중복되지 않음)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# 데이터 삽입
-for _, row in dish_df.iterrows():
-    sql = """
-    INSERT INTO dishes (name, main_ingredients, category, flavor, characteristics, season, cooking_method)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """
-    cursor.execute(sql, (
-        row['이름'],
-        row['주요재료'],
-        row['분류'],
-        row['맛'],
-        row['특징'],
-        row['계절'],
-        row['조리방법']
-    ))
+file_name = "./data/dish_db.csv"
 
-# 변경사항 저장
-connection.commit()
+# MariaDB 연결 설정 (풀에서 빌려 씀)
+db_pool = pool_from_env(charset='utf8mb4')
+connection = db_pool.acquire()
 
-# 연결 닫기
-cursor.close()
-connection.close()
+try:
+    stats = bulk_load(connection, 'dishes', file_name)
+    print(f"Loaded {stats['rows']} dishes ({stats['rows_per_second']} rows/sec)")
+finally:
+    # 연결 닫기
+    connection.close()
+    db_pool.close()
@@ -0,0 +1,166 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from metrics import REGISTRY
+
+# 서버 로깅 설정 (요청 스레드는 레코드를 큐에 넣기만 하고, 포맷과 파일 쓰기는 백그라운드 스레드에서 수행)
+#   LOG_LEVEL=INFO            루트 로거 레벨
+#   LOG_FORMAT=json | text    json 이면 한 줄에 하나의 JSON 객체 (request_id, extra 필드 포함)
+#   LOG_FILE=                 지정하면 크기 기준으로 교체되는 파일에 기록 (없으면 stderr)
+#   LOG_MAX_BYTES=52428800    파일 하나의 최대 크기, LOG_BACKUP_COUNT=5 개까지 보관
+#   LOG_DEBUG_SAMPLE_RATE=0.01  DEBUG 레코드를 남길 요청 비율 (요청 단위로 결정, 1 이면 모두)
+#   LOG_QUEUE_SIZE=10000      큐가 가득 차면 요청을 막지 않고 레코드를 버림
+#   메시지는 logger.debug("Received data: %s", data) 처럼 인자로 넘겨야 출력될 때만 문자열로 변환됨
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_sampled = contextvars.ContextVar('log_sampled', default=None)
+
+_listener = None
+
+DROPPED = REGISTRY.counter('bapsim_log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+# LogRecord 기본 속성 (나머지는 extra 로 넘긴 필드로 보고 JSON 에 포함)
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+def _sample_rate():
+    return min(max(float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01')), 0.0), 1.0)
+
+
+def _is_sampled(request_id, rate):
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    return zlib.crc32(request_id.encode('utf-8')) % 10000 < rate * 10000
+
+
+# 요청 시작: 요청 ID (헤더 값이 있으면 사용) 와 DEBUG 샘플링 여부 설정 -> (요청 ID, 복원용 토큰)
+def begin_request(request_id=None):
+    request_id = (request_id or '').strip()[:64] or uuid.uuid4().hex
+    tokens = (_request_id.set(request_id), _sampled.set(_is_sampled(request_id, _sample_rate())))
+    return request_id, tokens
+
+
+def end_request(tokens):
+    request_token, sampled_token = tokens
+    _sampled.reset(sampled_token)
+    _request_id.reset(request_token)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+# 레코드에 요청 ID 를 붙이고, 샘플링되지 않은 요청의 DEBUG 레코드는 큐에 넣기 전에 버림
+class RequestContextFilter(logging.Filter):
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        if record.levelno >= logging.INFO:
+            return True
+        sampled = _sampled.get()
+        if sampled is None:
+            # 요청 밖(백그라운드 스레드 등)의 DEBUG 레코드는 레코드 단위로 샘플링
+            return random.random() < self.sample_rate
+        return sampled
+
+
+# 요청 스레드에서는 포맷하지 않고 레코드를 그대로 넘김 (getMessage / JSON 직렬화는 리스너 스레드에서)
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = '-'
+        return super().format(record)
+
+
+def _output_handler(log_file, formatter):
+    if log_file:
+        if os.path.dirname(log_file):
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        handler = RotatingFileHandler(
+            log_file, maxBytes=int(os.getenv('LOG_MAX_BYTES', str(50 * 1024 * 1024))),
+            backupCount=int(os.getenv('LOG_BACKUP_COUNT', '5')), encoding='utf-8'
+        )
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(formatter)
+    return handler
+
+
+# 루트 로거를 큐 핸들러 하나로 교체하고 백그라운드 리스너 시작 (여러 번 호출해도 한 번만 설정)
+def configure_logging(level=None, log_format=None, log_file=None):
+    global _listener
+    if _listener is not None:
+        return _listener
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'json')).lower()
+    log_file = log_file if log_file is not None else os.getenv('LOG_FILE')
+    formatter = JsonFormatter() if log_format == 'json' else TextFormatter()
+
+    records = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    queue_handler = DeferredQueueHandler(records)
+    queue_handler.addFilter(RequestContextFilter(_sample_rate()))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, _output_handler(log_file, formatter), respect_handler_level=True)
+    _listener.start()
+    # 종료 시 큐에 남은 레코드까지 기록
+    atexit.register(_listener.stop)
+    return _listener
@@ -3,11 +3,14 @@ import pandas as pd
 import pymysql
 import logging
 from flask_cors import CORS
-from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 import os
 import math
 
+from catalog import CatalogStore
+from log_pipeline import configure_logging
+from scoring import HARMONY_WEIGHTS, encode_catalog, encode_frame, score_rows
+
 # 환경 변수 로드
 load_dotenv()
 
@@ -15,32 +18,21 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-# 로깅 설정
-if not os.path.exists('logs'):
-    os.mkdir('logs')
-
-debug_handler = RotatingFileHandler('logs/debug.log', maxBytes=10240, backupCount=10)
-debug_handler.setLevel(logging.DEBUG)
-
-error_handler = RotatingFileHandler('logs/error.log', maxBytes=10240, backupCount=10)
-error_handler.setLevel(logging.ERROR)
-
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-debug_handler.setFormatter(formatter)
-error_handler.setFormatter(formatter)
-
-app.logger.addHandler(debug_handler)
-app.logger.addHandler(error_handler)
+# 로깅 설정 (큐 기반 백그라운드 기록, logs/bapsim.log 를 LOG_MAX_BYTES 단위로 교체)
+configure_logging(log_file=os.getenv('LOG_FILE', 'logs/bapsim.log'))
 
 # MariaDB 연결 관리
+def open_db_connection():
+    return pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', '1111'),
+        database=os.getenv('DB_NAME', 'bapsim')
+    )
+
 def get_db_connection():
     if 'db' not in g:
-        g.db = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', '1111'),
-            database=os.getenv('DB_NAME', 'bapsim')
-        )
+        g.db = open_db_connection()
     return g.db
 
 @app.teardown_appcontext
@@ -49,6 +41,10 @@ def close_db_connection(exception):
     if db is not None:
         db.close()
 
+# 프로세스 단위 카탈로그 스냅샷
+catalog = CatalogStore(open_db_connection)
+catalog.register_builder('scoring', encode_catalog)
+
 # 거리 계산 함수 (Haversine formula)
 def calculate_distance(lat1, lon1, lat2, lon2):
     try:
@@ -89,53 +85,19 @@ def search_dishes():
         return jsonify({"error": "Failed to search dishes"}), 500
 
 # 추천 로직
-def recommend_dishes(user_dishes, dish_df, num_recommendations=5, include_soup_option=True, selected_season=None, vegan_only=False, user_lat=None, user_lon=None):
+def recommend_dishes(user_dishes, dish_df, num_recommendations=5, include_soup_option=True, selected_season=None, vegan_only=False, user_lat=None, user_lon=None, encoded=None):
     try:
-        # 사용자 반찬 정보
-        user_dishes_info = dish_df[dish_df['name'].isin(user_dishes)]
+        if encoded is None:
+            encoded = encode_frame(dish_df)
+
         candidate_dishes = dish_df[~dish_df['name'].isin(user_dishes)].copy()
 
         if vegan_only:
             candidate_dishes = candidate_dishes[candidate_dishes['characteristics'].str.contains('비건', na=False)]
 
-        candidate_dishes['score'] = 0
-
-        # 주요 재료 조화 점수
-        if not user_dishes_info.empty:
-            user_main_ingredients = set(
-                ','.join(user_dishes_info['main_ingredients'].dropna().astype(str)).split(',')
-            )
-            candidate_dishes['main_ingredients_score'] = candidate_dishes['main_ingredients'].apply(
-                lambda x: len(set(str(x).split(',')).intersection(user_main_ingredients))
-            ).apply(
-                lambda match_count: 1 if match_count > 0 else 2  # 겹치면 +1, 다양하면 +2
-            )
-            candidate_dishes['score'] += candidate_dishes['main_ingredients_score']
-
-        # 조리 방식 다양성 점수
-        user_cooking_methods = set(user_dishes_info['cooking_method'].dropna())
-        candidate_dishes['cooking_method_score'] = candidate_dishes['cooking_method'].apply(
-            lambda x: 2 if x not in user_cooking_methods else 1  # 새로운 방식 +2, 기존 방식 +1
-        )
-        candidate_dishes['score'] += candidate_dishes['cooking_method_score']
-
-        # 카테고리 다양성 점수
-        user_categories = set(user_dishes_info['category'].dropna())
-        candidate_dishes['category_score'] = candidate_dishes['category'].apply(
-            lambda x: 2 if x not in user_categories else 1  # 새로운 카테고리 +2, 기존 카테고리 +1
-        )
-        candidate_dishes['score'] += candidate_dishes['category_score']
-
-        # 맛 조화 점수
-        if not user_dishes_info.empty:
-            for _, user_dish in user_dishes_info.iterrows():
-                if 'flavor' in candidate_dishes.columns and 'flavor' in user_dish:
-                    candidate_dishes.loc[candidate_dishes['flavor'] != user_dish['flavor'], 'score'] += 2  # 다른 맛 +3
-                    candidate_dishes.loc[candidate_dishes['flavor'] == user_dish['flavor'], 'score'] += 1  # 같은 맛 +1
-
-        # 계절 조화 점수
-        if selected_season:
-            candidate_dishes.loc[candidate_dishes['season'] == selected_season, 'score'] += 2
+        # 주요 재료(겹치면 +1, 다양하면 +2), 조리 방식/카테고리(새로우면 +2, 기존 +1),
+        # 맛(다른 맛 +2, 같은 맛 +1), 계절(+2) 점수를 인코딩된 카탈로그에서 한 번에 계산
+        candidate_dishes['score'] = score_rows(encoded, candidate_dishes.index, user_dishes, selected_season, HARMONY_WEIGHTS)
 
         # 국물요리 포함 여부 처리
         top_soup = pd.DataFrame()
@@ -175,7 +137,7 @@ def recommend_dishes(user_dishes, dish_df, num_recommendations=5, include_soup_o
 def recommend():
     try:
         data = request.get_json()
-        app.logger.debug(f"Received data: {data}")
+        app.logger.debug("Received data: %s", data)
 
         user_dishes = data.get('user_dishes', [])
         num_recommendations = data.get('num_recommendations', 5)
@@ -186,26 +148,18 @@ def recommend():
         user_lat = data.get('user_lat', 37.4783)
         user_lon = data.get('user_lon', 126.9516)
 
-        db_connection = get_db_connection()
-        cursor = db_connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("""
-            SELECT s.name as store_name, s.latitude, s.longitude,
-                   d.name, d.image_url, CAST(sd.price AS SIGNED) as price, d.season, d.category, d.characteristics,
-                   d.main_ingredients, d.cooking_method, d.flavor
-            FROM store_dishes sd
-            JOIN stores s ON sd.store_id = s.id
-            JOIN dishes d ON sd.dish_id = d.id
-        """)
-        dish_data = cursor.fetchall()
-        dish_df = pd.DataFrame(dish_data)
+        # 공유 카탈로그 스냅샷 사용 (요청마다 JOIN 하지 않음)
+        snapshot = catalog.get()
+        dish_df = snapshot.frame
 
         recommendations = recommend_dishes(
             user_dishes, dish_df, num_recommendations,
-            include_soup_option, selected_season, vegan_only, user_lat, user_lon
+            include_soup_option, selected_season, vegan_only, user_lat, user_lon,
+            snapshot.extras['scoring']
         )
 
         # 필요한 데이터만 반환
-        app.logger.debug(f"Recommendations: {recommendations}")
+        app.logger.debug("Recommendations: %s", recommendations)
 
         result = recommendations[['name', 'store_name', 'price', 'image_url', 'distance']].to_dict(orient='records')
         return jsonify(result)
@@ -226,6 +180,9 @@ from dotenv import load_dotenv
 import os
 import math
 
+from catalog import CatalogStore
+from scoring import SERVER_WEIGHTS, encode_catalog, encode_frame, score_rows
+
 # 환경 변수 로드
 load_dotenv()
 
@@ -234,18 +191,21 @@ app = Flask(__name__)
 CORS(app)
 
 # 로깅 설정
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging()
 logger = logging.getLogger()
 
 # MariaDB 연결 관리
+def open_db_connection():
+    return pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', '1111'),
+        database=os.getenv('DB_NAME', 'bapsim')
+    )
+
 def get_db_connection():
     if 'db' not in g:
-        g.db = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', '1111'),
-            database=os.getenv('DB_NAME', 'bapsim')
-        )
+        g.db = open_db_connection()
     return g.db
 
 @app.teardown_appcontext
@@ -254,6 +214,10 @@ def close_db_connection(exception):
     if db is not None:
         db.close()
 
+# 프로세스 단위 카탈로그 스냅샷
+catalog = CatalogStore(open_db_connection)
+catalog.register_builder('scoring', encode_catalog)
+
 # 거리 계산 함수 (Haversine formula)
 def calculate_distance(lat1, lon1, lat2, lon2):
     try:
@@ -294,29 +258,18 @@ def search_dishes():
         return jsonify({"error": "Failed to search dishes"}), 500
 
 # 추천 로직
-def recommend_dishes(user_dishes, dish_df, num_recommendations, include_soup_option, selected_season=None, vegan_only=False):
+def recommend_dishes(user_dishes, dish_df, num_recommendations, include_soup_option, selected_season=None, vegan_only=False, encoded=None):
     try:
-        # 사용자 반찬 정보
-        user_dishes_info = dish_df[dish_df['name'].isin(user_dishes)]
+        if encoded is None:
+            encoded = encode_frame(dish_df)
+
         candidate_dishes = dish_df[~dish_df['name'].isin(user_dishes)].copy()
 
         if vegan_only:
             candidate_dishes = candidate_dishes[candidate_dishes['characteristics'].str.contains('비건', na=False)]
 
-        candidate_dishes['score'] = 0
-
-        # 사용자 반찬 정보 기반 점수 계산
-        if not user_dishes_info.empty:
-            user_categories = user_dishes_info['category'].unique()
-            for _, user_dish in user_dishes_info.iterrows():
-                if 'flavor' in candidate_dishes.columns and 'flavor' in user_dish:
-                    candidate_dishes.loc[candidate_dishes['flavor'] != user_dish['flavor'], 'score'] += 3
-                    candidate_dishes.loc[candidate_dishes['flavor'] == user_dish['flavor'], 'score'] += 2
-                    candidate_dishes.loc[~candidate_dishes['category'].isin(user_categories), 'score'] += 3
-
-        # 계절 필터 추가
-        if selected_season:
-            candidate_dishes.loc[candidate_dishes['season'] == selected_season, 'score'] += 2
+        # 사용자 반찬 정보(맛, 카테고리) 및 계절 기반 점수 계산
+        candidate_dishes['score'] = score_rows(encoded, candidate_dishes.index, user_dishes, selected_season, SERVER_WEIGHTS)
 
         # 국물요리 포함 여부 처리
         top_soup = pd.DataFrame()
@@ -368,7 +321,7 @@ def recommend_dishes(user_dishes, dish_df, num_recommendations, include_soup_opt
 def recommend():
     try:
         data = request.get_json()
-        logger.debug(f"Received data: {data}")
+        logger.debug("Received data: %s", data)
 
         user_dishes = data.get('user_dishes', [])
         num_recommendations = data.get('num_recommendations', 5)
@@ -379,21 +332,14 @@ def recommend():
         user_lat = data.get('user_lat', 37.4783)
         user_lon = data.get('user_lon', 126.9516)
 
-        db_connection = get_db_connection()
-        cursor = db_connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("""
-            SELECT s.name as store_name, s.latitude, s.longitude,
-                   d.name, d.image_url, CAST(sd.price AS SIGNED) as price, d.season, d.category, d.characteristics
-            FROM store_dishes sd
-            JOIN stores s ON sd.store_id = s.id
-            JOIN dishes d ON sd.dish_id = d.id
-        """)
-        dish_data = cursor.fetchall()
-        dish_df = pd.DataFrame(dish_data)
+        # 공유 카탈로그 스냅샷 사용 (요청마다 JOIN 하지 않음)
+        snapshot = catalog.get()
+        dish_df = snapshot.frame
 
         recommendations = recommend_dishes(
             user_dishes, dish_df, num_recommendations,
-            include_soup_option, selected_season, vegan_only
+            include_soup_option, selected_season, vegan_only,
+            snapshot.extras['scoring']
         )
 
         # 거리 계산
@@ -0,0 +1,322 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+
+# 프로세스 내 요청/단계별 지표 (Prometheus 텍스트 형식으로 /metrics 에서 내보냄)
+#   라벨 값 튜플마다 자식 지표를 한 번만 만들어 두고 재사용 (요청마다 라벨 dict 를 만들지 않음)
+#   히스토그램 버킷 배열은 자식 생성 시 미리 할당, 관측은 이분 탐색 + 카운터 증가만 수행
+#   METRICS_ENABLED=0 이면 stage() 가 아무것도 하지 않음
+#   gunicorn 등 멀티 프로세스에서는 워커별로 따로 집계됨
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 요청 지연 시간 버킷 (초)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 추천 내부 단계 / SQL 버킷 (초, 더 짧은 구간 위주)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+ENABLED = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=''):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', '_buckets', 'counts', 'sum')
+
+    def __init__(self, lock, buckets):
+        self._lock = lock
+        self._buckets = buckets
+        # 마지막 칸은 +Inf 버킷
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('_child', '_started')
+
+    def __init__(self, child):
+        self._child = child
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# 라벨 값 튜플 -> 자식 지표
+class _Family:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.label_names:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items(), key=lambda item: tuple(str(value) for value in item[0]))
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, child in self._items():
+            lines.append(f'{self.name}{_label_text(self.label_names, values)} {_number(child.value)}')
+        return lines
+
+
+class Counter(_Family):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild(self._lock)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Family):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild(self._lock)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(_Family):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, label_names)
+
+    def _new_child(self):
+        return _HistogramChild(self._lock, self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        bounds = self.buckets + (float('inf'),)
+        for values, child in self._items():
+            with self._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _label_text(self.label_names, values, f'le="{_number(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _label_text(self.label_names, values)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families = []
+        self._collectors = []
+
+    def register(self, family):
+        self._families.append(family)
+        return family
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    # 조회 시점에 값을 읽는 게이지 (collect() -> [(이름, 설명, 값, 라벨 dict 또는 None)])
+    def register_collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    def unregister_collector(self, collect):
+        if collect in self._collectors:
+            self._collectors.remove(collect)
+
+    def render(self):
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        seen = set()
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+                continue
+            for name, help_text, value, labels in samples:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f'# HELP {name} {help_text}')
+                    lines.append(f'# TYPE {name} gauge')
+                label_text = _label_text(labels, labels.values()) if labels else ''
+                lines.append(f'{name}{label_text} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter('bapsim_http_requests_total', 'HTTP requests by route, method and status',
+                            ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram('bapsim_http_request_duration_seconds', 'HTTP request latency by route',
+                                     ('endpoint', 'method'))
+IN_FLIGHT = REGISTRY.gauge('bapsim_http_requests_in_flight', 'HTTP requests currently being handled')
+STAGE_SECONDS = REGISTRY.histogram('bapsim_stage_duration_seconds',
+                                   'Time spent in recommendation stages, SQL calls and serialization',
+                                   ('stage',), STAGE_BUCKETS)
+
+
+# 요청 하나의 결과 기록 (endpoint 는 경로 템플릿, 예: /stores/<int:store_id>/dishes)
+def observe_request(endpoint, method, status, seconds):
+    if not ENABLED:
+        return
+    REQUESTS.labels(endpoint, method, status).inc()
+    REQUEST_SECONDS.labels(endpoint, method).observe(seconds)
+
+
+# with stage('recommend.score'): ... 로 단계 시간 측정
+def stage(name):
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(STAGE_SECONDS.labels(name))
+
+
+# stats() dict 의 숫자 값을 bapsim_<prefix>_<키> 게이지로 내보내는 수집기 (중첩 dict 는 키를 이어 붙임)
+def stats_collector(prefix, stats, help_text=None):
+    def flatten(name, values):
+        for key, value in values.items():
+            key = f'{name}_{re.sub(r"[^a-zA-Z0-9_]", "_", str(key))}'
+            if isinstance(value, dict):
+                yield from flatten(key, value)
+            elif isinstance(value, (int, float)):
+                yield key, int(value) if isinstance(value, bool) else value
+
+    def collect():
+        values = stats()
+        if values is None:
+            return []
+        return [(name, help_text or f'{prefix} stats', value, None)
+                for name, value in flatten(f'bapsim_{prefix}', values)]
+    return collect
+
+
+# 카탈로그 스냅샷 정보 (로드되기 전이면 내보내지 않음, 조회 때문에 로드를 일으키지 않음)
+def catalog_collector(catalog):
+    def collect():
+        snapshot = catalog.peek()
+        if snapshot is None:
+            return []
+        samples = [
+            ('bapsim_catalog_info', 'Loaded catalog version', 1, {'version': snapshot.version}),
+            ('bapsim_catalog_generation', 'Catalog reload generation', snapshot.generation, None),
+            ('bapsim_catalog_load_seconds', 'Seconds taken by the last catalog load', snapshot.load_seconds, None),
+            ('bapsim_catalog_loaded_timestamp_seconds', 'Unix time of the last catalog load', snapshot.loaded_at,
+             None),
+        ]
+        for table, count in snapshot.row_counts.items():
+            samples.append(('bapsim_catalog_rows', 'Catalog rows by table', count, {'table': table}))
+        return samples
+    return collect
+
+
+def render():
+    return REGISTRY.render()
@@ -1,27 +1,20 @@
-import csv
-import pymysql
+import logging
 
-# MariaDB 연결
-db_connection = pymysql.connect(
-    host='localhost',
-    user='root',
-    password='1111',
-    database='bapsim',
-    charset='utf8mb4'
-)
-cursor = db_connection.cursor()
+from bulk_load import bulk_load
+from db_pool import pool_from_env
+
+# dish_images.csv 의 이미지 URL 을 이름이 같은 반찬에 반영 (UPDATE JOIN 한 번, 다시 실행해도 결과 동일)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# CSV 파일 읽고 DB 업데이트
 csv_file = 'data/dish_images.csv'
-with open(csv_file, mode='r', encoding='utf-8') as file:
-    reader = csv.DictReader(file)
-    for row in reader:
-        dish_name = row['dish_name']
-        image_url = row['image_url']
-        query = "UPDATE dishes SET image_url = %s WHERE name = %s"
-        cursor.execute(query, (image_url, dish_name))
-        print(f"Updated {dish_name} with URL: {image_url}")
 
-db_connection.commit()
-cursor.close()
-db_connection.close()
+# MariaDB 연결 (풀에서 빌려 씀)
+db_pool = pool_from_env(charset='utf8mb4')
+db_connection = db_pool.acquire()
+
+try:
+    stats = bulk_load(db_connection, 'images', csv_file)
+    print(f"Updated images for {stats['rows']} dishes ({stats['rows_per_second']} rows/sec)")
+finally:
+    db_connection.close()
+    db_pool.close()
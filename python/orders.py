@@ -0,0 +1,316 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from heapq import nlargest
+
+import numpy as np
+
+from metrics import stage
+
+# 주문 로그와 반찬 x 반찬 동시 주문(PMI) 인덱스
+#   POST /orders 로 받은 장바구니를 한 줄짜리 JSON 으로 로그 파일 끝에 추가하고,
+#   각 워커는 로그를 이어 읽으며 인덱스를 갱신 (다른 워커가 받은 주문도 반영, 전체 재계산 없음)
+#   ORDER_LOG_PATH=data/orders.jsonl   주문 로그 (추가만 함)
+#   ORDER_INDEX_DIR=                   rebuild_order_index.py 가 저장한 인덱스 (있으면 저장된 위치부터 이어 읽음)
+#   COOCCURRENCE_NEIGHBORS=50          반찬마다 유지하는 이웃 수
+#   COOCCURRENCE_MIN_COUNT=2           이웃으로 인정할 최소 동시 주문 수
+#   COOCCURRENCE_WEIGHT=3              /recommend 점수에 더하는 최대 점수 (사용자 반찬 하나, 규칙 점수와 같은 행 단위)
+#   COOCCURRENCE_POLL_SECONDS=2        다른 워커가 추가한 주문 확인 주기
+logger = logging.getLogger(__name__)
+
+ITEM_IDS_FILE = 'order_item_ids.npy'
+ITEM_COUNTS_FILE = 'order_item_counts.npy'
+PAIRS_FILE = 'order_pairs.npy'
+META_FILE = 'order_meta.json'
+
+
+# 추가 전용 주문 로그 (JSON Lines)
+#   한 줄을 O_APPEND 로 한 번에 써서 여러 프로세스가 같은 파일에 추가해도 줄이 섞이지 않음
+class OrderLog:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    # offset 부터 끝까지 (주문, 다음 줄 위치) 생성 (아직 쓰는 중인 마지막 줄은 다음에 읽음)
+    def records(self, offset=0):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    yield json.loads(line), offset
+                except ValueError:
+                    logger.warning(f"Skipping malformed order log line ending at byte {offset}")
+
+
+# 반찬 동시 주문 수와 반찬별 상위 이웃 목록
+#   주문이 들어오면 장바구니 반찬 쌍의 횟수를 올리고, 장바구니에 있던 반찬의 이웃 목록만 다시 고름
+#   점수: PMI = log(N * c_ab / (c_a * (c_b + shrinkage))) (후보 반찬 주문 수에 shrinkage 를 더해 드물게 주문된
+#   반찬끼리의 쌍이 위로 오지 않게 함), 조회 시점의 횟수로 계산
+#   이웃 순위는 log(c_ab / (c_b + shrinkage)) 로 정함 (같은 행에서는 점수와 같은 순서이고 N, c_a 가 바뀌어도 유지,
+#   장바구니 밖 반찬의 이웃 순위는 해당 반찬이 다시 주문될 때 갱신됨)
+class CooccurrenceIndex:
+    def __init__(self, neighbors=50, min_count=2, shrinkage=5, max_basket=50):
+        self.n_neighbors = neighbors
+        self.min_count = min_count
+        self.shrinkage = shrinkage
+        # 장바구니 반찬 수 상한 (쌍 수가 제곱으로 늘어나는 것 방지)
+        self.max_basket = max_basket
+        self.orders = 0
+        self.item_counts = {}
+        self.pair_counts = {}
+        # 반찬 id -> 이웃 반찬 id 목록 (순위 내림차순, 목록 전체를 교체하므로 읽을 때 잠금 불필요)
+        self.neighbors = {}
+        # 로그에서 반영한 위치 (바이트)
+        self.offset = 0
+
+    def score(self, a, b):
+        count = self.pair_counts.get(a, {}).get(b, 0)
+        if not count:
+            return 0.0
+        pmi = math.log(self.orders * count / (self.item_counts[a] * (self.item_counts[b] + self.shrinkage)))
+        return max(pmi, 0.0)
+
+    def _refresh(self, dish_id):
+        row = self.pair_counts.get(dish_id)
+        if not row:
+            return
+        item_counts, shrinkage = self.item_counts, self.shrinkage
+        candidates = ((other, math.log(count / (item_counts[other] + shrinkage))) for other, count in row.items()
+                      if count >= self.min_count)
+        # 같은 순위는 반찬 id 가 작은 쪽 우선 (읽은 순서와 관계없이 같은 목록)
+        top = nlargest(self.n_neighbors, candidates, key=lambda item: (item[1], -item[0]))
+        self.neighbors[dish_id] = [other for other, _ in top]
+
+    # 장바구니 하나 반영 (중복 반찬은 한 번만)
+    def add(self, dish_ids):
+        basket = list(dict.fromkeys(int(dish_id) for dish_id in dish_ids))[:self.max_basket]
+        if not basket:
+            return
+        self.orders += 1
+        for dish_id in basket:
+            self.item_counts[dish_id] = self.item_counts.get(dish_id, 0) + 1
+        if len(basket) < 2:
+            return
+        for dish_id in basket:
+            row = self.pair_counts.setdefault(dish_id, {})
+            for other in basket:
+                if other != dish_id:
+                    row[other] = row.get(other, 0) + 1
+        for dish_id in basket:
+            self._refresh(dish_id)
+
+    def add_order(self, record):
+        self.add(item['dish_id'] for item in record.get('items', ()) if item.get('dish_id') is not None)
+
+    # 사용자 반찬들의 이웃 점수 합 (사용자 반찬마다 이웃 목록만 확인하고 최고 점수를 1 로 맞춤)
+    def scores(self, dish_ids):
+        totals = {}
+        for dish_id in set(int(dish_id) for dish_id in dish_ids):
+            scored = [(other, self.score(dish_id, other)) for other in self.neighbors.get(dish_id, ())]
+            top = max((score for _, score in scored), default=0.0)
+            if top <= 0:
+                continue
+            for other, score in scored:
+                if score > 0:
+                    totals[other] = totals.get(other, 0.0) + score / top
+        return totals
+
+    def stats(self):
+        return {
+            'orders': self.orders,
+            'dishes': len(self.item_counts),
+            'pairs': sum(len(row) for row in self.pair_counts.values()) // 2,
+            'dishes_with_neighbors': sum(1 for neighbors in self.neighbors.values() if neighbors),
+            'offset': self.offset,
+        }
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        item_ids = np.fromiter(self.item_counts.keys(), dtype=np.int64, count=len(self.item_counts))
+        item_counts = np.fromiter(self.item_counts.values(), dtype=np.int64, count=len(self.item_counts))
+        pairs = np.array([(a, b, count) for a, row in self.pair_counts.items() for b, count in row.items() if a < b],
+                         dtype=np.int64).reshape(-1, 3)
+        np.save(os.path.join(directory, ITEM_IDS_FILE), item_ids)
+        np.save(os.path.join(directory, ITEM_COUNTS_FILE), item_counts)
+        np.save(os.path.join(directory, PAIRS_FILE), pairs)
+        with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'orders': self.orders, 'offset': self.offset, 'neighbors': self.n_neighbors,
+                       'min_count': self.min_count, 'shrinkage': self.shrinkage, 'max_basket': self.max_basket}, f)
+
+    # 저장된 횟수로 복원 (이웃 목록은 불러올 때 한 번 계산)
+    @classmethod
+    def load(cls, directory, **kwargs):
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        options = {name: meta[name] for name in ('neighbors', 'min_count', 'shrinkage', 'max_basket')}
+        options.update(kwargs)
+        index = cls(**options)
+        index.orders = meta['orders']
+        index.offset = meta['offset']
+        item_ids = np.load(os.path.join(directory, ITEM_IDS_FILE))
+        item_counts = np.load(os.path.join(directory, ITEM_COUNTS_FILE))
+        index.item_counts = dict(zip(item_ids.tolist(), item_counts.tolist()))
+        for a, b, count in np.load(os.path.join(directory, PAIRS_FILE)).tolist():
+            index.pair_counts.setdefault(a, {})[b] = count
+            index.pair_counts.setdefault(b, {})[a] = count
+        for dish_id in index.pair_counts:
+            index._refresh(dish_id)
+        return index
+
+
+# 로그 파일 전체를 다시 읽어 인덱스 생성
+def replay(log, **options):
+    index = CooccurrenceIndex(**options)
+    for record, offset in log.records(0):
+        index.add_order(record)
+        index.offset = offset
+    return index
+
+
+# 주문 기록 + 워커별 인덱스 (요청 처리 스레드는 인덱스를 읽기만 하고, 갱신은 잠금 안에서 수행)
+class OrderStore:
+    def __init__(self, log, index, weight=3.0, poll_interval=2, index_options=None):
+        self.log = log
+        self.index = index
+        self.weight = weight
+        self._poll_interval = poll_interval
+        self._index_options = index_options or {}
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def record(self, record):
+        with stage('orders.append'):
+            self.log.append(record)
+        self.catch_up()
+
+    # 로그에서 아직 반영하지 않은 주문 반영 -> 반영한 주문 수
+    def catch_up(self):
+        with self._lock:
+            index = self.index
+            if self.log.size() < index.offset:
+                # 로그가 교체/잘린 경우 처음부터 다시 생성
+                logger.warning(f"Order log {self.log.path} is shorter than the indexed offset; replaying")
+                index = self.index = CooccurrenceIndex(**self._index_options)
+            added = 0
+            with stage('orders.index_update'):
+                for record, offset in self.log.records(index.offset):
+                    index.add_order(record)
+                    index.offset = offset
+                    added += 1
+            return added
+
+    # 카탈로그 반찬 순서(encoded.dish_ids)의 가산 점수 (이웃이 없으면 None)
+    def dish_scores(self, encoded, user_dishes):
+        dish_ids = [encoded.dish_ids[position] for name in set(user_dishes)
+                    for position in encoded.name_to_dishes.get(name, ())]
+        totals = self.index.scores(dish_ids)
+        if not totals:
+            return None
+        positions = encoded.positions(list(totals.keys()))
+        boost = np.zeros(encoded.size, dtype=np.float64)
+        found = positions >= 0
+        boost[positions[found]] = np.fromiter(totals.values(), dtype=np.float64, count=len(totals))[found]
+        return boost * self.weight
+
+    def stats(self):
+        return self.index.stats()
+
+    def start_background_refresh(self):
+        if self._poll_interval <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name='order-index-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self._poll_interval)
+            try:
+                self.catch_up()
+            except Exception as e:
+                logger.error(f"Order index refresh failed: {e}")
+
+
+# 요청 본문 -> 로그 레코드 (반찬은 dish_id 또는 이름으로 지정, 카탈로그에 없는 이름은 dish_id 없이 기록)
+#   {"order_id": "...", "user_id": "...",
+#    "items": [{"name": "멸치볶음", "store_name": "...", "quantity": 2, "price": 5000}, ...]}
+def build_order_record(data, encoded):
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list) or not data['items']:
+        raise ValueError("items must be a non-empty list")
+    items = []
+    for item in data['items']:
+        if not isinstance(item, dict) or (item.get('dish_id') is None and not item.get('name')):
+            raise ValueError("each item needs a dish_id or a name")
+        dish_id = item.get('dish_id')
+        if dish_id is None:
+            positions = encoded.name_to_dishes.get(str(item['name']).strip(), ())
+            dish_id = int(encoded.dish_ids[positions[0]]) if positions else None
+        items.append({
+            'dish_id': int(dish_id) if dish_id is not None else None,
+            'name': item.get('name'),
+            'store_name': item.get('store_name'),
+            'quantity': int(item.get('quantity', 1)),
+            'price': item.get('price'),
+        })
+    return {
+        'order_id': str(data.get('order_id') or uuid.uuid4().hex),
+        'user_id': data.get('user_id'),
+        'ts': time.time(),
+        'items': items,
+    }
+
+
+def index_options_from_env():
+    return {
+        'neighbors': int(os.getenv('COOCCURRENCE_NEIGHBORS', '50')),
+        'min_count': int(os.getenv('COOCCURRENCE_MIN_COUNT', '2')),
+    }
+
+
+# 저장된 인덱스가 있으면 불러와 이후 주문만 반영, 없으면 로그 전체를 다시 읽음
+def order_store_from_env():
+    log = OrderLog(os.getenv('ORDER_LOG_PATH', 'data/orders.jsonl'))
+    options = index_options_from_env()
+    directory = os.getenv('ORDER_INDEX_DIR')
+    index = None
+    if directory and os.path.exists(os.path.join(directory, META_FILE)):
+        index = CooccurrenceIndex.load(directory, **options)
+        if index.offset > log.size():
+            logger.warning(f"Saved order index {directory} is ahead of {log.path}; replaying the log")
+            index = None
+    store = OrderStore(log, index or CooccurrenceIndex(**options),
+                       weight=float(os.getenv('COOCCURRENCE_WEIGHT', '3')),
+                       poll_interval=float(os.getenv('COOCCURRENCE_POLL_SECONDS', '2')),
+                       index_options=options)
+    started = time.perf_counter()
+    added = store.catch_up()
+    logger.info(f"Order index ready: {added} orders replayed in {time.perf_counter() - started:.3f}s, "
+                f"{store.stats()}")
+    return store
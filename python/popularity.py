@@ -0,0 +1,367 @@
+import logging
+import math
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import REGISTRY
+
+# 실시간 인기도 (반찬 / 가게 / 위치 격자별 시간 감쇠 횟수)
+#   요청 스레드는 이벤트를 큐에 넣기만 하고 (가득 차면 버림), 백그라운드 스레드 하나가 모든 카운터를 갱신
+#   -> 쓰기에 잠금이 없고, 조회는 dict / 배열 값 하나를 읽는 O(1)
+#   감쇠: 전진 감쇠(forward decay) - 이벤트 값에 2^((t - 기준 시각) / 반감기) 를 곱해 더해 두고 읽을 때 한 번만 나눔
+#   (키마다 마지막 갱신 시각을 두지 않음, 곱하는 값이 커지면 전체를 한 번 다시 맞춤)
+#   반찬 / 가게 / 격자는 정확한 횟수, 격자 x 반찬 (지역별 인기, 키가 많은 긴 꼬리) 은 count-min sketch
+#   POPULARITY_ENABLED=1
+#   POPULARITY_HALF_LIFE_SECONDS=10800    반감기
+#   POPULARITY_CELL_DEGREES=0.01          위치 격자 크기 (약 1km)
+#   POPULARITY_WEIGHT=2                   /recommend 점수에 더하는 최대 점수 (전체 인기, 규칙 점수와 같은 행 단위)
+#   POPULARITY_LOCAL_WEIGHT=2             /recommend 점수에 더하는 최대 점수 (사용자 주변 격자 인기)
+#   POPULARITY_CHECKPOINT_PATH=data/popularity.npz   주기적으로 저장하고 시작 시 불러옴
+#   POPULARITY_CHECKPOINT_SECONDS=60
+#   POPULARITY_QUEUE_SIZE=100000
+#   멀티 프로세스에서는 워커마다 받은 이벤트만 세지만 (트래픽의 일부 표본), 점수는 최댓값 대비 비율이라 영향이 적음
+logger = logging.getLogger(__name__)
+
+# 이벤트 종류별 가중치 (order 는 수량만큼 곱함)
+EVENT_WEIGHTS = {'view': 1.0, 'click': 3.0, 'order': 5.0}
+
+# 곱하는 값이 2^RENORMALIZE_EXPONENT 를 넘으면 기준 시각을 옮김 (float64 범위 안에서 여유 있게)
+RENORMALIZE_EXPONENT = 64
+# 기준 시각을 옮길 때 감쇠된 값이 이보다 작은 키는 삭제
+PRUNE_BELOW = 1e-3
+
+# count-min sketch 해시: key = 격자 * _CELL_STRIDE + 반찬 id, 열 = (a * key + b) mod P mod width
+#   a * key 를 격자 부분과 반찬 부분으로 나눠 계산 (반찬 부분은 카탈로그마다 한 번만 계산)
+_PRIME = 2 ** 31 - 1
+_CELL_STRIDE = 1000003
+
+DROPPED = REGISTRY.counter('bapsim_popularity_events_dropped_total',
+                           'Popularity events dropped because the event queue was full')
+
+
+# 감쇠된 횟수 (이벤트 값이 같은 기준 시각에 맞춰 저장되므로 테이블 전체를 한 번에 교체)
+class _Counts:
+    def __init__(self, landmark, width, depth):
+        self.landmark = landmark
+        self.dishes = {}
+        self.stores = {}
+        self.cells = {}
+        self.sketch = np.zeros((depth, width), dtype=np.float64)
+
+
+# 격자 x 반찬 횟수 sketch 의 행별 해시 계수 (고정 시드, 체크포인트와 워커 간에 같은 위치)
+def _sketch_hashes(depth):
+    rng = np.random.default_rng(20240611)
+    return (rng.integers(1, _PRIME, size=depth, dtype=np.int64),
+            rng.integers(0, _PRIME, size=depth, dtype=np.int64))
+
+
+def _cell_key(cell):
+    row, col = cell
+    return (row % 100003) * 100003 + col % 100003
+
+
+class PopularityTracker:
+    def __init__(self, half_life=3 * 3600, cell_degrees=0.01, sketch_width=2 ** 14, sketch_depth=4,
+                 queue_size=100000, checkpoint_path=None, checkpoint_interval=60, weight=2.0, local_weight=2.0):
+        self.half_life = half_life
+        self.cell_degrees = cell_degrees
+        self.weight = weight
+        self.local_weight = local_weight
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self._hash_a, self._hash_b = _sketch_hashes(sketch_depth)
+        self._width = sketch_width
+        self._counts = _Counts(time.time(), sketch_width, sketch_depth)
+        self._events = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._processed = 0
+        self._checkpointed_at = time.time()
+        # 반찬 순서 점수 벡터 캐시 (EncodedCatalog, 계산 시각, 벡터)
+        self._vector_cache = (None, 0.0, None)
+        self._dish_hash_cache = (None, None)
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            try:
+                self._load(checkpoint_path)
+            except Exception as e:
+                logger.warning(f"Could not load popularity checkpoint {checkpoint_path}: {e}")
+
+    def cell(self, lat, lon):
+        if lat is None or lon is None:
+            return None
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return None
+        if math.isnan(lat) or math.isnan(lon):
+            return None
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    # 이벤트 기록 (요청 스레드에서 호출, 큐가 가득 차면 버림)
+    def record(self, kind, dish_id=None, store_id=None, lat=None, lon=None, count=1):
+        weight = EVENT_WEIGHTS.get(kind)
+        if weight is None:
+            raise ValueError(f"unknown event type: {kind}")
+        event = (time.time(), weight * count,
+                 int(dish_id) if dish_id is not None else None,
+                 int(store_id) if store_id is not None else None,
+                 self.cell(lat, lon))
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            DROPPED.inc()
+
+    def _factor(self, counts, now):
+        return 2.0 ** ((now - counts.landmark) / self.half_life)
+
+    def _dish_hashes(self, dish_ids):
+        return self._hash_a[:, None] * (np.asarray(dish_ids, dtype=np.int64)[None, :] % _PRIME) % _PRIME
+
+    def _sketch_columns(self, cell_key, dish_hashes):
+        cell_hashes = self._hash_a * (cell_key * _CELL_STRIDE % _PRIME) % _PRIME + self._hash_b
+        return (dish_hashes + cell_hashes[:, None]) % _PRIME % self._width
+
+    def _apply(self, event):
+        ts, weight, dish_id, store_id, cell = event
+        counts = self._counts
+        value = weight * self._factor(counts, ts)
+        if dish_id is not None:
+            counts.dishes[dish_id] = counts.dishes.get(dish_id, 0.0) + value
+        if store_id is not None:
+            counts.stores[store_id] = counts.stores.get(store_id, 0.0) + value
+        if cell is not None:
+            counts.cells[cell] = counts.cells.get(cell, 0.0) + value
+            if dish_id is not None:
+                columns = self._sketch_columns(_cell_key(cell), self._dish_hashes([dish_id]))[:, 0]
+                counts.sketch[np.arange(len(columns)), columns] += value
+        self._processed += 1
+
+    # 기준 시각을 now 로 옮긴 새 테이블 (곱하는 값 2^-경과 반감기 수는 아주 오래된 테이블이면 0 으로 내려가 비워짐)
+    def _rebase(self, counts, now):
+        scale = 2.0 ** -(max(now - counts.landmark, 0.0) / self.half_life)
+        renormalized = _Counts(now, self._width, len(self._hash_a))
+        for name in ('dishes', 'stores', 'cells'):
+            setattr(renormalized, name, {key: value * scale for key, value in getattr(counts, name).items()
+                                         if value * scale >= PRUNE_BELOW})
+        renormalized.sketch = counts.sketch * scale
+        return renormalized
+
+    # 기준 시각을 현재로 옮긴 새 테이블로 교체 (읽는 쪽은 교체 전/후 어느 쪽이든 일관된 값을 봄)
+    def _renormalize(self, now):
+        self._counts = self._rebase(self._counts, now)
+
+    def _run(self):
+        while True:
+            try:
+                event = self._events.get(timeout=1.0)
+            except queue.Empty:
+                event = None
+            if event is not None:
+                try:
+                    self._apply(event)
+                except Exception as e:
+                    logger.error(f"Popularity event failed: {e}")
+                finally:
+                    self._events.task_done()
+            # 기준 시각 이동 / 체크포인트 오류로 스레드가 멈추지 않도록 (멈추면 이벤트가 큐에 쌓이기만 함)
+            now = time.time()
+            try:
+                if (now - self._counts.landmark) / self.half_life > RENORMALIZE_EXPONENT:
+                    self._renormalize(now)
+            except Exception as e:
+                logger.error(f"Popularity renormalize failed: {e}")
+            if self.checkpoint_path and now - self._checkpointed_at >= self.checkpoint_interval:
+                self._checkpointed_at = now
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    logger.error(f"Popularity checkpoint failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='popularity', daemon=True)
+            self._thread.start()
+
+    # 큐에 들어간 이벤트가 모두 반영될 때까지 대기
+    def flush(self):
+        self._events.join()
+
+    # 현재 시각 기준 감쇠된 횟수 (O(1))
+    def dish_count(self, dish_id):
+        counts = self._counts
+        return counts.dishes.get(int(dish_id), 0.0) / self._factor(counts, time.time())
+
+    def store_count(self, store_id):
+        counts = self._counts
+        return counts.stores.get(int(store_id), 0.0) / self._factor(counts, time.time())
+
+    def cell_count(self, lat, lon):
+        counts = self._counts
+        return counts.cells.get(self.cell(lat, lon), 0.0) / self._factor(counts, time.time())
+
+    # 격자 x 반찬 횟수 추정치 (실제 이상, sketch 행 중 최솟값)
+    def local_count(self, lat, lon, dish_id):
+        cell = self.cell(lat, lon)
+        if cell is None:
+            return 0.0
+        counts = self._counts
+        columns = self._sketch_columns(_cell_key(cell), self._dish_hashes([dish_id]))[:, 0]
+        return float(counts.sketch[np.arange(len(columns)), columns].min()) / self._factor(counts, time.time())
+
+    # 카탈로그 반찬 순서(encoded.dish_ids)의 가산 점수 (최다 반찬 = weight, 이벤트가 없으면 None)
+    #   전체 인기 벡터는 1초에 한 번만 다시 만들고, 주변 격자 인기는 sketch 에서 반찬 수만큼 배열 연산으로 읽음
+    def dish_boost(self, encoded, lat=None, lon=None):
+        counts = self._counts
+        cached_encoded, computed_at, vector = self._vector_cache
+        now = time.time()
+        if cached_encoded is not encoded or now - computed_at > 1.0:
+            values = np.fromiter((counts.dishes.get(int(dish_id), 0.0) for dish_id in encoded.dish_ids),
+                                 dtype=np.float64, count=encoded.size)
+            top = values.max() if len(values) else 0.0
+            vector = values * (self.weight / top) if top > 0 else None
+            self._vector_cache = (encoded, now, vector)
+
+        cell = self.cell(lat, lon)
+        if cell is None or not self.local_weight or not counts.cells.get(cell):
+            return vector
+        cached_encoded, dish_hashes = self._dish_hash_cache
+        if cached_encoded is not encoded:
+            dish_hashes = self._dish_hashes(encoded.dish_ids)
+            self._dish_hash_cache = (encoded, dish_hashes)
+        columns = self._sketch_columns(_cell_key(cell), dish_hashes)
+        local = counts.sketch[np.arange(len(columns))[:, None], columns].min(axis=0)
+        top = local.max()
+        if top <= 0:
+            return vector
+        local = local * (self.local_weight / top)
+        return local if vector is None else vector + local
+
+    def top(self, table, limit=10):
+        counts = self._counts
+        factor = self._factor(counts, time.time())
+        items = sorted(list(getattr(counts, table).items()), key=lambda item: item[1], reverse=True)[:limit]
+        return [(list(key) if isinstance(key, tuple) else key, round(value / factor, 3)) for key, value in items]
+
+    # 상위 반찬 / 가게 / 격자 (관리용)
+    def summary(self, limit=10):
+        return dict(self.stats(), top_dishes=self.top('dishes', limit), top_stores=self.top('stores', limit),
+                    top_cells=self.top('cells', limit), half_life=self.half_life)
+
+    def stats(self):
+        counts = self._counts
+        return {
+            'processed': self._processed,
+            'queued': self._events.qsize(),
+            'dishes': len(counts.dishes),
+            'stores': len(counts.stores),
+            'cells': len(counts.cells),
+        }
+
+    # 임시 파일에 쓴 뒤 교체 (저장 중 종료되어도 이전 체크포인트 유지)
+    def checkpoint(self, path=None):
+        path = path or self.checkpoint_path
+        counts = self._counts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp.npz'
+        dishes, stores, cells = list(counts.dishes.items()), list(counts.stores.items()), list(counts.cells.items())
+        np.savez(
+            temporary,
+            landmark=np.float64(counts.landmark),
+            half_life=np.float64(self.half_life),
+            cell_degrees=np.float64(self.cell_degrees),
+            dish_ids=np.array([key for key, _ in dishes], dtype=np.int64),
+            dish_values=np.array([value for _, value in dishes], dtype=np.float64),
+            store_ids=np.array([key for key, _ in stores], dtype=np.int64),
+            store_values=np.array([value for _, value in stores], dtype=np.float64),
+            cell_keys=np.array([key for key, _ in cells], dtype=np.int64).reshape(-1, 2),
+            cell_values=np.array([value for _, value in cells], dtype=np.float64),
+            sketch=counts.sketch,
+        )
+        os.replace(temporary, path)
+
+    def _load(self, path):
+        with np.load(path) as data:
+            if float(data['half_life']) != self.half_life or float(data['cell_degrees']) != self.cell_degrees \
+                    or data['sketch'].shape != self._counts.sketch.shape:
+                logger.warning(f"Ignoring popularity checkpoint {path}: saved with different settings")
+                return
+            counts = _Counts(float(data['landmark']), self._width, len(self._hash_a))
+            counts.dishes = dict(zip(data['dish_ids'].tolist(), data['dish_values'].tolist()))
+            counts.stores = dict(zip(data['store_ids'].tolist(), data['store_values'].tolist()))
+            counts.cells = {tuple(key): value for key, value in zip(data['cell_keys'].tolist(),
+                                                                    data['cell_values'].tolist())}
+            counts.sketch = np.array(data['sketch'])
+        # 저장된 기준 시각에서 현재로 옮겨 둠 (오래된 체크포인트도 2^경과 반감기 수 계산이 넘치지 않도록)
+        self._counts = self._rebase(counts, time.time())
+        if not self._counts.dishes and counts.dishes:
+            logger.info(f"Popularity checkpoint {path} is older than the decay window; starting empty")
+        logger.info(f"Loaded popularity checkpoint {path}: {self.stats()}")
+
+
+# 요청 본문 -> 이벤트 목록 (한 개 또는 목록, 반찬은 dish_id 또는 이름, 가게는 store_id 또는 가게 이름)
+#   {"type": "click", "name": "멸치볶음", "store_name": "...", "lat": 37.5, "lon": 126.9}
+#   위치가 없으면 가게 위치를 사용
+def parse_events(data, snapshot):
+    events = data.get('events', data) if isinstance(data, dict) else data
+    if isinstance(events, dict):
+        events = [events]
+    if not isinstance(events, list) or not events:
+        raise ValueError("events must be a non-empty list")
+    encoded = snapshot.extras['scoring']
+    store_index = snapshot.extras['spatial']
+    parsed = []
+    for event in events:
+        if not isinstance(event, dict) or event.get('type') not in EVENT_WEIGHTS:
+            raise ValueError(f"event type must be one of {sorted(EVENT_WEIGHTS)}")
+        dish_id = event.get('dish_id')
+        if dish_id is None and event.get('name'):
+            positions = encoded.name_to_dishes.get(str(event['name']).strip(), ())
+            dish_id = int(encoded.dish_ids[positions[0]]) if positions else None
+        store_id = event.get('store_id')
+        if store_id is None and event.get('store_name'):
+            store_id = snapshot.store_id(event['store_name'])
+        lat, lon = event.get('lat'), event.get('lon')
+        if (lat is None or lon is None) and store_id is not None:
+            position = int(store_index.positions([store_id])[0])
+            if position >= 0:
+                lat, lon = store_index.latitudes[position], store_index.longitudes[position]
+        if dish_id is None and store_id is None:
+            continue
+        parsed.append({'type': event['type'], 'dish_id': dish_id, 'store_id': store_id, 'lat': lat, 'lon': lon,
+                       'count': max(1, int(event.get('quantity', 1)))})
+    return parsed
+
+
+def record_events(tracker, events):
+    for event in events:
+        tracker.record(event['type'], event['dish_id'], event['store_id'], event['lat'], event['lon'], event['count'])
+
+
+# /orders 로 기록한 주문의 반찬을 order 이벤트로 반영 (본문에 user_lat / user_lon 이 있으면 그 위치 격자)
+def record_order(tracker, snapshot, record, data):
+    events = [{'type': 'order', 'dish_id': item['dish_id'], 'store_name': item.get('store_name'),
+               'quantity': item['quantity'], 'lat': data.get('user_lat'), 'lon': data.get('user_lon')}
+              for item in record['items'] if item['dish_id'] is not None]
+    if events:
+        record_events(tracker, parse_events(events, snapshot))
+
+
+def popularity_from_env():
+    if os.getenv('POPULARITY_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        return None
+    tracker = PopularityTracker(
+        half_life=float(os.getenv('POPULARITY_HALF_LIFE_SECONDS', str(3 * 3600))),
+        cell_degrees=float(os.getenv('POPULARITY_CELL_DEGREES', '0.01')),
+        queue_size=int(os.getenv('POPULARITY_QUEUE_SIZE', '100000')),
+        checkpoint_path=os.getenv('POPULARITY_CHECKPOINT_PATH', 'data/popularity.npz') or None,
+        checkpoint_interval=float(os.getenv('POPULARITY_CHECKPOINT_SECONDS', '60')),
+        weight=float(os.getenv('POPULARITY_WEIGHT', '2')),
+        local_weight=float(os.getenv('POPULARITY_LOCAL_WEIGHT', '2')),
+    )
+    tracker.start()
+    return tracker
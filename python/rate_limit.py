@@ -0,0 +1,68 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# 토큰 버킷 (초당 rate 개, 최대 burst 개까지 몰아서 허용, 여러 스레드가 공유)
+class TokenBucket:
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # 토큰을 얻을 때까지 대기 -> 대기한 시간(초)
+    def acquire(self, tokens=1):
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+
+# 재시도할 오류 (429, 5xx 등 일시적인 실패)
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# 지수 백오프 + 지터로 재시도 (RetryableError 와 retry_on 에 해당하는 예외만)
+def call_with_retries(func, retries=3, base_delay=0.5, max_delay=30.0, retry_on=(), sleep=time.sleep):
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except (RetryableError,) + tuple(retry_on) as e:
+            if attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            retry_after = getattr(e, 'retry_after', None)
+            if retry_after:
+                delay = max(delay, retry_after)
+            attempt += 1
+            logger.warning(f"Attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+            sleep(delay)
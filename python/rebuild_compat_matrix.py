@@ -0,0 +1,44 @@
+import argparse
+import logging
+import os
+
+from catalog import CatalogStore
+from compat import CompatMatrix, build_compat_matrix, check_consistency
+from db_pool import pool_from_env
+from scoring import encode_catalog
+
+# 반찬 관계 행렬 재생성 / 검증
+#   python rebuild_compat_matrix.py [--out DIR] [--check N] [--check-only]
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
+
+parser = argparse.ArgumentParser(description="Rebuild the dish compatibility matrix")
+parser.add_argument('--out', default=os.getenv('COMPAT_MATRIX_DIR', './data/compat'))
+parser.add_argument('--check', type=int, default=200, help="number of random requests compared with scoring.py")
+parser.add_argument('--check-only', action='store_true', help="verify the saved matrix without rebuilding")
+args = parser.parse_args()
+
+db_pool = pool_from_env()
+try:
+    snapshot = CatalogStore(db_pool.acquire, refresh_interval=0).reload()
+finally:
+    db_pool.close()
+encoded = encode_catalog(snapshot)
+
+if args.check_only:
+    compat = CompatMatrix.load(args.out)
+    changed = compat.sync(snapshot.dishes)
+    if changed:
+        logger.warning(f"Saved matrix is out of date: {changed} dishes differ from the database")
+else:
+    compat = build_compat_matrix(snapshot.dishes, snapshot.version)
+    logger.info(f"Built {compat.size}x{compat.size} compatibility matrix ({compat.relations.nbytes} bytes)")
+
+mismatches = check_consistency(compat, encoded, samples=args.check)
+logger.info(f"Consistency check: {mismatches} mismatches in {args.check} samples")
+if mismatches:
+    raise SystemExit(1)
+
+if not args.check_only:
+    compat.save(args.out)
+    logger.info(f"Saved compatibility matrix to {args.out}")
@@ -0,0 +1,33 @@
+import argparse
+import logging
+import os
+import time
+
+from orders import OrderLog, index_options_from_env, replay
+
+# 주문 로그 전체를 다시 읽어 동시 주문 인덱스 재생성
+#   python rebuild_order_index.py [--log FILE] [--out DIR] [--show DISH_ID ...]
+#   서버는 ORDER_INDEX_DIR 에 저장된 인덱스를 불러와 저장 시점 이후의 주문만 이어 읽음
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
+
+options = index_options_from_env()
+parser = argparse.ArgumentParser(description="Rebuild the dish co-occurrence index from the order log")
+parser.add_argument('--log', default=os.getenv('ORDER_LOG_PATH', 'data/orders.jsonl'))
+parser.add_argument('--out', default=os.getenv('ORDER_INDEX_DIR', './data/order_index'))
+parser.add_argument('--neighbors', type=int, default=options['neighbors'], help="neighbors kept per dish")
+parser.add_argument('--min-count', type=int, default=options['min_count'], help="minimum co-occurrence count")
+parser.add_argument('--show', type=int, nargs='*', default=[], help="print the neighbors of these dish ids")
+args = parser.parse_args()
+
+started = time.perf_counter()
+index = replay(OrderLog(args.log), neighbors=args.neighbors, min_count=args.min_count)
+logger.info(f"Replayed {args.log} in {time.perf_counter() - started:.3f}s: {index.stats()}")
+
+for dish_id in args.show:
+    neighbors = ', '.join(f'{other}:{index.score(dish_id, other):.3f}'
+                          for other in index.neighbors.get(dish_id, [])[:10])
+    logger.info(f"Dish {dish_id} -> {neighbors or '(no neighbors)'}")
+
+index.save(args.out)
+logger.info(f"Saved order index to {args.out}")
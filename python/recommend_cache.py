@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from http_cache import dump_json
+
+logger = logging.getLogger(__name__)
+
+
+# 같은 결과를 내는 요청이 같은 키를 갖도록 정규화
+#   user_dishes 정렬/중복 제거, 위치는 cell_degrees 격자 중심으로 맞춤 (계산도 정규화된 값으로 수행)
+def canonical_request(params, cell_degrees=0.001):
+    canonical = dict(params)
+    canonical['user_dishes'] = sorted({str(dish).strip() for dish in params['user_dishes'] or [] if str(dish).strip()})
+    canonical['num_recommendations'] = int(params['num_recommendations'])
+    canonical['include_soup_option'] = bool(params['include_soup_option'])
+    canonical['vegan_only'] = bool(params['vegan_only'])
+    if cell_degrees:
+        canonical['user_lat'] = _snap(params['user_lat'], cell_degrees)
+        canonical['user_lon'] = _snap(params['user_lon'], cell_degrees)
+    for name in ('radius_km', 'max_per_store'):
+        if canonical.get(name) is not None:
+            canonical[name] = float(canonical[name]) if name == 'radius_km' else int(canonical[name])
+    return canonical
+
+
+def _snap(value, cell_degrees):
+    if value is None:
+        return None
+    return round((int(float(value) // cell_degrees) + 0.5) * cell_degrees, 7)
+
+
+def request_key(canonical, version):
+    return version + ':' + json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+# 여러 워커가 함께 쓰는 로컬 SQLite 캐시 (같은 서버의 프로세스 간 공유)
+class SQLiteCacheBackend:
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS recommend_cache (
+                    key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS recommend_cache_last_used ON recommend_cache (last_used)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            "SELECT value FROM recommend_cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE recommend_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    # 저장 후 만료 항목과 오래 안 쓴 항목을 지워 max_bytes 이하로 유지 -> 지운 항목 수
+    def put(self, key, version, body, ttl):
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO recommend_cache (key, version, value, size, expires_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, version, body, len(body), now + ttl, now)
+        )
+        # 다른 버전 항목은 지우지 않음 (스냅샷 교체 중에는 워커마다 버전이 다를 수 있으므로 TTL / 크기 제한으로 정리)
+        removed = connection.execute("DELETE FROM recommend_cache WHERE expires_at <= ?", (now,)).rowcount
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM recommend_cache").fetchone()[0]
+        if total > self.max_bytes:
+            removed += connection.execute("""
+                DELETE FROM recommend_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_used DESC) as running
+                        FROM recommend_cache
+                    ) WHERE running > ?
+                )
+            """, (self.max_bytes,)).rowcount
+        return removed
+
+    def stats(self):
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM recommend_cache"
+        ).fetchone()
+        return {'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+
+# 추천 결과 캐시 (프로세스 내 LRU + TTL + 크기 제한, 선택적으로 공유 백엔드)
+#   키에 카탈로그 버전이 들어가므로 반찬/가게/가격이 바뀌면 이전 결과는 더 이상 조회되지 않음
+#   이전 버전 항목은 한 번에 비우지 않고 LRU / TTL 로 밀려나게 둠 (교체 중 이전 스냅샷 요청과 새 요청이 섞여도 서로 지우지 않음)
+class RecommendationCache:
+    def __init__(self, max_entries=10000, max_bytes=32 * 1024 * 1024, ttl=300, cell_degrees=0.001, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cell_degrees = cell_degrees
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._version = None  # 마지막으로 저장한 카탈로그 버전 (통계용)
+        self._counters = dict.fromkeys(
+            ['hits', 'misses', 'shared_hits', 'evictions', 'expirations', 'shared_errors'], 0
+        )
+
+    def canonical(self, params):
+        return canonical_request(params, self.cell_degrees)
+
+    def _pop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _lookup_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._pop(key)
+                self._counters['expirations'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry[2]
+
+    def _store_local(self, key, version, value, size):
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._version = version
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    # (정규화된 요청, 캐시 키, 캐시된 결과 또는 None)
+    def lookup(self, params, version):
+        canonical = self.canonical(params)
+        key = request_key(canonical, version)
+        value = self._lookup_local(key)
+        if value is not None:
+            return canonical, key, value
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared recommendation cache lookup failed: {e}")
+                with self._lock:
+                    self._counters['shared_errors'] += 1
+            if value is not None:
+                with self._lock:
+                    self._counters['shared_hits'] += 1
+                self._store_local(key, version, value, len(dump_json(value)))
+                return canonical, key, value
+        with self._lock:
+            self._counters['misses'] += 1
+        return canonical, key, None
+
+    def store(self, key, version, value):
+        body = dump_json(value)
+        self._store_local(key, version, value, len(body))
+        if self.shared is not None:
+            try:
+                removed = self.shared.put(key, version, body, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared recommendation cache store failed: {e}")
+                with self._lock:
+                    self._counters['shared_errors'] += 1
+                return
+            with self._lock:
+                self._counters['evictions'] += removed
+
+    # 캐시에 없을 때만 compute(정규화된 요청) 실행
+    def get_or_compute(self, params, version, compute):
+        canonical, key, value = self.lookup(params, version)
+        if value is None:
+            value = compute(canonical)
+            self.store(key, version, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+            stats.update({
+                'version': self._version,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hit_ratio': round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0,
+            })
+        if self.shared is not None:
+            try:
+                stats['shared'] = self.shared.stats()
+            except Exception as e:
+                stats['shared'] = {'error': str(e)}
+        return stats
+
+
+# 환경 변수 기반 추천 캐시 (RECOMMEND_CACHE_MAX_ENTRIES, RECOMMEND_CACHE_MAX_BYTES, RECOMMEND_CACHE_TTL,
+#   RECOMMEND_CACHE_CELL_DEGREES, RECOMMEND_CACHE_SQLITE: 워커 간 공유 캐시 파일 경로)
+#   RECOMMEND_CACHE_MAX_ENTRIES=0 이면 캐시 사용 안 함 (None)
+def recommend_cache_from_env():
+    max_entries = int(os.getenv('RECOMMEND_CACHE_MAX_ENTRIES', '10000'))
+    if max_entries <= 0:
+        return None
+    max_bytes = int(os.getenv('RECOMMEND_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    shared_path = os.getenv('RECOMMEND_CACHE_SQLITE')
+    shared = SQLiteCacheBackend(shared_path, max_bytes=max_bytes * 4) if shared_path else None
+    return RecommendationCache(
+        max_entries=max_entries,
+        max_bytes=max_bytes,
+        ttl=float(os.getenv('RECOMMEND_CACHE_TTL', '300')),
+        cell_degrees=float(os.getenv('RECOMMEND_CACHE_CELL_DEGREES', '0.001')),
+        shared=shared,
+    )
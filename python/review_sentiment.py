@@ -0,0 +1,283 @@
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from orders import OrderLog
+
+# 리뷰 감성 분석 배치 파이프라인 (서버 밖에서 실행, 서버는 저장된 집계 숫자만 읽음)
+#   리뷰 로그(REVIEW_LOG_PATH, 추가 전용 JSON Lines)를 저장된 위치부터 이어 읽어 새 리뷰만 점수를 매기고
+#   반찬별 / 가게별 (리뷰 수, 점수 합, 긍정 리뷰 수, 평균, 베이즈 보정 점수) 표를 갱신해 한 파일로 교체 저장
+#   점수: 감성 사전 매칭 (배치의 리뷰를 한 문자열로 이어 정규식 한 번으로 찾고, 리뷰 x 표현 횟수 행렬 @ 가중치)
+#   python review_sentiment.py [--log FILE] [--out FILE] [--workers N] [--watch SECONDS] [--full] [--show N]
+#   REVIEW_LOG_PATH=data/reviews.jsonl
+#   REVIEW_SENTIMENT_PATH=data/review_sentiment.npz
+#   REVIEW_PRIOR_WEIGHT=5             베이즈 보정에 쓰는 가상 리뷰 수 (전체 평균 점수를 가진 리뷰 N 개를 더한 것과 같음)
+#   REVIEW_SENTIMENT_WORKERS=         점수 계산 프로세스 수 (기본 CPU 수, 1 이면 현재 프로세스에서 계산)
+#   REVIEW_BATCH_SIZE=2000            프로세스 하나에 한 번에 넘기는 리뷰 수
+logger = logging.getLogger(__name__)
+
+# 감성 사전 (어간 / 표현 -> 점수), 앞에 '안' / '못' 이 오거나 뒤에 '~지 않' 이 붙으면 부호를 바꿔 NEGATION_SCALE 만큼 반영
+LEXICON = {
+    # 맛
+    '맛있': 2.0, '맛나': 2.0, '존맛': 2.5, '꿀맛': 2.5, '손맛': 1.5, '고소': 1.0, '담백': 1.0, '감칠맛': 1.5,
+    '부드럽': 1.0, '바삭': 1.0, '촉촉': 1.0, '신선': 1.5, '간이 딱': 1.5, '집밥': 1.0,
+    '맛없': -2.0, '비리': -1.5, '비린': -1.5, '느끼': -1.0, '질기': -1.0, '눅눅': -1.5, '싱겁': -1.0,
+    '너무 짜': -1.5, '너무 달': -1.0, '짜요': -1.0, '쉰내': -3.0, '상했': -3.0, '냄새': -1.0, '식어': -1.0,
+    # 양 / 가격
+    '푸짐': 1.5, '넉넉': 1.0, '가성비': 1.5, '저렴': 1.0,
+    '양이 적': -1.5, '비싸': -1.0, '비쌉': -1.0,
+    # 위생 / 서비스
+    '깔끔': 1.0, '정갈': 1.5, '친절': 1.0, '빠르': 0.5,
+    '불친절': -2.0, '머리카락': -3.0, '이물질': -3.0, '늦': -0.5, '환불': -2.0,
+    # 전체 평가
+    '최고': 2.0, '훌륭': 2.0, '완벽': 2.0, '감동': 2.0, '추천': 1.5, '재구매': 2.0, '또 시킬': 2.0, '또 주문': 2.0,
+    '단골': 1.5, '만족': 1.5, '좋': 1.0, '괜찮': 0.5, '감사': 0.5, '굿': 1.0, 'ㅎㅎ': 0.5,
+    '별로': -1.5, '최악': -2.5, '실망': -2.0, '아쉽': -1.0, '아쉬': -1.0, '나쁘': -1.5, '다시는': -2.0,
+    '버렸': -2.0, 'ㅠㅠ': -0.5, 'ㅜㅜ': -0.5,
+}
+NEGATION_SCALE = 0.75
+# 사전 점수 합을 tanh(합 / SATURATION) 으로 -1 ~ 1 사이로 맞춤
+SATURATION = 3.0
+# 이 점수보다 높으면 긍정 리뷰로 셈
+POSITIVE_THRESHOLD = 0.2
+
+# 긴 표현부터 시도 ('불친절' 이 '친절' 로, '너무 짜' 가 '짜요' 로 잡히지 않게)
+TERMS = sorted(LEXICON, key=len, reverse=True)
+_TERM_CODES = {term: code for code, term in enumerate(TERMS)}
+# 열: [표현 그대로 ..., 부정된 표현 ...]
+_WEIGHTS = np.array([LEXICON[term] for term in TERMS] + [-NEGATION_SCALE * LEXICON[term] for term in TERMS],
+                    dtype=np.float32)
+_PATTERN = re.compile(
+    r'(?P<pre>(?:안|못) ?)?'
+    r'(?P<term>' + '|'.join(re.escape(term) for term in TERMS) + r')'
+    r'(?P<post>[가-힣]{0,2}(?:지|진|지는) ?(?:않|못))?'
+)
+# 배치 안의 리뷰 구분자 (부정 표현이 다음 리뷰로 넘어가 붙지 않도록 공백이 아닌 문자)
+_SEPARATOR = '\x00'
+
+
+# 리뷰 본문 목록 -> (감성 점수 -1 ~ 1, 사전 표현이 나온 횟수)
+def score_texts(texts):
+    texts = [str(text or '').replace(_SEPARATOR, ' ') for text in texts]
+    starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+    matches = [(match.start(), _TERM_CODES[match.group('term')] + (len(TERMS) if match.group('pre') or
+                                                                   match.group('post') else 0))
+               for match in _PATTERN.finditer(_SEPARATOR.join(texts))]
+    counts = np.zeros((len(texts), len(_WEIGHTS)), dtype=np.float32)
+    if matches:
+        positions, codes = np.array(matches, dtype=np.int64).T
+        rows = np.searchsorted(starts, positions, side='right') - 1
+        np.add.at(counts, (rows, codes), 1)
+    return np.tanh((counts @ _WEIGHTS) / SATURATION), counts.sum(axis=1).astype(np.int32)
+
+
+# 리뷰 레코드 목록 -> 리뷰별 점수 (프로세스 풀 작업 단위)
+#   본문 점수와 별점((rating - 3) / 2) 이 모두 있으면 평균, 본문에 사전 표현이 없으면 별점만 사용
+def score_reviews(records):
+    text_scores, hits = score_texts([record.get('text') for record in records])
+    ratings = np.array([record.get('rating') if record.get('rating') is not None else np.nan for record in records],
+                       dtype=np.float32)
+    rating_scores = (ratings - 3) / 2
+    has_rating = ~np.isnan(rating_scores)
+    scores = np.where(hits > 0, text_scores, 0).astype(np.float32)
+    scores = np.where(has_rating & (hits > 0), (scores + rating_scores) / 2, scores)
+    return np.where(has_rating & (hits == 0), rating_scores, scores)
+
+
+# id 별 리뷰 수 / 점수 합 / 긍정 리뷰 수 (id 순서대로 배열, 새 id 는 끝에 추가)
+class SentimentAggregates:
+    def __init__(self, ids=(), counts=(), sums=(), positives=()):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self.positives = np.asarray(positives, dtype=np.int64)
+        self._position = {int(key): index for index, key in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # keys 가 None 인 리뷰는 건너뜀
+    def add(self, keys, scores):
+        pairs = [(int(key), score) for key, score in zip(keys, scores) if key is not None]
+        if not pairs:
+            return
+        new = list(dict.fromkeys(key for key, _ in pairs if key not in self._position))
+        if new:
+            for offset, key in enumerate(new):
+                self._position[key] = len(self.ids) + offset
+            self.ids = np.append(self.ids, new)
+            self.counts = np.append(self.counts, np.zeros(len(new), dtype=np.int64))
+            self.sums = np.append(self.sums, np.zeros(len(new)))
+            self.positives = np.append(self.positives, np.zeros(len(new), dtype=np.int64))
+        positions = np.fromiter((self._position[key] for key, _ in pairs), dtype=np.int64, count=len(pairs))
+        values = np.fromiter((score for _, score in pairs), dtype=np.float64, count=len(pairs))
+        np.add.at(self.counts, positions, 1)
+        np.add.at(self.sums, positions, values)
+        np.add.at(self.positives, positions, values > POSITIVE_THRESHOLD)
+
+    def means(self):
+        return self.sums / np.maximum(self.counts, 1)
+
+    # 베이즈 보정 점수 = (점수 합 + prior_weight * 전체 평균) / (리뷰 수 + prior_weight)
+    #   리뷰가 적은 반찬 / 가게는 전체 평균 쪽으로 당겨져 리뷰 한두 개로 순위가 뒤집히지 않음
+    def smoothed(self, prior_mean, prior_weight):
+        return (self.sums + prior_weight * prior_mean) / (self.counts + prior_weight)
+
+
+# 반찬별 / 가게별 집계와 로그에서 반영한 위치
+class SentimentTable:
+    def __init__(self, prior_weight=5.0):
+        self.prior_weight = prior_weight
+        self.dishes = SentimentAggregates()
+        self.stores = SentimentAggregates()
+        self.reviews = 0
+        self.total = 0.0
+        # 로그에서 반영한 위치 (바이트)
+        self.offset = 0
+        self.updated_at = 0.0
+
+    @property
+    def prior_mean(self):
+        return self.total / self.reviews if self.reviews else 0.0
+
+    def add(self, records, scores):
+        self.dishes.add([record.get('dish_id') for record in records], scores)
+        self.stores.add([record.get('store_id') for record in records], scores)
+        self.reviews += len(records)
+        self.total += float(np.sum(scores, dtype=np.float64))
+
+    def stats(self):
+        return {
+            'reviews': self.reviews,
+            'dishes': len(self.dishes),
+            'stores': len(self.stores),
+            'prior_mean': round(self.prior_mean, 4),
+            'offset': self.offset,
+        }
+
+    # 서버가 읽는 평균 / 보정 점수도 함께 저장 (서버에서는 계산 없이 그대로 사용)
+    #   임시 파일에 쓴 뒤 교체 (읽는 쪽은 항상 완성된 파일만 봄)
+    def save(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.updated_at = time.time()
+        arrays = {}
+        for name, aggregates in (('dish', self.dishes), ('store', self.stores)):
+            arrays.update({
+                f'{name}_ids': aggregates.ids,
+                f'{name}_counts': aggregates.counts.astype(np.int32),
+                f'{name}_sums': aggregates.sums,
+                f'{name}_positives': aggregates.positives.astype(np.int32),
+                f'{name}_means': aggregates.means().astype(np.float32),
+                f'{name}_smoothed': aggregates.smoothed(self.prior_mean, self.prior_weight).astype(np.float32),
+            })
+        temporary = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(temporary, reviews=np.int64(self.reviews), total=np.float64(self.total),
+                 offset=np.int64(self.offset), prior_weight=np.float64(self.prior_weight),
+                 updated_at=np.float64(self.updated_at), **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, prior_weight=None):
+        with np.load(path) as data:
+            table = cls(float(data['prior_weight']) if prior_weight is None else prior_weight)
+            table.reviews = int(data['reviews'])
+            table.total = float(data['total'])
+            table.offset = int(data['offset'])
+            table.updated_at = float(data['updated_at'])
+            table.dishes = _load_aggregates(data, 'dish')
+            table.stores = _load_aggregates(data, 'store')
+        return table
+
+
+def _load_aggregates(data, name):
+    return SentimentAggregates(data[f'{name}_ids'], data[f'{name}_counts'], data[f'{name}_sums'],
+                               data[f'{name}_positives'])
+
+
+def _batches(log, offset, batch_size):
+    batch, end = [], offset
+    for record, end in log.records(offset):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch, end
+            batch = []
+    if batch:
+        yield batch, end
+
+
+# 로그에서 아직 반영하지 않은 리뷰만 점수를 매겨 집계에 더함 -> 반영한 리뷰 수
+#   배치를 프로세스 풀에 나눠 보내고 (한 번에 workers * 4 개까지), 결과는 로그 순서대로 반영해 offset 을 옮김
+def update_table(log, table, workers=None, batch_size=2000):
+    added = 0
+    batches = _batches(log, table.offset, batch_size)
+    if workers == 1:
+        for batch, end in batches:
+            table.add(batch, score_reviews(batch))
+            table.offset = end
+            added += len(batch)
+        return added
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = (workers or os.cpu_count() or 1) * 4
+        while True:
+            chunk = [batch for _, batch in zip(range(window), batches)]
+            if not chunk:
+                return added
+            for (batch, end), scores in zip(chunk, executor.map(score_reviews, [batch for batch, _ in chunk])):
+                table.add(batch, scores)
+                table.offset = end
+                added += len(batch)
+
+
+# 저장된 표가 있으면 이어서, 없거나 로그가 교체된 경우 처음부터
+def open_table(log, path, prior_weight, full=False):
+    if not full and os.path.exists(path):
+        table = SentimentTable.load(path, prior_weight)
+        if table.offset <= log.size():
+            return table
+        logger.warning(f"Review log {log.path} is shorter than the saved offset; rescoring from the start")
+    return SentimentTable(prior_weight)
+
+
+def run_pipeline(log, path, prior_weight=5.0, workers=None, batch_size=2000, watch=None, full=False):
+    table = open_table(log, path, prior_weight, full)
+    while True:
+        started = time.perf_counter()
+        added = update_table(log, table, workers, batch_size)
+        if added or full or not os.path.exists(path):
+            table.save(path)
+            logger.info(f"Scored {added} reviews in {time.perf_counter() - started:.3f}s: {table.stats()}")
+        full = False
+        if not watch:
+            return table
+        time.sleep(watch)
+        if log.size() < table.offset:
+            table = open_table(log, path, prior_weight, full=True)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Score review sentiment and update per-dish / per-store aggregates")
+    parser.add_argument('--log', default=os.getenv('REVIEW_LOG_PATH', 'data/reviews.jsonl'))
+    parser.add_argument('--out', default=os.getenv('REVIEW_SENTIMENT_PATH', 'data/review_sentiment.npz'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('REVIEW_SENTIMENT_WORKERS', '0')) or None,
+                        help="scoring processes (1 scores in this process)")
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('REVIEW_BATCH_SIZE', '2000')))
+    parser.add_argument('--prior-weight', type=float, default=float(os.getenv('REVIEW_PRIOR_WEIGHT', '5')))
+    parser.add_argument('--watch', type=float, help="keep running and pick up new reviews every N seconds")
+    parser.add_argument('--full', action='store_true', help="ignore the saved table and rescore the whole log")
+    parser.add_argument('--show', type=int, default=0, help="print the N best stores after scoring")
+    args = parser.parse_args()
+
+    result = run_pipeline(OrderLog(args.log), args.out, args.prior_weight, args.workers, args.batch_size,
+                          args.watch, args.full)
+    stores = result.stores
+    smoothed = stores.smoothed(result.prior_mean, result.prior_weight)
+    for position in np.argsort(-smoothed)[:args.show]:
+        logger.info(f"Store {stores.ids[position]}: {smoothed[position]:.3f} "
+                    f"({stores.counts[position]} reviews, mean {stores.means()[position]:.3f})")
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from orders import OrderLog
+
+# 리뷰 기록과 서버용 감성 집계 조회
+#   POST /reviews 는 리뷰를 로그 끝에 추가만 하고 (주문 로그와 같은 추가 전용 JSON Lines),
+#   감성 점수는 review_sentiment.py 파이프라인이 따로 계산해 반찬별 / 가게별 집계 파일로 저장
+#   서버는 집계 파일이 바뀌면 다시 읽어 숫자만 사용 (요청 처리 중에는 감성 분석을 하지 않음)
+#   REVIEW_LOG_PATH=data/reviews.jsonl
+#   REVIEW_SENTIMENT_PATH=data/review_sentiment.npz
+#   REVIEW_SENTIMENT_WEIGHT=1          /recommend 점수에 더하는 최대 점수 (규칙 점수와 같은 행 단위, 평균보다 낮으면 감점)
+#   REVIEW_SENTIMENT_POLL_SECONDS=30   집계 파일 변경 확인 주기
+logger = logging.getLogger(__name__)
+
+MAX_TEXT_LENGTH = 2000
+
+
+# 요청 본문 -> 로그 레코드 (가게는 store_id 또는 가게 이름, 반찬은 dish_id 또는 이름, 둘 중 하나는 필요)
+#   {"store_name": "...", "name": "멸치볶음", "rating": 5, "text": "...", "user_id": "..."}
+def build_review_record(data, snapshot):
+    if not isinstance(data, dict):
+        raise ValueError("review must be a JSON object")
+    text = data.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("text must be a non-empty string")
+    if len(text) > MAX_TEXT_LENGTH:
+        raise ValueError(f"text must be at most {MAX_TEXT_LENGTH} characters")
+    rating = data.get('rating')
+    if rating is not None and (isinstance(rating, bool) or not isinstance(rating, (int, float))
+                               or not 1 <= rating <= 5):
+        raise ValueError("rating must be a number between 1 and 5")
+    encoded = snapshot.extras['scoring']
+    dish_id = data.get('dish_id')
+    if dish_id is None and data.get('name'):
+        positions = encoded.name_to_dishes.get(str(data['name']).strip(), ())
+        dish_id = int(encoded.dish_ids[positions[0]]) if positions else None
+    store_id = data.get('store_id')
+    if store_id is None and data.get('store_name'):
+        store_id = snapshot.store_id(data['store_name'])
+    if dish_id is None and store_id is None:
+        raise ValueError("review needs a known store (store_id or store_name) or dish (dish_id or name)")
+    return {
+        'review_id': str(data.get('review_id') or uuid.uuid4().hex),
+        'user_id': data.get('user_id'),
+        'ts': time.time(),
+        'store_id': int(store_id) if store_id is not None else None,
+        'dish_id': int(dish_id) if dish_id is not None else None,
+        'rating': rating,
+        'text': text.strip(),
+    }
+
+
+# 집계 파일 한 개의 내용 (읽은 뒤에는 바꾸지 않음)
+class _SentimentData:
+    def __init__(self, data, mtime):
+        self.mtime = mtime
+        self.reviews = int(data['reviews'])
+        self.prior_mean = float(data['total']) / self.reviews if self.reviews else 0.0
+        self.updated_at = float(data['updated_at'])
+        self.dish_ids = data['dish_ids']
+        self.dish_counts = data['dish_counts']
+        self.dish_smoothed = data['dish_smoothed']
+        self.store_ids = data['store_ids']
+        self.store_counts = data['store_counts']
+        self.store_positives = data['store_positives']
+        self.store_smoothed = data['store_smoothed']
+        self.store_position = {store_id: index for index, store_id in enumerate(self.store_ids.tolist())}
+
+    @property
+    def version(self):
+        return f'{self.reviews}-{self.mtime}'
+
+
+# 파이프라인이 저장한 반찬별 / 가게별 감성 집계 (파일이 바뀌면 통째로 다시 읽어 교체, 읽는 쪽은 잠금 불필요)
+class SentimentStore:
+    def __init__(self, path, weight=1.0, poll_interval=30):
+        self.path = path
+        self.weight = weight
+        self._poll_interval = poll_interval
+        self._data = None
+        # 반찬 순서 점수 벡터 캐시 (EncodedCatalog, 집계, 벡터)
+        self._boost_cache = (None, None, None)
+        self._refresh_thread = None
+        try:
+            self.reload()
+        except Exception as e:
+            logger.warning(f"Could not load review sentiment {path}: {e}")
+
+    # 파일이 바뀌었으면 다시 읽음 -> 새로 읽었는지 여부
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        current = self._data
+        if current is not None and current.mtime == mtime:
+            return False
+        with np.load(self.path) as data:
+            self._data = _SentimentData(data, mtime)
+        logger.info(f"Loaded review sentiment {self.path}: {self.stats()}")
+        return True
+
+    # 응답 캐시 키에 넣는 집계 버전 (집계가 없으면 None)
+    @property
+    def version(self):
+        data = self._data
+        return data.version if data is not None else None
+
+    # 가게 행에 감성 점수 (베이즈 보정, -1 ~ 1), 리뷰 수, 긍정 리뷰 비율 추가 (리뷰가 없는 가게는 null / 0)
+    def annotate_stores(self, rows, key='id'):
+        data = self._data
+        if data is None:
+            return rows
+        annotated = []
+        for row in rows:
+            position = data.store_position.get(int(row[key]), -1) if row.get(key) is not None else -1
+            if position < 0:
+                annotated.append(dict(row, sentiment=None, review_count=0, positive_ratio=None))
+                continue
+            count = int(data.store_counts[position])
+            annotated.append(dict(row, sentiment=round(float(data.store_smoothed[position]), 3), review_count=count,
+                                  positive_ratio=round(int(data.store_positives[position]) / count, 3)))
+        return annotated
+
+    # 카탈로그 반찬 순서(encoded.dish_ids)의 가산 점수 (보정 점수 - 전체 평균, 차이가 가장 큰 반찬 = +-weight)
+    #   리뷰가 없는 반찬은 0, 집계가 없으면 None
+    def dish_boost(self, encoded):
+        data = self._data
+        if data is None or not self.weight:
+            return None
+        cached_encoded, cached_data, vector = self._boost_cache
+        if cached_encoded is encoded and cached_data is data:
+            return vector
+        positions = encoded.positions(data.dish_ids)
+        found = positions >= 0
+        deviation = np.zeros(encoded.size, dtype=np.float64)
+        deviation[positions[found]] = data.dish_smoothed[found] - data.prior_mean
+        top = np.abs(deviation).max() if encoded.size else 0.0
+        vector = deviation * (self.weight / top) if top > 0 else None
+        self._boost_cache = (encoded, data, vector)
+        return vector
+
+    def stats(self):
+        data = self._data
+        if data is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'reviews': data.reviews,
+            'dishes': len(data.dish_ids),
+            'stores': len(data.store_ids),
+            'prior_mean': round(data.prior_mean, 4),
+            'age_seconds': round(time.time() - data.updated_at, 1),
+        }
+
+    # 보정 점수 상위 가게 / 반찬 (관리용)
+    def summary(self, limit=10):
+        data = self._data
+        if data is None:
+            return self.stats()
+        stores = np.argsort(-data.store_smoothed, kind='stable')[:limit]
+        dishes = np.argsort(-data.dish_smoothed, kind='stable')[:limit]
+        return dict(
+            self.stats(),
+            top_stores=[[int(data.store_ids[i]), round(float(data.store_smoothed[i]), 3), int(data.store_counts[i])]
+                        for i in stores],
+            top_dishes=[[int(data.dish_ids[i]), round(float(data.dish_smoothed[i]), 3), int(data.dish_counts[i])]
+                        for i in dishes],
+        )
+
+    def start_background_refresh(self):
+        if self._poll_interval <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name='review-sentiment-refresh',
+                                                daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self._poll_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Review sentiment refresh failed: {e}")
+
+
+def review_log_from_env():
+    return OrderLog(os.getenv('REVIEW_LOG_PATH', 'data/reviews.jsonl'))
+
+
+def sentiment_store_from_env():
+    return SentimentStore(os.getenv('REVIEW_SENTIMENT_PATH', 'data/review_sentiment.npz'),
+                          weight=float(os.getenv('REVIEW_SENTIMENT_WEIGHT', '1')),
+                          poll_interval=float(os.getenv('REVIEW_SENTIMENT_POLL_SECONDS', '30')))
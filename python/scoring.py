@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+
+
+# 점수 규칙 가중치
+class ScoreWeights:
+    def __init__(self, ingredient_shared=0, ingredient_new=0, cooking_known=0, cooking_new=0,
+                 category_known=0, category_new=0, category_per_user_dish=False,
+                 flavor_same=0, flavor_different=0, season=0):
+        self.ingredient_shared = ingredient_shared
+        self.ingredient_new = ingredient_new
+        self.cooking_known = cooking_known
+        self.cooking_new = cooking_new
+        self.category_known = category_known
+        self.category_new = category_new
+        # True 이면 카테고리 점수를 사용자 반찬(행) 수만큼 누적
+        self.category_per_user_dish = category_per_user_dish
+        self.flavor_same = flavor_same
+        self.flavor_different = flavor_different
+        self.season = season
+
+
+# flask_server.recommend_dishes 규칙 (사용자 반찬마다 맛 +3/+2, 새 카테고리 +3)
+SERVER_WEIGHTS = ScoreWeights(category_new=3, category_per_user_dish=True,
+                              flavor_same=2, flavor_different=3, season=2)
+
+# logic.py 조화 규칙 (재료, 조리 방식, 카테고리, 맛, 계절)
+HARMONY_WEIGHTS = ScoreWeights(ingredient_shared=1, ingredient_new=2, cooking_known=1, cooking_new=2,
+                               category_known=1, category_new=2, flavor_same=1, flavor_different=2, season=2)
+
+
+# "소고기, 간장" 같은 쉼표 구분 문자열을 공백 없이 분리
+def split_tokens(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [token.strip() for token in str(value).split(',') if token.strip()]
+
+
+# 값 -> 정수 코드 (결측값은 -1)
+def _encode_column(values):
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return codes.astype(np.int32), {value: code for code, value in enumerate(uniques)}
+
+
+# 토큰 목록 -> (행, 64비트 워드) 비트셋
+def _encode_bitsets(token_lists):
+    vocab = {}
+    for tokens in token_lists:
+        for token in tokens:
+            vocab.setdefault(token, len(vocab))
+    n_words = max(1, (len(vocab) + 63) // 64)
+    bits = np.zeros((len(token_lists), n_words), dtype=np.uint64)
+    for row, tokens in enumerate(token_lists):
+        for token in tokens:
+            code = vocab[token]
+            bits[row, code // 64] |= np.uint64(1) << np.uint64(code % 64)
+    return bits, vocab
+
+
+# EncodedCatalog 에서 파일로 공유하는 배열 / 함께 저장하는 작은 객체
+SHARED_ARRAYS = ['dish_ids', 'cooking_codes', 'category_codes', 'flavor_codes', 'season_codes', 'ingredient_bits',
+                 'row_dish', 'dish_row_counts', 'name_codes', 'soup_dishes', 'jeon_dishes']
+SHARED_OBJECTS = ['names', 'cooking_vocab', 'category_vocab', 'flavor_vocab', 'season_vocab', 'ingredient_vocab',
+                  'name_to_dishes']
+
+
+# 카탈로그를 반찬 단위 정수 코드/비트셋으로 한 번만 인코딩
+class EncodedCatalog:
+    def __init__(self, dishes, frame):
+        self.dish_ids = dishes['id'].to_numpy()
+        self.names = dishes['name'].to_numpy(dtype=object)
+        self.cooking_codes, self.cooking_vocab = _encode_column(dishes['cooking_method'])
+        self.category_codes, self.category_vocab = _encode_column(dishes['category'])
+        self.flavor_codes, self.flavor_vocab = _encode_column(dishes['flavor'])
+        self.season_codes, self.season_vocab = _encode_column(dishes['season'])
+        self.ingredient_bits, self.ingredient_vocab = _encode_bitsets(
+            [split_tokens(value) for value in dishes['main_ingredients']]
+        )
+
+        # store_dishes 행 -> 반찬 인덱스
+        position = pd.Index(self.dish_ids)
+        self.row_dish = position.get_indexer(frame['dish_id']).astype(np.int32)
+        # 반찬별 판매 가게 수 (기존 규칙은 사용자 반찬을 행 단위로 누적)
+        self.dish_row_counts = np.bincount(self.row_dish, minlength=len(self.dish_ids))
+
+        # 이름 중복 제거용 이름 코드 (같은 이름의 반찬은 같은 코드)
+        self.name_codes, _ = _encode_column(dishes['name'])
+
+        # 슬레이트 제약용 반찬별 여부 (국물요리, 이름이 '전' 으로 끝나는 반찬), 요청마다 문자열 검사하지 않도록 미리 계산
+        self.soup_dishes = dishes['characteristics'].str.contains('국물요리', na=False).to_numpy()
+        self.jeon_dishes = dishes['name'].str.endswith('전', na=False).to_numpy()
+
+        self.name_to_dishes = {}
+        for index, name in enumerate(self.names):
+            self.name_to_dishes.setdefault(name, []).append(index)
+
+    @property
+    def size(self):
+        return len(self.dish_ids)
+
+    # 공유 카탈로그 파일용 (배열, 작은 객체) 분리
+    def shared_state(self):
+        arrays = {name: getattr(self, name) for name in SHARED_ARRAYS}
+        objects = {name: getattr(self, name) for name in SHARED_OBJECTS}
+        return arrays, objects
+
+    # shared_state() 로 저장한 값으로 복원 (배열은 mmap 그대로 사용, 다시 인코딩하지 않음)
+    @classmethod
+    def from_shared(cls, arrays, objects):
+        encoded = cls.__new__(cls)
+        encoded.__dict__.update(arrays)
+        encoded.__dict__.update(objects)
+        return encoded
+
+    # 배치 점수 계산용 (반찬, 값) 지시 행렬 (필요할 때 한 번만 생성)
+    def indicator(self, name):
+        matrices = self.__dict__.setdefault('_indicators', {})
+        if name not in matrices:
+            if name == 'ingredient':
+                unpacked = np.unpackbits(self.ingredient_bits.view(np.uint8), axis=1, bitorder='little')
+                matrices[name] = unpacked[:, :len(self.ingredient_vocab)].astype(np.float32)
+            else:
+                codes = getattr(self, f'{name}_codes')
+                matrix = np.zeros((self.size, len(getattr(self, f'{name}_vocab'))), dtype=np.float32)
+                valid = np.flatnonzero(codes >= 0)
+                matrix[valid, codes[valid]] = 1
+                matrices[name] = matrix
+        return matrices[name]
+
+    # 사용자 반찬 이름 -> 반찬별 행 수 벡터
+    def user_counts(self, user_dishes):
+        counts = np.zeros(self.size, dtype=np.int64)
+        for name in set(user_dishes):
+            for index in self.name_to_dishes.get(name, ()):
+                counts[index] = self.dish_row_counts[index]
+        return counts
+
+    # 반찬 id 배열 -> 카탈로그 반찬 위치 (없으면 -1, 조회용 인덱스는 처음 한 번만 생성)
+    def positions(self, dish_ids):
+        index = self.__dict__.get('_position_index')
+        if index is None:
+            index = self.__dict__['_position_index'] = pd.Index(self.dish_ids)
+        return index.get_indexer(np.asarray(dish_ids, dtype=np.int64))
+
+
+def encode_catalog(snapshot):
+    return EncodedCatalog(snapshot.dishes, snapshot.frame)
+
+
+# 스냅샷 없이 조인된 dish_df 만 있을 때
+def encode_frame(dish_df):
+    dishes = dish_df.drop_duplicates(subset='dish_id').rename(columns={'dish_id': 'id'})
+    return EncodedCatalog(dishes, dish_df)
+
+
+# 코드 배열이 사용자 코드 집합에 속하는지 (결측값 -1 은 항상 False)
+def _known(codes, vocab_size, user_codes):
+    table = np.zeros(vocab_size + 1, dtype=bool)
+    table[user_codes[user_codes >= 0] + 1] = True
+    return table[codes + 1]
+
+
+# 반찬별 점수 벡터 계산 (모든 항목을 배열 연산으로 처리)
+def score_dishes(encoded, user_dishes, selected_season=None, weights=SERVER_WEIGHTS):
+    counts = encoded.user_counts(user_dishes)
+    user_index = np.flatnonzero(counts)
+    n_user_rows = int(counts.sum())
+    scores = np.zeros(encoded.size, dtype=np.int64)
+
+    # 주요 재료 조화: 사용자 재료와 겹치면 shared, 아니면 new
+    if n_user_rows and (weights.ingredient_shared or weights.ingredient_new):
+        user_bits = np.bitwise_or.reduce(encoded.ingredient_bits[user_index], axis=0)
+        shared = (encoded.ingredient_bits & user_bits).any(axis=1)
+        scores += np.where(shared, weights.ingredient_shared, weights.ingredient_new)
+
+    # 조리 방식 다양성
+    if weights.cooking_known or weights.cooking_new:
+        known = _known(encoded.cooking_codes, len(encoded.cooking_vocab), encoded.cooking_codes[user_index])
+        scores += np.where(known, weights.cooking_known, weights.cooking_new)
+
+    # 카테고리 다양성
+    if weights.category_known or weights.category_new:
+        known = _known(encoded.category_codes, len(encoded.category_vocab), encoded.category_codes[user_index])
+        factor = n_user_rows if weights.category_per_user_dish else 1
+        scores += np.where(known, weights.category_known, weights.category_new) * factor
+
+    # 맛 조화: 사용자 반찬(행)마다 같은 맛 / 다른 맛 점수 누적
+    if n_user_rows and (weights.flavor_same or weights.flavor_different):
+        user_flavors = encoded.flavor_codes[user_index]
+        valid = user_flavors >= 0
+        flavor_counts = np.zeros(len(encoded.flavor_vocab) + 1, dtype=np.int64)
+        flavor_counts[1:] = np.bincount(user_flavors[valid], weights=counts[user_index][valid],
+                                        minlength=len(encoded.flavor_vocab)).astype(np.int64)
+        same = flavor_counts[encoded.flavor_codes + 1]
+        scores += same * weights.flavor_same + (n_user_rows - same) * weights.flavor_different
+
+    # 계절 조화
+    if selected_season and weights.season:
+        season_code = encoded.season_vocab.get(selected_season, -2)
+        scores += np.where(encoded.season_codes == season_code, weights.season, 0)
+
+    return scores
+
+
+# store_dishes 행 단위 점수 (dish_df 인덱스 = 카탈로그 행 번호)
+def score_rows(encoded, rows_index, user_dishes, selected_season=None, weights=SERVER_WEIGHTS):
+    dish_scores = score_dishes(encoded, user_dishes, selected_season, weights)
+    return dish_scores[encoded.row_dish[np.asarray(rows_index)]]
+
+
+# (사용자, 값) 행렬에서 각 반찬 코드 열을 선택 (결측 코드 -1 은 0)
+def _take_codes(user_by_value, codes):
+    padded = np.concatenate([np.zeros((len(user_by_value), 1), dtype=user_by_value.dtype), user_by_value], axis=1)
+    return padded[:, codes + 1]
+
+
+# 여러 사용자 요청을 (사용자 x 반찬) 행렬 한 번으로 점수 계산
+def score_dishes_batch(encoded, user_dishes_list, selected_seasons, weights=SERVER_WEIGHTS):
+    counts = np.stack([encoded.user_counts(user_dishes) for user_dishes in user_dishes_list]).astype(np.float32) \
+        if user_dishes_list else np.zeros((0, encoded.size), dtype=np.float32)
+    present = (counts > 0).astype(np.float32)
+    n_user_rows = counts.sum(axis=1, keepdims=True).astype(np.int64)
+    has_user = n_user_rows > 0
+    scores = np.zeros(counts.shape, dtype=np.int64)
+
+    if weights.ingredient_shared or weights.ingredient_new:
+        ingredients = encoded.indicator('ingredient')
+        user_ingredients = ((present @ ingredients) > 0).astype(np.float32)
+        shared = (user_ingredients @ ingredients.T) > 0
+        scores += np.where(has_user, np.where(shared, weights.ingredient_shared, weights.ingredient_new), 0)
+
+    if weights.cooking_known or weights.cooking_new:
+        known = _take_codes((present @ encoded.indicator('cooking')) > 0, encoded.cooking_codes)
+        scores += np.where(known, weights.cooking_known, weights.cooking_new)
+
+    if weights.category_known or weights.category_new:
+        known = _take_codes((present @ encoded.indicator('category')) > 0, encoded.category_codes)
+        factor = n_user_rows if weights.category_per_user_dish else 1
+        scores += np.where(known, weights.category_known, weights.category_new) * factor
+
+    if weights.flavor_same or weights.flavor_different:
+        same = _take_codes(counts @ encoded.indicator('flavor'), encoded.flavor_codes).astype(np.int64)
+        scores += same * weights.flavor_same + (n_user_rows - same) * weights.flavor_different
+
+    if weights.season:
+        season_codes = np.array([encoded.season_vocab.get(season, -2) if season else -3
+                                 for season in selected_seasons], dtype=np.int64)
+        scores += np.where(encoded.season_codes[None, :] == season_codes[:, None], weights.season, 0)
+
+    return scores
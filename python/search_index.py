@@ -0,0 +1,425 @@
+import bisect
+from collections.abc import Mapping
+from heapq import nsmallest
+
+import numpy as np
+import pandas as pd
+
+from scoring import split_tokens
+
+# 한글 음절 분해 테이블
+HANGUL_BASE = 0xAC00
+HANGUL_END = 0xD7A3
+CHOSUNG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSUNG = ['ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅗㅏ', 'ㅗㅐ', 'ㅗㅣ', 'ㅛ', 'ㅜ',
+            'ㅜㅓ', 'ㅜㅔ', 'ㅜㅣ', 'ㅠ', 'ㅡ', 'ㅡㅣ', 'ㅣ']
+JONGSUNG = ['', 'ㄱ', 'ㄲ', 'ㄱㅅ', 'ㄴ', 'ㄴㅈ', 'ㄴㅎ', 'ㄷ', 'ㄹ', 'ㄹㄱ', 'ㄹㅁ', 'ㄹㅂ', 'ㄹㅅ', 'ㄹㅌ',
+            'ㄹㅍ', 'ㄹㅎ', 'ㅁ', 'ㅂ', 'ㅂㅅ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+# 입력 중인 겹모음/겹받침 자모도 기본 자모로 풀어서 비교
+COMPOUND_JAMO = {'ㅘ': 'ㅗㅏ', 'ㅙ': 'ㅗㅐ', 'ㅚ': 'ㅗㅣ', 'ㅝ': 'ㅜㅓ', 'ㅞ': 'ㅜㅔ', 'ㅟ': 'ㅜㅣ', 'ㅢ': 'ㅡㅣ',
+                 'ㄳ': 'ㄱㅅ', 'ㄵ': 'ㄴㅈ', 'ㄶ': 'ㄴㅎ', 'ㄺ': 'ㄹㄱ', 'ㄻ': 'ㄹㅁ', 'ㄼ': 'ㄹㅂ', 'ㄽ': 'ㄹㅅ',
+                 'ㄾ': 'ㄹㅌ', 'ㄿ': 'ㄹㅍ', 'ㅀ': 'ㄹㅎ', 'ㅄ': 'ㅂㅅ'}
+
+# 필드별 점수
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_SUBSTRING = 60
+SCORE_CHOSUNG_PREFIX = 50
+SCORE_JAMO_PREFIX = 45
+SCORE_CHOSUNG = 40
+SCORE_INGREDIENT = 30
+SCORE_STORE = 20
+SCORE_FUZZY = 10
+
+
+def normalize(text):
+    return ''.join(str(text).lower().split())
+
+
+def is_syllable(char):
+    return HANGUL_BASE <= ord(char) <= HANGUL_END
+
+
+# 문자열 -> 기본 자모 문자열 ("김치" -> "ㄱㅣㅁㅊㅣ")
+def to_jamo(text):
+    parts = []
+    for char in text:
+        if is_syllable(char):
+            offset = ord(char) - HANGUL_BASE
+            parts.append(CHOSUNG[offset // 588])
+            parts.append(JUNGSUNG[(offset % 588) // 28])
+            parts.append(JONGSUNG[offset % 28])
+        else:
+            parts.append(COMPOUND_JAMO.get(char, char))
+    return ''.join(parts)
+
+
+# 문자열 -> 초성 문자열 ("김치찌개" -> "ㄱㅊㅉㄱ")
+def to_chosung(text):
+    return ''.join(CHOSUNG[(ord(char) - HANGUL_BASE) // 588] if is_syllable(char) else char for char in text)
+
+
+def is_chosung_query(text):
+    return bool(text) and all(char in CHOSUNG for char in text)
+
+
+# 한 글자 + 두 글자 n-gram
+def ngrams(text):
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(text):
+    if len(text) <= 1:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+# 접두어 편집 거리 (query 가 text 의 앞부분과 얼마나 다른지)
+def prefix_edit_distance(query, text, max_distance):
+    previous = list(range(len(text) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i] + [0] * len(text)
+        for j, text_char in enumerate(text, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (query_char != text_char))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous)
+
+
+# 공유 카탈로그에 저장한 포스팅 (n-gram -> 위치는 작은 dict, dish_id 는 mmap 배열 한 벌을 조각으로 사용)
+#   dict 와 같은 방식으로 조회 / 순회 (dict(postings) 로 복사하면 다시 갱신 가능한 포스팅)
+class PostingArrays(Mapping):
+    def __init__(self, positions, offsets, ids):
+        self.positions = positions
+        self.offsets = offsets
+        self.ids = ids
+
+    @classmethod
+    def from_postings(cls, postings):
+        grams = list(postings)
+        lengths = np.array([len(postings[gram]) for gram in grams], dtype=np.int64)
+        ids = np.array([dish_id for gram in grams for dish_id in sorted(postings[gram])], dtype=np.int64)
+        return cls({gram: position for position, gram in enumerate(grams)},
+                   np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64), ids)
+
+    def __getitem__(self, gram):
+        position = self.positions[gram]
+        return frozenset(self.ids[self.offsets[position]:self.offsets[position + 1]].tolist())
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, gram):
+        return gram in self.positions
+
+
+class SearchDoc:
+    def __init__(self, dish_id, name, ingredients):
+        self.dish_id = dish_id
+        self.name = name
+        self.key = normalize(name)
+        self.jamo = to_jamo(self.key)
+        self.chosung = to_chosung(self.key)
+        self.ingredients = [normalize(token) for token in ingredients]
+        self.signature = (self.key, tuple(self.ingredients))
+
+    def grams(self):
+        grams = ngrams(self.key) | ngrams(self.chosung)
+        for text in self.ingredients:
+            grams |= ngrams(text)
+        return grams
+
+    def jamo_grams(self):
+        return query_grams(self.jamo)
+
+
+# 반찬 이름/재료/가게 이름 검색 인덱스 (스냅샷 교체 시 변경된 반찬만 다시 색인)
+#   가게 이름은 반찬 문서에 넣지 않고 가게별로 따로 색인 (가게 이름으로 찾은 반찬은 그 가게의 행만 결과에 포함)
+class SearchIndex:
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+        self.jamo_postings = {}
+        self.jamo_sorted = []
+        self.chosung_sorted = []
+        self.rows_by_dish = {}
+        # 가게 이름 (정규화) 목록, n-gram -> 가게 번호 집합, 가게 번호별 카탈로그 행, 행별 dish_id
+        self.store_keys = []
+        self.store_postings = {}
+        self.store_rows = []
+        self.row_dish_ids = np.empty(0, dtype=np.int64)
+
+    # 공유 카탈로그 저장용 (배열, 작은 객체) -> shared_state() / from_shared()
+    def shared_state(self):
+        arrays, objects = {}, {'docs': self.docs, 'jamo_sorted': self.jamo_sorted,
+                                'chosung_sorted': self.chosung_sorted}
+        for name in ('postings', 'jamo_postings'):
+            postings = getattr(self, name)
+            if not isinstance(postings, PostingArrays):
+                postings = PostingArrays.from_postings(postings)
+            arrays[f'{name}_offsets'] = postings.offsets
+            arrays[f'{name}_ids'] = postings.ids
+            objects[f'{name}_positions'] = postings.positions
+        return arrays, objects
+
+    # shared_state() 로 저장한 값으로 복원 (포스팅은 mmap 배열 그대로, 행 목록 / 가게 색인은 스냅샷에서 생성)
+    @classmethod
+    def from_shared(cls, arrays, objects, snapshot):
+        index = cls()
+        index.docs = objects['docs']
+        index.jamo_sorted = objects['jamo_sorted']
+        index.chosung_sorted = objects['chosung_sorted']
+        for name in ('postings', 'jamo_postings'):
+            setattr(index, name, PostingArrays(objects[f'{name}_positions'], arrays[f'{name}_offsets'],
+                                               arrays[f'{name}_ids']))
+        index.rows_by_dish = snapshot.dish_rows()
+        index._index_stores(snapshot.frame)
+        return index
+
+    # 변경분만 반영한 새 인덱스 반환 (기존 인덱스는 그대로 두어 진행 중인 검색에 영향 없음)
+    def updated(self, snapshot):
+        index = SearchIndex()
+        index.docs = dict(self.docs)
+        index.postings = dict(self.postings)
+        index.jamo_postings = dict(self.jamo_postings)
+        index.jamo_sorted = list(self.jamo_sorted)
+        index.chosung_sorted = list(self.chosung_sorted)
+        index.rows_by_dish = snapshot.dish_rows()
+        index._index_stores(snapshot.frame)
+
+        new_docs = {}
+        for dish_id, name, ingredients in zip(snapshot.dishes['id'], snapshot.dishes['name'],
+                                              snapshot.dishes['main_ingredients']):
+            if dish_id in index.rows_by_dish:
+                new_docs[dish_id] = SearchDoc(dish_id, name, split_tokens(ingredients))
+
+        copied = set()
+        removed = [doc for dish_id, doc in index.docs.items()
+                   if new_docs.get(dish_id) is None or new_docs[dish_id].signature != doc.signature]
+        for doc in removed:
+            index._remove(doc, copied)
+        added = [doc for dish_id, doc in new_docs.items() if dish_id not in index.docs]
+        for doc in added:
+            index._add(doc, copied)
+
+        # 정렬 목록은 삭제 / 추가를 모아 한 번에 갱신 (반찬마다 insort 하면 전체 생성이 O(n^2))
+        if removed or added:
+            removed_ids = {doc.dish_id for doc in removed}
+            for name, key in (('jamo_sorted', 'jamo'), ('chosung_sorted', 'chosung')):
+                entries = [entry for entry in getattr(index, name) if entry[1] not in removed_ids]
+                entries.extend((getattr(doc, key), doc.dish_id) for doc in added)
+                entries.sort()
+                setattr(index, name, entries)
+        return index
+
+    # 가게 이름 색인 (가게 수 만큼이라 스냅샷마다 새로 만듦)
+    def _index_stores(self, frame):
+        codes, names = pd.factorize(frame['store_name'])
+        self.store_keys = [normalize(name) for name in names]
+        self.store_postings = {}
+        for code, key in enumerate(self.store_keys):
+            for gram in ngrams(key):
+                self.store_postings.setdefault(gram, set()).add(code)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        self.store_rows = [order[bounds[code]:bounds[code + 1]] for code in range(len(names))]
+        self.row_dish_ids = frame['dish_id'].to_numpy()
+
+    def _posting(self, postings, gram, copied):
+        key = (id(postings), gram)
+        if key not in copied or gram not in postings:
+            postings[gram] = set(postings.get(gram, ()))
+            copied.add(key)
+        return postings[gram]
+
+    def _add(self, doc, copied):
+        self.docs[doc.dish_id] = doc
+        for gram in doc.grams():
+            self._posting(self.postings, gram, copied).add(doc.dish_id)
+        for gram in doc.jamo_grams():
+            self._posting(self.jamo_postings, gram, copied).add(doc.dish_id)
+
+    def _remove(self, doc, copied):
+        del self.docs[doc.dish_id]
+        for postings, grams in ((self.postings, doc.grams()), (self.jamo_postings, doc.jamo_grams())):
+            for gram in grams:
+                posting = self._posting(postings, gram, copied)
+                posting.discard(doc.dish_id)
+                if not posting:
+                    del postings[gram]
+
+    # 모든 n-gram 을 포함하는 항목 (색인에 없는 n-gram 이 하나라도 있으면 빈 집합)
+    @staticmethod
+    def _candidates(postings, grams):
+        postings = [postings.get(gram) for gram in grams]
+        if not postings or any(posting is None for posting in postings):
+            return set()
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    # 정렬된 (키, dish_id) 목록에서 접두어가 일치하는 dish_id
+    @staticmethod
+    def _prefix_range(entries, prefix, limit=None):
+        position = bisect.bisect_left(entries, (prefix,))
+        result = []
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(entries[position][1])
+            position += 1
+        return result
+
+    def _score(self, doc, query, chosung_query):
+        if doc.key == query:
+            return SCORE_EXACT
+        if doc.key.startswith(query):
+            return SCORE_PREFIX
+        if query in doc.key:
+            return SCORE_SUBSTRING
+        if chosung_query:
+            if doc.chosung.startswith(query):
+                return SCORE_CHOSUNG_PREFIX
+            if query in doc.chosung:
+                return SCORE_CHOSUNG
+        if any(query in ingredient for ingredient in doc.ingredients):
+            return SCORE_INGREDIENT
+        return 0
+
+    # 가게 이름에 query 가 들어간 가게의 행 -> {dish_id: 행 번호 배열}
+    def _store_matches(self, query):
+        codes = [code for code in self._candidates(self.store_postings, query_grams(query))
+                 if query in self.store_keys[code]]
+        if not codes:
+            return {}
+        rows = np.sort(np.concatenate([self.store_rows[code] for code in codes]))
+        dish_ids = self.row_dish_ids[rows]
+        order = np.argsort(dish_ids, kind='stable')
+        unique, starts = np.unique(dish_ids[order], return_index=True)
+        return {dish_id: rows[part] for dish_id, part in zip(unique.tolist(), np.split(order, starts[1:]))}
+
+    # (dish_id, 점수, 행) 목록을 점수순으로 반환 (행이 None 이면 그 반찬의 모든 행, 가게 이름으로 찾은 반찬은 그 가게의 행)
+    def search(self, query, fuzzy=True, min_results=10):
+        query = normalize(query)
+        if not query:
+            return [(dish_id, 0, None) for dish_id in sorted(self.docs)]
+
+        chosung_query = is_chosung_query(query)
+        scores = {}
+        for dish_id in self._candidates(self.postings, query_grams(query)):
+            score = self._score(self.docs[dish_id], query, chosung_query)
+            if score:
+                scores[dish_id] = score
+
+        # 입력 중인 글자 (예: "김치ㅉ") 는 자모 접두어로 매칭
+        query_jamo = to_jamo(query)
+        for dish_id in self._prefix_range(self.jamo_sorted, query_jamo):
+            scores.setdefault(dish_id, SCORE_JAMO_PREFIX)
+
+        # 결과가 적으면 자모 편집 거리로 오타 허용
+        if fuzzy and len(scores) < min_results and len(query_jamo) >= 4:
+            max_distance = max(1, len(query_jamo) // 6)
+            overlap = {}
+            query_jamo_grams = query_grams(query_jamo)
+            for gram in query_jamo_grams:
+                for dish_id in self.jamo_postings.get(gram, ()):
+                    overlap[dish_id] = overlap.get(dish_id, 0) + 1
+            threshold = len(query_jamo_grams) / 2
+            for dish_id, count in overlap.items():
+                if dish_id in scores or count < threshold:
+                    continue
+                distance = prefix_edit_distance(query_jamo, self.docs[dish_id].jamo, max_distance)
+                if distance <= max_distance:
+                    scores[dish_id] = SCORE_FUZZY - distance
+
+        # 가게 이름 일치는 이름 / 재료 점수보다 낮고, 그 가게에서 파는 행만 결과에 포함
+        store_rows = {}
+        for dish_id, rows in self._store_matches(query).items():
+            if dish_id not in scores and dish_id in self.docs:
+                scores[dish_id] = SCORE_STORE
+                store_rows[dish_id] = rows
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.docs[item[0]].key), item[0]))
+        return [(dish_id, score, store_rows.get(dish_id)) for dish_id, score in ranked]
+
+    def _rows(self, dish_id, rows):
+        return self.rows_by_dish.get(dish_id) if rows is None else rows
+
+    # 순위가 매겨진 반찬 목록 -> 카탈로그 행 번호 (offset/limit 적용)
+    def result_rows(self, ranked, offset=0, limit=None):
+        end = None if limit is None else offset + limit
+        chunks = []
+        total = 0
+        for dish_id, _, rows in ranked:
+            rows = self._rows(dish_id, rows)
+            if rows is None:
+                continue
+            chunks.append(rows)
+            total += len(rows)
+            if end is not None and total >= end:
+                break
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(chunks)[offset:end]
+
+    # after_id 요리 다음부터 limit 행 이상이 될 때까지 (한 요리의 행은 나누지 않음) -> (행, 다음 after_id)
+    def page_rows(self, ranked, after_id=None, limit=None):
+        start = 0
+        if after_id is not None:
+            start = next((position + 1 for position, (dish_id, _, _) in enumerate(ranked) if dish_id == after_id),
+                         None)
+            if start is None:
+                return np.empty(0, dtype=np.int64), None
+        chunks = []
+        total = 0
+        last_dish = None
+        for position in range(start, len(ranked)):
+            dish_id, _, rows = ranked[position]
+            rows = self._rows(dish_id, rows)
+            if rows is None:
+                continue
+            if limit is not None and total >= limit:
+                return np.concatenate(chunks), last_dish
+            chunks.append(rows)
+            total += len(rows)
+            last_dish = dish_id
+        if not chunks:
+            return np.empty(0, dtype=np.int64), None
+        return np.concatenate(chunks), None
+
+    # 자동 완성 (이름 접두어 또는 초성 접두어)
+    def autocomplete(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        entries = self.chosung_sorted if is_chosung_query(prefix) else self.jamo_sorted
+        key = prefix if entries is self.chosung_sorted else to_jamo(prefix)
+        dish_ids = self._prefix_range(entries, key)
+        # 짧은 이름 순 상위 후보만 부분 정렬 (이름이 같은 반찬이 많아 limit 개를 못 채우면 후보 수를 늘려 다시)
+        candidates = limit * 4
+        while True:
+            names = []
+            for dish_id in nsmallest(candidates, dish_ids,
+                                     key=lambda dish_id: (len(self.docs[dish_id].key), dish_id)):
+                if self.docs[dish_id].name not in names:
+                    names.append(self.docs[dish_id].name)
+                if len(names) >= limit:
+                    return names
+            if candidates >= len(dish_ids):
+                return names
+            candidates *= 4
+
+
+# 카탈로그 빌더 (이전 인덱스가 있으면 변경분만 반영)
+def build_search_index(snapshot, previous=None):
+    return (previous or SearchIndex()).updated(snapshot)
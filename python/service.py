@@ -0,0 +1,391 @@
+import logging
+import math
+import os
+
+import numpy as np
+
+from catalog import CatalogStore
+from compat import build_compat
+from facets import FilterError, build_facet_index, parse_filter, recommend_filter
+from image_proxy import build_dish_images
+from metrics import stage
+from scoring import SERVER_WEIGHTS, encode_catalog, encode_frame, score_dishes, score_dishes_batch, score_rows
+from search_index import build_search_index
+from shared_catalog import SharedCatalogStore
+from slate import build_slate
+from spatial import build_store_index, haversine_km
+from streaming import clamp_limit
+
+# Flask / asyncio 서버가 함께 쓰는 요청 처리 로직
+logger = logging.getLogger(__name__)
+
+# 가게 목록 / 가게별 메뉴 조회 쿼리
+STORES_LIST_QUERY = "SELECT id, name, location, telephone_number, latitude, longitude FROM stores"
+STORE_MENU_QUERY = """
+    SELECT d.name, d.image_url, CAST(sd.price AS SIGNED) as price, d.cooking_method
+    FROM store_dishes sd
+    JOIN dishes d ON sd.dish_id = d.id
+    WHERE sd.store_id = %s
+"""
+
+# 키셋 페이지네이션 / 스트리밍용 쿼리 (id 순으로 정렬, after_id 다음부터)
+STORES_PAGE_QUERY = STORES_LIST_QUERY + " WHERE id > %s ORDER BY id"
+STORE_MENU_PAGE_QUERY = """
+    SELECT d.id as dish_id, d.name, d.image_url, CAST(sd.price AS SIGNED) as price, d.cooking_method
+    FROM store_dishes sd
+    JOIN dishes d ON sd.dish_id = d.id
+    WHERE sd.store_id = %s AND sd.dish_id > %s
+    ORDER BY sd.dish_id
+"""
+
+SEARCH_COLUMNS = ['name', 'store_name', 'price', 'image_url']
+FILTER_COLUMNS = ['id', 'name', 'category', 'cooking_method', 'flavor', 'season', 'image_url']
+
+
+# 추천/검색에 필요한 파생 구조를 함께 만드는 카탈로그
+def create_catalog(connect, refresh_interval=30, probe_query=None):
+    catalog = CatalogStore(connect, refresh_interval=refresh_interval, probe_query=probe_query)
+    catalog.register_builder('scoring', encode_catalog)
+    catalog.register_builder('spatial', build_store_index)
+    catalog.register_builder('search', build_search_index, incremental=True)
+    catalog.register_builder('compat', build_compat, incremental=True)
+    catalog.register_builder('images', build_dish_images)
+    catalog.register_builder('facets', build_facet_index)
+    return catalog
+
+
+# 로더 프로세스가 저장한 공유 카탈로그에 연결 (이미지 매핑만 워커에서 생성, 검색 / facet 인덱스는
+# 이전 로더가 저장해 공유 파일에 없는 세대일 때만 생성)
+def create_shared_catalog(directory, refresh_interval=5):
+    catalog = SharedCatalogStore(directory, refresh_interval=refresh_interval)
+    catalog.register_builder('search', build_search_index, incremental=True)
+    catalog.register_builder('images', build_dish_images)
+    catalog.register_builder('facets', build_facet_index)
+    return catalog
+
+
+# CATALOG_SHARED_DIR 이 있으면 공유 카탈로그, 없으면 프로세스별로 DB 에서 로드
+def catalog_from_env(connect, probe_query=None):
+    directory = os.getenv('CATALOG_SHARED_DIR')
+    if directory:
+        return create_shared_catalog(directory, refresh_interval=int(os.getenv('CATALOG_SHARED_POLL_SECONDS', '5')))
+    return create_catalog(connect, refresh_interval=int(os.getenv('CATALOG_REFRESH_SECONDS', '30')),
+                          probe_query=probe_query)
+
+
+# 키셋 쿼리와 파라미터 (after_id 가 없으면 처음부터)
+def keyset_query(query, params, after_id=None, limit=None):
+    params = tuple(params) + (after_id if after_id is not None else 0,)
+    if limit is not None:
+        return query + " LIMIT %s", params + (limit,)
+    return query, params
+
+
+def _search_ranked(snapshot, query, limit, offset, fuzzy):
+    index = snapshot.extras['search']
+    return index, index.search(query, fuzzy=fuzzy, min_results=offset + (limit or 10))
+
+
+def _row_batches(snapshot, rows, batch_size):
+    columns = snapshot.frame[SEARCH_COLUMNS]
+    for start in range(0, len(rows), batch_size):
+        yield columns.iloc[rows[start:start + batch_size]].to_dict(orient='records')
+
+
+# 검색 결과 (이름, 가게 이름, 가격, 이미지)
+def search_records(snapshot, query, limit=None, offset=0, fuzzy=True):
+    index, ranked = _search_ranked(snapshot, query, limit, offset, fuzzy)
+    rows = index.result_rows(ranked, offset, limit)
+    return snapshot.frame.iloc[rows][SEARCH_COLUMNS].to_dict(orient='records')
+
+
+# 검색 결과를 batch_size 행씩 나눠 생성 (스트리밍 응답용)
+def search_batches(snapshot, query, limit=None, offset=0, fuzzy=True, batch_size=500):
+    index, ranked = _search_ranked(snapshot, query, limit, offset, fuzzy)
+    return _row_batches(snapshot, index.result_rows(ranked, offset, limit), batch_size)
+
+
+# after_id(요리 id) 다음 페이지 -> (검색 결과, 다음 after_id)
+#   같은 스냅샷에서는 순위가 고정되므로 after_id 로 이어서 조회 가능
+def search_page(snapshot, query, after_id=None, limit=None, fuzzy=True):
+    index, ranked = _search_ranked(snapshot, query, limit, 0, fuzzy)
+    rows, next_after_id = index.page_rows(ranked, after_id, limit)
+    return snapshot.frame.iloc[rows][SEARCH_COLUMNS].to_dict(orient='records'), next_after_id
+
+
+# 주변 가게 (radius_km 가 있으면 반경 검색, 없으면 가까운 순 limit 개)
+def nearby_store_records(snapshot, lat, lon, radius_km=None, limit=20):
+    store_index = snapshot.extras['spatial']
+    if radius_km:
+        positions, distances = store_index.within(lat, lon, radius_km, limit)
+    else:
+        positions, distances = store_index.nearest(lat, lon, limit)
+    stores = snapshot.stores.iloc[positions].copy()
+    stores['distance'] = np.round(distances, 3)
+    return stores.to_dict(orient='records')
+
+
+# /dishes/filter 요청 값 (쿼리 문자열 또는 JSON 본문) -> filter_dishes 인자 (잘못된 값은 ValueError)
+#   facets 는 목록 또는 쉼표 구분 문자열 (없으면 전체 facet)
+def parse_filter_request(data):
+    facets = data.get('facets')
+    if isinstance(facets, str):
+        facets = [facet.strip() for facet in facets.split(',') if facet.strip()]
+    return {
+        'expression': parse_filter(data.get('filter')),
+        'facets': facets or None,
+        'limit': clamp_limit(int(data['limit'])) if data.get('limit') is not None else 50,
+        'after_id': int(data['after_id']) if data.get('after_id') is not None else None,
+    }
+
+
+# facet 필터 결과 (조건에 맞는 반찬 수, facet 값별 반찬 수, id 순 반찬 목록 한 페이지와 다음 after_id)
+def filter_dishes(snapshot, expression, facets=None, limit=50, after_id=None):
+    index = snapshot.extras['facets']
+    bits = index.evaluate(expression)
+    positions = np.flatnonzero(index.dish_mask(bits))
+    ids = index.dish_ids[positions]
+    order = np.argsort(ids, kind='stable')
+    positions, ids = positions[order], ids[order]
+    if after_id is not None:
+        positions = positions[np.searchsorted(ids, after_id, side='right'):]
+    page = positions[:limit]
+    return {
+        'total': index.count(bits),
+        'facets': index.facet_counts(bits, facets),
+        'dishes': snapshot.dishes.iloc[page][FILTER_COLUMNS].to_dict(orient='records'),
+        'next_after_id': int(index.dish_ids[page[-1]]) if len(positions) > limit else None,
+    }
+
+
+# 후보 행 중 제약 조건을 만족하는 추천 슬레이트를 골라 결과 DataFrame 구성
+#   국물요리 최대 1개(포함 시 최고 점수 하나 고정), '전' 최대 1개, 이름 중복 없음, 가게당 최대 max_per_store 개
+#   국물요리 / 전 여부는 EncodedCatalog 의 반찬별 배열을 행으로 펼쳐 사용
+def select_slate(dish_df, encoded, rows, scores, distances, num_recommendations, pin_soup=True, max_per_store=None):
+    row_dish = encoded.row_dish[rows]
+    soup_mask = encoded.soup_dishes[row_dish]
+    jeon_mask = encoded.jeon_dishes[row_dish]
+    positions = build_slate(
+        scores, num_recommendations,
+        distances=distances,
+        names=encoded.name_codes[encoded.row_dish[rows]],
+        stores=dish_df['store_id'].to_numpy()[rows],
+        groups={'soup': soup_mask, 'jeon': jeon_mask},
+        group_caps={'soup': 1, 'jeon': 1},
+        pinned=('soup',) if pin_soup else (),
+        per_store_cap=max_per_store
+    )
+    top_recommendations = dish_df.iloc[rows[positions]].copy()
+    top_recommendations['score'] = scores[positions]
+    top_recommendations['distance'] = distances[positions]
+    return top_recommendations[['name', 'store_name', 'latitude', 'longitude', 'price', 'image_url', 'score', 'distance']]
+
+# 사용자 위치에서 각 행(가게)까지의 거리
+def row_distances(dish_df, user_lat, user_lon, store_index=None, radius_km=None):
+    if user_lat is None or user_lon is None:
+        return np.full(len(dish_df), np.inf)
+    if store_index is None:
+        return haversine_km(user_lat, user_lon, dish_df['latitude'], dish_df['longitude'])
+    # 반경이 있으면 격자 인덱스로 찾은 반경 내 가게만 계산
+    nearby = store_index.within(user_lat, user_lon, radius_km)[0] if radius_km else None
+    return store_index.distances(user_lat, user_lon, nearby)[store_index.row_store]
+
+# 반찬 추천 로직
+def recommend_dishes(user_dishes, dish_df, num_recommendations, include_soup_option=False, selected_season=None, vegan_only=False, encoded=None,
+                     user_lat=None, user_lon=None, radius_km=None, store_index=None, dish_scores=None, max_per_store=None,
+                     facets=None, filter_expression=None):
+    try:
+        logger.debug("Starting recommendation process")
+        logger.debug("User dishes: %s, Recommendations needed: %s, Include soup: %s",
+                     user_dishes, num_recommendations, include_soup_option)
+
+        if encoded is None:
+            encoded = encode_frame(dish_df)
+
+        # 후보 행 선택 (DataFrame 복사 없이 행 번호 배열로 처리)
+        with stage('recommend.filter'):
+            keep = ~dish_df['name'].isin(user_dishes).to_numpy()
+
+            if facets is not None:
+                # 비건 / 국물요리 제외 / 요청 필터 식을 반찬 비트셋 연산으로 계산한 뒤 행으로 펼침
+                expression = recommend_filter(vegan_only, include_soup_option, filter_expression)
+                if expression is not None:
+                    keep &= facets.row_mask(facets.evaluate(expression), encoded.row_dish)
+            else:
+                if filter_expression is not None:
+                    raise FilterError("filter requires the facet index")
+
+                # 비건 필터 적용
+                if vegan_only:
+                    keep &= dish_df['characteristics'].str.contains('비건', na=False).to_numpy()
+
+                # 국물요리 완전히 제외
+                if not include_soup_option:
+                    keep &= ~encoded.soup_dishes[encoded.row_dish]
+
+        # 가게 거리 계산 및 반경 필터
+        with stage('recommend.distance'):
+            distances = row_distances(dish_df, user_lat, user_lon, store_index, radius_km)
+            if radius_km:
+                keep &= distances <= radius_km
+                logger.debug("Radius filter applied. Radius: %skm", radius_km)
+
+            rows = np.flatnonzero(keep)
+        logger.debug("Candidate dishes count: %d", len(rows))
+
+        # 사용자 반찬(맛, 카테고리) 및 계절 기반 점수 계산 (배치에서 미리 계산한 반찬 점수가 있으면 사용)
+        with stage('recommend.score'):
+            if dish_scores is not None:
+                scores = dish_scores[encoded.row_dish[rows]]
+            else:
+                scores = score_rows(encoded, rows, user_dishes, selected_season, SERVER_WEIGHTS)
+        if selected_season:
+            logger.debug("Season filter applied. Season: %s", selected_season)
+
+        # 정렬 및 제약 조건 적용 후 상위 N 개 선택
+        with stage('recommend.slate'):
+            top_recommendations = select_slate(dish_df, encoded, rows, scores, distances[rows], num_recommendations,
+                                               pin_soup=include_soup_option, max_per_store=max_per_store)
+        if len(top_recommendations) < num_recommendations:
+            logger.warning("No more unique candidates to fill recommendations.")
+        logger.debug("Final recommendations count: %d", len(top_recommendations))
+
+        # 결과 반환
+        return top_recommendations
+    except FilterError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in recommend_dishes: {e}")
+        raise
+
+# 양수 값 검증 (None 은 그대로, 숫자가 아니거나 0 이하이면 ValueError -> 서버는 400 으로 응답)
+def _positive_float(data, name):
+    value = data.get(name)
+    if value is None:
+        return None
+    try:
+        number = float(value) if not isinstance(value, bool) else math.nan
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError(f"{name} must be a positive number")
+    return number
+
+# 추천 요청 입력 값 검증 및 기본값 설정
+def parse_recommend_request(data):
+    num_recommendations = data.get('num_recommendations', 5)
+    if num_recommendations <= 0:
+        logger.warning("Invalid num_recommendations (%s). Setting to default value 5.", num_recommendations)
+        num_recommendations = 5
+    return {
+        'user_dishes': data.get('user_dishes', []),
+        'num_recommendations': num_recommendations,
+        'include_soup_option': data.get('include_soup_option', True),
+        'selected_season': data.get('selected_season', None),
+        'vegan_only': data.get('vegan_only', False),
+        'user_lat': data.get('user_lat', 37.4783),
+        'user_lon': data.get('user_lon', 126.9516),
+        'radius_km': _positive_float(data, 'radius_km'),
+        'max_per_store': data.get('max_per_store', None),
+        # facet 필터 식 (facets.py 참고, 예: {"not": "allergen:땅콩"})
+        'filter': parse_filter(data.get('filter')),
+    }
+
+# 요청 하나에 대한 추천 실행 (응답에 필요한 컬럼만 반환)
+#   orders(OrderStore) 가 있으면 함께 주문된 반찬 점수, popularity(PopularityTracker) 가 있으면 인기 점수,
+#   sentiment(SentimentStore) 가 있으면 리뷰 감성 점수를 더함
+def run_recommendation(params, snapshot, dish_scores=None, orders=None, popularity=None, sentiment=None):
+    dish_df = snapshot.frame
+    encoded = snapshot.extras['scoring']
+
+    # 건너뛰기 로직 사용 여부 확인
+    if not params['user_dishes'] and params['selected_season'] is None:
+        logger.debug("No user dishes or selected season provided. Using skip logic.")
+        # 규칙 점수는 모두 0 (인기 / 감성 점수가 없으면 가까운 가게의 반찬부터, 요청 조건은 그대로 적용)
+        dish_scores = np.zeros(encoded.size)
+    else:
+        # 반찬 관계 행렬이 있으면 사용자 반찬 행만 모아 점수 계산
+        compat = snapshot.extras.get('compat')
+        if dish_scores is None and compat is not None:
+            with stage('recommend.compat'):
+                dish_scores = compat.score(encoded, params['user_dishes'], params['selected_season'])
+    boosts = []
+    # 함께 주문된 반찬 점수 (사용자 반찬마다 이웃 목록만 확인)
+    if orders is not None and params['user_dishes']:
+        with stage('recommend.cooccurrence'):
+            boosts.append(orders.dish_scores(encoded, params['user_dishes']))
+    # 최근 인기 반찬 점수 (전체 + 사용자 주변 격자, DB 조회 없이 메모리 카운터만 읽음)
+    if popularity is not None:
+        with stage('recommend.popularity'):
+            boosts.append(popularity.dish_boost(encoded, params['user_lat'], params['user_lon']))
+    # 리뷰 감성 점수 (파이프라인이 미리 집계한 반찬별 점수만 읽음, 요청 중 감성 분석 없음)
+    if sentiment is not None:
+        with stage('recommend.sentiment'):
+            boosts.append(sentiment.dish_boost(encoded))
+    boosts = [boost for boost in boosts if boost is not None]
+    if boosts:
+        if dish_scores is None:
+            dish_scores = score_dishes(encoded, params['user_dishes'], params['selected_season'], SERVER_WEIGHTS)
+        # 규칙 점수는 사용자 반찬 행(판매 가게)마다 누적되므로 가산 점수도 같은 단위로 맞춤
+        scale = max(int(encoded.user_counts(params['user_dishes']).sum()), 1)
+        dish_scores = dish_scores + sum(boosts) * scale
+    recommendations = recommend_dishes(
+        params['user_dishes'], dish_df, params['num_recommendations'],
+        params['include_soup_option'], params['selected_season'], params['vegan_only'],
+        encoded, params['user_lat'], params['user_lon'], params['radius_km'],
+        snapshot.extras['spatial'], dish_scores, params['max_per_store'], snapshot.extras.get('facets'),
+        params.get('filter')
+    )
+    with stage('recommend.records'):
+        return recommendations[['name', 'store_name', 'price', 'image_url']].to_dict(orient='records')
+
+# 추천 결과 캐시를 거쳐 실행 (캐시에 없으면 정규화된 요청으로 계산 후 저장)
+#   캐시 키에는 주문 인덱스 / 인기도 / 리뷰 집계 상태가 없으므로 새 주문, 이벤트, 리뷰는 캐시 TTL 이 지난 뒤 반영됨
+def cached_recommendation(params, snapshot, cache=None, orders=None, popularity=None, sentiment=None):
+    if cache is None:
+        return run_recommendation(params, snapshot, orders=orders, popularity=popularity, sentiment=sentiment)
+    return cache.get_or_compute(params, snapshot.version, lambda canonical: run_recommendation(
+        canonical, snapshot, orders=orders, popularity=popularity, sentiment=sentiment))
+
+# 여러 추천 요청을 (사용자 x 반찬) 행렬 단위로 한 번에 점수 계산 (캐시에 있는 요청은 계산에서 제외)
+def recommend_dishes_batch(payloads, snapshot, max_cells=2 ** 22, cache=None, orders=None, popularity=None,
+                           sentiment=None):
+    encoded = snapshot.extras['scoring']
+    results = [None] * len(payloads)
+    pending = []  # (결과 위치, 요청, 캐시 키)
+    for position, data in enumerate(payloads):
+        try:
+            params = parse_recommend_request(data)
+        except (ValueError, TypeError) as e:
+            results[position] = {"error": str(e)}
+            continue
+        if cache is None:
+            pending.append((position, params, None))
+            continue
+        canonical, key, value = cache.lookup(params, snapshot.version)
+        if value is None:
+            pending.append((position, canonical, key))
+        else:
+            results[position] = value
+    chunk_size = max(1, max_cells // max(encoded.size, 1))
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        with stage('recommend.batch_score'):
+            score_matrix = score_dishes_batch(
+                encoded,
+                [params['user_dishes'] for _, params, _ in chunk],
+                [params['selected_season'] for _, params, _ in chunk],
+                SERVER_WEIGHTS
+            )
+        for (position, params, key), dish_scores in zip(chunk, score_matrix):
+            try:
+                results[position] = run_recommendation(params, snapshot, dish_scores, orders, popularity, sentiment)
+                if key is not None:
+                    cache.store(key, snapshot.version, results[position])
+            except FilterError as e:
+                results[position] = {"error": str(e)}
+            except Exception as e:
+                logger.error(f"Error in batch recommendation: {e}")
+                results[position] = {"error": f"An unexpected error occurred: {e}"}
+    return results
@@ -0,0 +1,329 @@
+import argparse
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import CatalogSnapshot, CatalogStore, SQLITE_PROBE_QUERY
+from compat import RELATIONS_FILE, CompatMatrix, build_compat
+from facets import FacetIndex, build_facet_index
+from metrics import stage
+from scoring import SHARED_ARRAYS, EncodedCatalog, encode_catalog
+from search_index import SearchIndex, build_search_index
+from spatial import StoreIndex, build_store_index
+
+# 멀티 프로세스(pre-fork) 배포용 공유 카탈로그
+#   로더 프로세스 하나가 DB 에서 카탈로그를 읽어 평평한 NumPy 배열(.npy)로 세대 디렉터리에 저장하고
+#   CURRENT 파일을 원자적으로 교체, 워커는 mmap 으로 읽기 전용 연결 (같은 페이지 캐시를 공유하므로
+#   워커를 늘려도 카탈로그 메모리는 한 벌, 워커 시작 시 DB 조회 / 인코딩 없음)
+#     python shared_catalog.py --dir /dev/shm/bapsim-catalog            (DB_* 환경 변수의 MariaDB, 30초마다 확인)
+#     CATALOG_SHARED_DIR=/dev/shm/bapsim-catalog gunicorn -w 8 flask_server:app
+#   디렉터리 구성: CURRENT (현재 세대 JSON), gen-<세대>-<버전>/ (frame 열 배열, 인코딩/공간 인덱스 배열,
+#   검색 포스팅 / facet 비트셋 배열, 반찬별 행 목록, compat/ 관계 행렬,
+#   tables.pkl 가게/반찬 테이블과 어휘, 검색 문서 등 작은 객체)
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+TABLES_FILE = 'tables.pkl'
+COMPAT_DIR = 'compat'
+
+# 파일에서 바로 복원하는 파생 구조 (나머지 빌더는 워커가 작은 테이블로 직접 생성)
+SHARED_EXTRAS = ('scoring', 'spatial', 'compat', 'search', 'facets')
+# 배열과 작은 객체로 나눠 저장하는 파생 구조 (shared_state() 가 있는 것)
+STATE_EXTRAS = {'search': build_search_index, 'facets': build_facet_index}
+
+# pandas 3 부터는 Copy-on-Write 로 항상 복사 없이 연결 (copy 인자는 폐기 예정)
+_CONCAT_OPTIONS = {} if int(pd.__version__.split('.')[0]) >= 3 else {'copy': False}
+
+
+# pandas Categorical 이 코드 배열로 쓰는 정수 타입 (같은 타입으로 저장해야 연결 시 변환 복사가 없음)
+def _code_dtype(size):
+    for dtype in (np.int8, np.int16, np.int32):
+        if size < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _is_numeric(series):
+    return series.dtype.kind in 'iufb'
+
+
+def _read_current(root):
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, data):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+# frame 열을 dtype 별 (열 수, 행 수) 2차원 배열과 문자열 열의 범주 코드로 분리
+def _frame_arrays(frame):
+    arrays = {}
+    layout = {'numeric': [], 'categorical': []}
+    numeric = {}
+    for column in frame.columns:
+        if _is_numeric(frame[column]):
+            numeric.setdefault(frame[column].dtype.str, []).append(column)
+    for position, (dtype, columns) in enumerate(numeric.items()):
+        name = f'frame_numeric_{position}'
+        arrays[name] = np.ascontiguousarray(np.stack([frame[column].to_numpy() for column in columns]))
+        layout['numeric'].append((name, columns))
+    categories = {}
+    for column in frame.columns:
+        if not _is_numeric(frame[column]):
+            codes, uniques = pd.factorize(frame[column], use_na_sentinel=True)
+            arrays[f'frame_codes_{column}'] = codes.astype(_code_dtype(len(uniques)))
+            categories[column] = list(uniques)
+            layout['categorical'].append(column)
+    layout['columns'] = list(frame.columns)
+    return arrays, layout, categories
+
+
+# 반찬 id 별 행 번호를 (정렬된 행 번호, 시작 위치) 로 저장 (워커는 dict 대신 배열 조각으로 사용)
+def _dish_row_arrays(frame):
+    dish_ids = frame['dish_id'].to_numpy()
+    order = np.argsort(dish_ids, kind='stable')
+    keys, starts = np.unique(dish_ids[order], return_index=True)
+    return {'dish_row_order': order.astype(np.int64), 'dish_row_keys': keys,
+            'dish_row_starts': np.append(starts, len(order)).astype(np.int64)}
+
+
+# 스냅샷을 세대 디렉터리에 저장하고 CURRENT 교체 (이전 세대는 keep 개까지 보관)
+def publish_snapshot(snapshot, root, keep=2):
+    os.makedirs(root, exist_ok=True)
+    current = _read_current(root)
+    generation = (current['generation'] + 1) if current else 1
+    name = f'gen-{generation:06d}-{snapshot.version}'
+    temporary = os.path.join(root, f'.{name}.{os.getpid()}.tmp')
+    started = time.perf_counter()
+    os.makedirs(temporary)
+    try:
+        arrays, layout, categories = _frame_arrays(snapshot.frame)
+        arrays.update(_dish_row_arrays(snapshot.frame))
+        encoded = snapshot.extras.get('scoring') or encode_catalog(snapshot)
+        encoded_arrays, encoded_objects = encoded.shared_state()
+        arrays.update({f'scoring_{key}': value for key, value in encoded_arrays.items()})
+        store_index = snapshot.extras.get('spatial') or build_store_index(snapshot)
+        arrays['spatial_row_store'] = store_index.row_store
+        states, state_arrays = {}, {}
+        for extra, builder in STATE_EXTRAS.items():
+            index = snapshot.extras.get(extra) or builder(snapshot)
+            extra_arrays, states[extra] = index.shared_state()
+            state_arrays[extra] = list(extra_arrays)
+            arrays.update({f'{extra}_{key}': value for key, value in extra_arrays.items()})
+        for key, value in arrays.items():
+            np.save(os.path.join(temporary, f'{key}.npy'), np.ascontiguousarray(value))
+
+        compat = snapshot.extras.get('compat')
+        if compat is not None:
+            compat.save(os.path.join(temporary, COMPAT_DIR))
+
+        with open(os.path.join(temporary, TABLES_FILE), 'wb') as f:
+            pickle.dump({'stores': snapshot.stores, 'dishes': snapshot.dishes, 'categories': categories,
+                         'scoring': encoded_objects, 'cell_degrees': store_index.cell_degrees, **states},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(temporary, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'version': snapshot.version, 'generation': generation, 'layout': layout,
+                       'loaded_at': snapshot.loaded_at, 'rows': len(snapshot.frame),
+                       'state_arrays': state_arrays}, f, ensure_ascii=False)
+        os.rename(temporary, os.path.join(root, name))
+    except Exception:
+        shutil.rmtree(temporary, ignore_errors=True)
+        raise
+    _write_atomic(os.path.join(root, CURRENT_FILE), {'generation': generation, 'path': name,
+                                                      'version': snapshot.version})
+    logger.info(f"Published shared catalog {name} in {time.perf_counter() - started:.3f}s")
+
+    # 이전 세대 정리 (이미 연결한 워커의 mmap 은 파일을 지워도 유지됨)
+    generations = sorted(entry for entry in os.listdir(root) if entry.startswith('gen-'))
+    for entry in generations[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return name
+
+
+# mmap 배열로 만든 스냅샷 (frame 의 숫자 열은 배열을 그대로, 문자열 열은 범주 코드를 그대로 사용)
+class SharedSnapshot(CatalogSnapshot):
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, TABLES_FILE), 'rb') as f:
+            tables = pickle.load(f)
+        self.directory = directory
+
+        def load(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+
+        layout = meta['layout']
+        parts = []
+        codes = {}
+        for name, columns in layout['numeric']:
+            # (열 수, 행 수) 배열의 전치 -> pandas 블록이 같은 메모리를 그대로 사용
+            parts.append(pd.DataFrame(np.asarray(load(name)).T, columns=columns, copy=False))
+        for column in layout['categorical']:
+            # DataFrame({열: Categorical}) 은 코드 배열을 복사하므로 Series 로 연결
+            codes[column] = np.asarray(load(f'frame_codes_{column}'))
+            categorical = pd.Categorical.from_codes(codes[column], categories=tables['categories'][column])
+            parts.append(pd.Series(categorical, name=column, copy=False))
+        frame = pd.concat(parts, axis=1, **_CONCAT_OPTIONS) if parts else pd.DataFrame(columns=layout['columns'])
+        # 연결 중 복사 여부는 pandas 버전에 따라 다르므로 확인만 (복사된 열은 워커마다 메모리를 따로 사용)
+        copied = [column for column, array in codes.items()
+                  if not np.shares_memory(frame[column].array.codes, array)]
+        if copied:
+            logger.warning(f"Shared catalog columns copied into worker memory: {copied}")
+
+        super().__init__(tables['stores'], tables['dishes'], frame, meta['version'],
+                         os.path.basename(directory), meta['generation'], meta['loaded_at'], 0.0)
+        self._dish_row_order = load('dish_row_order')
+        self._dish_row_keys = load('dish_row_keys')
+        self._dish_row_starts = load('dish_row_starts')
+
+        self.extras['scoring'] = EncodedCatalog.from_shared(
+            {key: load(f'scoring_{key}') for key in SHARED_ARRAYS}, tables['scoring'])
+        self.extras['spatial'] = StoreIndex(self.stores, cell_degrees=tables['cell_degrees'],
+                                            row_store=load('spatial_row_store'))
+        compat_dir = os.path.join(directory, COMPAT_DIR)
+        self.extras['compat'] = CompatMatrix.load(compat_dir) \
+            if os.path.exists(os.path.join(compat_dir, RELATIONS_FILE)) else None
+
+        # 검색 / facet 인덱스 (이전 로더가 저장한 세대에 없으면 워커의 빌더가 생성)
+        states = {extra: {key: load(f'{extra}_{key}') for key in keys}
+                  for extra, keys in meta.get('state_arrays', {}).items()}
+        if 'search' in states:
+            self.extras['search'] = SearchIndex.from_shared(states['search'], tables['search'], self)
+        if 'facets' in states:
+            self.extras['facets'] = FacetIndex.from_shared(states['facets'], tables['facets'])
+
+    def dish_rows(self):
+        order, starts = self._dish_row_order, self._dish_row_starts
+        return {dish_id: order[starts[position]:starts[position + 1]]
+                for position, dish_id in enumerate(self._dish_row_keys.tolist())}
+
+
+# 워커 측 카탈로그 (CatalogStore 와 같은 인터페이스, DB 대신 CURRENT 가 가리키는 세대에 연결)
+class SharedCatalogStore:
+    def __init__(self, root, refresh_interval=5):
+        self.root = root
+        self._refresh_interval = refresh_interval
+        self._reload_lock = threading.Lock()
+        self._snapshot = None
+        self._builders = []
+        self._refresh_thread = None
+
+    # 공유 파일에 없는 파생 구조(검색 인덱스, 이미지 등)만 워커에서 생성
+    def register_builder(self, name, builder, incremental=False):
+        self._builders.append((name, builder, incremental))
+        snapshot = self._snapshot
+        if snapshot is not None and name not in snapshot.extras:
+            snapshot.extras[name] = builder(snapshot, None) if incremental else builder(snapshot)
+
+    def peek(self):
+        return self._snapshot
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.reload(force=False)
+        return snapshot
+
+    # CURRENT 가 가리키는 세대가 바뀌었으면 새로 연결 (같으면 기존 스냅샷 유지, force 도 같은 세대는 다시 읽지 않음)
+    def reload(self, force=True):
+        with self._reload_lock:
+            current = self._snapshot
+            pointer = _read_current(self.root)
+            if pointer is None:
+                raise RuntimeError(f"No shared catalog has been published in {self.root}")
+            if current is not None and current.fingerprint == pointer['path']:
+                return current
+
+            started = time.perf_counter()
+            with stage('catalog.attach'):
+                snapshot = SharedSnapshot(os.path.join(self.root, pointer['path']))
+            for name, builder, incremental in self._builders:
+                if name in snapshot.extras:
+                    continue
+                with stage(f'catalog.build_{name}'):
+                    if incremental:
+                        previous = current.extras.get(name) if current is not None else None
+                        snapshot.extras[name] = builder(snapshot, previous)
+                    else:
+                        snapshot.extras[name] = builder(snapshot)
+            snapshot.load_seconds = time.perf_counter() - started
+
+            self._snapshot = snapshot
+            logger.info(f"Shared catalog attached: {pointer['path']} rows={snapshot.row_counts} "
+                        f"in {snapshot.load_seconds:.3f}s")
+            return snapshot
+
+    def start_background_refresh(self):
+        if self._refresh_interval <= 0 or self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name='shared-catalog-refresh',
+                                                daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self._refresh_interval)
+            try:
+                self.reload(force=False)
+            except Exception as e:
+                logger.error(f"Shared catalog refresh failed: {e}")
+
+
+# 로더 프로세스: DB 를 주기적으로 확인해 내용이 바뀔 때마다 새 세대 저장
+def run_publisher(connect, root, interval=30, keep=2, once=False, probe_query=None):
+    catalog = CatalogStore(connect, refresh_interval=0, probe_query=probe_query)
+    catalog.register_builder('scoring', encode_catalog)
+    catalog.register_builder('spatial', build_store_index)
+    catalog.register_builder('compat', build_compat, incremental=True)
+    catalog.register_builder('search', build_search_index, incremental=True)
+    catalog.register_builder('facets', build_facet_index)
+    published = None
+    while True:
+        try:
+            snapshot = catalog.reload(force=False)
+            if snapshot is not published:
+                publish_snapshot(snapshot, root, keep)
+                published = snapshot
+        except Exception as e:
+            if once:
+                raise
+            logger.error(f"Shared catalog publish failed: {e}")
+        if once:
+            return published
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Publish the catalog as shared memory-mapped arrays")
+    parser.add_argument('--dir', default=os.getenv('CATALOG_SHARED_DIR', '/dev/shm/bapsim-catalog'))
+    parser.add_argument('--interval', type=float, default=float(os.getenv('CATALOG_REFRESH_SECONDS', '30')))
+    parser.add_argument('--keep', type=int, default=2, help="number of generations kept on disk")
+    parser.add_argument('--once', action='store_true', help="publish one generation and exit")
+    parser.add_argument('--sqlite', help="read from a SQLite file instead of MariaDB")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        import sqlite3
+        connect, probe_query = (lambda: sqlite3.connect(args.sqlite)), SQLITE_PROBE_QUERY
+    else:
+        from db_pool import pool_from_env
+        connect, probe_query = pool_from_env().acquire, None
+    run_publisher(connect, args.dir, args.interval, args.keep, args.once, probe_query)
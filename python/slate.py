@@ -0,0 +1,91 @@
+import numpy as np
+
+
+# 점수 내림차순, 거리 오름차순, 위치 오름차순 정렬 (결정적)
+def _rank(positions, scores, distances):
+    return positions[np.lexsort((positions, distances[positions], -scores[positions]))]
+
+
+# 상위 m 개 후보 풀 (_rank 순서 기준 정확히 m 개)
+#   m 번째 점수와 같은 동점 후보가 많으면 (점수 종류가 적을 때) 거리, 위치 순으로 필요한 만큼만 포함
+def _top_pool(scores, m, distances):
+    if m >= len(scores):
+        return np.arange(len(scores))
+    threshold = np.partition(scores, len(scores) - m)[len(scores) - m]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)
+    need = m - len(above)
+    if len(ties) > need:
+        tie_distances = distances[ties]
+        cutoff = np.partition(tie_distances, need - 1)[need - 1]
+        closer = ties[tie_distances < cutoff]
+        ties = np.concatenate((closer, ties[tie_distances == cutoff][:need - len(closer)]))
+    return np.concatenate((above, ties))
+
+
+# 그룹 내 최고 후보 하나 (O(n))
+def _best_in(mask, scores, distances):
+    members = np.flatnonzero(mask)
+    if not len(members):
+        return None
+    best = members[scores[members] == scores[members].max()]
+    best = best[distances[best] == distances[best].min()]
+    return int(best[0])
+
+
+# 제약 조건을 만족하는 상위 k 개 추천 슬레이트 구성
+#   groups: {그룹 이름: bool 배열}, group_caps: {그룹 이름: 최대 개수}
+#   pinned: 점수와 관계없이 가장 먼저 한 개를 고정할 그룹 (예: 국물요리)
+#   names: 중복을 허용하지 않을 키 (정수 코드), stores: per_store_cap 적용 대상
+def build_slate(scores, k, distances=None, names=None, stores=None, groups=None, group_caps=None,
+                pinned=(), per_store_cap=None, overfetch=4):
+    scores = np.asarray(scores)
+    n = len(scores)
+    distances = np.zeros(n) if distances is None else np.nan_to_num(np.asarray(distances, dtype=np.float64), nan=np.inf)
+    groups = groups or {}
+    group_caps = group_caps or {}
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    def select(ranked, selected):
+        used_names = set()
+        store_counts = {}
+        group_counts = dict.fromkeys(groups, 0)
+
+        def accept(position):
+            if names is not None and names[position] in used_names:
+                return False
+            if per_store_cap is not None and store_counts.get(stores[position], 0) >= per_store_cap:
+                return False
+            for group, mask in groups.items():
+                if mask[position] and group_counts[group] >= group_caps.get(group, n):
+                    return False
+            if names is not None:
+                used_names.add(names[position])
+            if per_store_cap is not None:
+                store_counts[stores[position]] = store_counts.get(stores[position], 0) + 1
+            for group, mask in groups.items():
+                if mask[position]:
+                    group_counts[group] += 1
+            selected.append(position)
+            return True
+
+        for group in pinned:
+            best = _best_in(groups[group], scores, distances)
+            if best is not None and len(selected) < k:
+                accept(best)
+        for position in ranked:
+            if len(selected) >= k:
+                break
+            if position not in selected:
+                accept(int(position))
+        return selected
+
+    # 부분 선택으로 만든 풀에서 먼저 채우고, 제약 때문에 모자라면 풀을 넓혀 다시 선택
+    m = min(n, max(k * overfetch, k + 1))
+    while True:
+        pool = _top_pool(scores, m, distances)
+        selected = select(_rank(pool, scores, distances), [])
+        if len(selected) >= k or len(pool) >= n:
+            return np.asarray(selected, dtype=np.int64)
+        m = min(n, m * overfetch)
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371  # 지구 반지름(km)
+KM_PER_DEGREE = 111.195  # 위도 1도 거리(km)
+
+
+# 벡터화된 Haversine 거리 (배열 브로드캐스팅, 좌표가 없으면 inf)
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.asarray(value, dtype=np.float64) for value in (lat1, lon1, lat2, lon2))
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(lon2 - lon1)
+
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return np.where(np.isnan(distance), np.inf, distance)
+
+
+# 가게 좌표 격자 인덱스 (셀 단위로 후보를 좁힌 뒤 해당 셀만 거리 계산)
+class StoreIndex:
+    # row_store 를 주면 frame 대신 사용 (공유 카탈로그에서 미리 계산한 배열)
+    def __init__(self, stores, frame=None, cell_degrees=0.01, row_store=None):
+        self.cell_degrees = cell_degrees
+        self.store_ids = stores['id'].to_numpy()
+        self.latitudes = pd.to_numeric(stores['latitude'], errors='coerce').to_numpy(dtype=np.float64)
+        self.longitudes = pd.to_numeric(stores['longitude'], errors='coerce').to_numpy(dtype=np.float64)
+        self._positions = pd.Index(self.store_ids)
+        # store_dishes 행 -> 가게 위치
+        if row_store is None and frame is not None:
+            row_store = self.positions(frame['store_id'])
+        self.row_store = row_store
+
+        located = np.flatnonzero(~np.isnan(self.latitudes) & ~np.isnan(self.longitudes))
+        rows = np.floor(self.latitudes[located] / cell_degrees).astype(np.int64)
+        cols = np.floor(self.longitudes[located] / cell_degrees).astype(np.int64)
+        self.cells = {}
+        for position, row, col in zip(located, rows, cols):
+            self.cells.setdefault((row, col), []).append(position)
+        self.cells = {key: np.asarray(value, dtype=np.int64) for key, value in self.cells.items()}
+        self.located_count = len(located)
+        if len(located):
+            self._row_range = (rows.min(), rows.max())
+            self._col_range = (cols.min(), cols.max())
+
+    def __len__(self):
+        return len(self.store_ids)
+
+    # store_id 배열 -> 인덱스 내 위치 (없으면 -1)
+    def positions(self, store_ids):
+        return self._positions.get_indexer(store_ids)
+
+    def _cell_of(self, lat, lon):
+        return int(np.floor(lat / self.cell_degrees)), int(np.floor(lon / self.cell_degrees))
+
+    # 중심 셀에서 row_span x col_span 범위의 셀에 속한 가게 위치
+    def _candidates(self, lat, lon, row_span, col_span):
+        center_row, center_col = self._cell_of(lat, lon)
+        row_low = max(center_row - row_span, self._row_range[0])
+        row_high = min(center_row + row_span, self._row_range[1])
+        col_low = max(center_col - col_span, self._col_range[0])
+        col_high = min(center_col + col_span, self._col_range[1])
+        if (row_high - row_low + 1) * (col_high - col_low + 1) > len(self.cells):
+            # 범위가 셀 개수보다 넓으면 셀 목록을 직접 훑음
+            chunks = [positions for (row, col), positions in self.cells.items()
+                      if row_low <= row <= row_high and col_low <= col <= col_high]
+        else:
+            chunks = [self.cells[(row, col)]
+                      for row in range(row_low, row_high + 1)
+                      for col in range(col_low, col_high + 1)
+                      if (row, col) in self.cells]
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def _spans(self, lat, radius_km):
+        row_span = int(np.ceil(radius_km / (KM_PER_DEGREE * self.cell_degrees)))
+        lon_km = KM_PER_DEGREE * self.cell_degrees * max(np.cos(np.radians(min(abs(lat) + row_span * self.cell_degrees, 89.9))), 1e-6)
+        col_span = int(np.ceil(radius_km / lon_km))
+        return row_span, col_span
+
+    # 반경 내 가게 (위치, 거리) 를 거리순으로 반환
+    def within(self, lat, lon, radius_km, limit=None):
+        if not self.located_count:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        row_span, col_span = self._spans(lat, radius_km)
+        positions = self._candidates(lat, lon, row_span, col_span)
+        distances = haversine_km(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return positions[order], distances[order]
+
+    # 가까운 가게 k 개 (셀 고리를 넓혀 가며 탐색)
+    def nearest(self, lat, lon, k):
+        if not self.located_count or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, self.located_count)
+        ring = 0
+        while True:
+            positions = self._candidates(lat, lon, ring, ring)
+            if len(positions) >= k:
+                break
+            ring = ring * 2 + 1
+        distances = haversine_km(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        # 고리 밖에 더 가까운 가게가 있을 수 있으므로 k번째 거리로 반경 검색 한 번 더 수행
+        kth_distance = np.partition(distances, k - 1)[k - 1]
+        return self.within(lat, lon, kth_distance, limit=k)
+
+    # 모든 가게까지의 거리 (positions 를 주면 해당 가게만 계산, 나머지는 inf)
+    def distances(self, lat, lon, positions=None):
+        if positions is None:
+            return haversine_km(lat, lon, self.latitudes, self.longitudes)
+        result = np.full(len(self.store_ids), np.inf)
+        result[positions] = haversine_km(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        return result
+
+
+def build_store_index(snapshot):
+    return StoreIndex(snapshot.stores, snapshot.frame)
@@ -0,0 +1,85 @@
+import os
+
+from http_cache import dump_json
+
+# 스트리밍 응답 (결과 전체를 메모리에 두지 않고 배치 단위로 직렬화)
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '500'))
+MAX_PAGE_LIMIT = int(os.getenv('MAX_PAGE_LIMIT', '1000'))
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+JSON_MIMETYPE = 'application/json'
+
+
+# ?stream=ndjson|json 또는 Accept: application/x-ndjson -> 스트리밍 형식 (없으면 None)
+def stream_format(stream_param=None, accept=None):
+    stream_param = (stream_param or '').lower()
+    if stream_param in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if stream_param in ('json', 'true', '1'):
+        return 'json'
+    if accept and NDJSON_MIMETYPE in accept:
+        return 'ndjson'
+    return None
+
+
+def stream_mimetype(fmt):
+    return NDJSON_MIMETYPE if fmt == 'ndjson' else JSON_MIMETYPE
+
+
+# limit 을 1..MAX_PAGE_LIMIT 로 제한 (None 이면 그대로)
+def clamp_limit(limit):
+    if limit is None:
+        return None
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+
+# 행 배치 -> JSON 배열 또는 NDJSON 바이트 청크 (비동기 서버에서도 배치마다 호출)
+class BatchEncoder:
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self._first = True
+
+    def start(self):
+        return b'' if self.fmt == 'ndjson' else b'['
+
+    def encode(self, batch):
+        if not batch:
+            return b''
+        if self.fmt == 'ndjson':
+            return b''.join(dump_json(row) + b'\n' for row in batch)
+        chunk = b','.join(dump_json(row) for row in batch)
+        if self._first:
+            self._first = False
+            return chunk
+        return b',' + chunk
+
+    def end(self):
+        return b'' if self.fmt == 'ndjson' else b']'
+
+
+def encode_batches(batches, fmt):
+    encoder = BatchEncoder(fmt)
+    yield encoder.start()
+    for batch in batches:
+        chunk = encoder.encode(batch)
+        if chunk:
+            yield chunk
+    yield encoder.end()
+
+
+# 서버 측 커서에서 fetchmany 로 배치 단위 조회
+def fetch_batches(cursor, batch_size=STREAM_BATCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+# 한 행을 더 읽어 다음 페이지 존재 여부 판단 -> (행, 다음 after_id)
+def split_page(rows, limit, key):
+    rows = list(rows)
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][key]
+    return rows, None
@@ -1,95 +1,250 @@
 # f"https://www.google.com/search?q={dish_name}+이미지&tbm=isch" # 구글 이미지 검색 URL
 # f"https://search.naver.com/search.naver?where=image&sm=tab_jum&query={dish_name}" # 네이버 이미지 검색 URL
 
-import requests
-from bs4 import BeautifulSoup
-import pymysql
-import time
+import argparse
 import csv
+import gzip
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlparse
 
-# MariaDB 연결
-db_connection = pymysql.connect(
-    host='localhost',
-    user='root',
-    password='1111',
-    database='bapsim',
-    charset='utf8mb4'
-)
-
-cursor = db_connection.cursor()
-
-# 결과 저장 디렉토리
-output_folder = "data"
-if not os.path.exists(output_folder):
-    os.mkdir(output_folder)
-
-output_file = os.path.join(output_folder, "dish_images.csv")
-
-# 원본 이미지 URL 가져오기
-def fetch_image_url(dish_name):
-    search_url = f"https://search.naver.com/search.naver?where=image&sm=tab_jum&query={dish_name}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Gecko/20100101 Firefox/91.0"
-    }
-    try:
-        response = requests.get(search_url, headers=headers)
-        
-        if response.status_code != 200:
-            print(f"Failed to fetch image for {dish_name}. Status code: {response.status_code}")
+from bs4 import BeautifulSoup
+
+from db_pool import pool_from_env
+from rate_limit import RetryableError, TokenBucket, call_with_retries
+
+# 반찬 이미지 수집기 (작업자 여러 개 + 토큰 버킷 속도 제한 + 디스크 캐시 + 묶음 UPDATE)
+#   python update_dish_images.py [--workers 4] [--rate 1] [--refresh] [--all]
+logger = logging.getLogger(__name__)
+
+SEARCH_URL = os.getenv('IMAGE_SEARCH_URL', "https://search.naver.com/search.naver?where=image&sm=tab_jum&query={query}")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Gecko/20100101 Firefox/91.0"
+}
+
+
+# 기본 fetcher (requests) -> (상태 코드, 본문)
+#   테스트에서는 같은 형태의 함수로 바꿔 끼워 로컬 스텁 서버나 고정 응답을 사용
+def requests_fetcher(timeout=10):
+    import requests
+    session = requests.Session()
+
+    def fetch(url):
+        response = session.get(url, headers=HEADERS, timeout=timeout)
+        return response.status_code, response.text
+    return fetch
+
+
+# 이미지 검색 결과 HTML 에서 첫 번째 이미지 URL 추출
+def extract_image_url(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for img_tag in soup.find_all("img"):
+        thumbnail_url = img_tag.get("src")
+        if thumbnail_url:
+            return thumbnail_url
+    return None
+
+
+def is_valid_image_url(url):
+    if not url:
+        return False
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and bool(parsed.netloc)
+
+
+# 반찬 이름 기준 디스크 캐시 (검색 페이지 gzip + 추출한 URL)
+class CrawlCache:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, dish_name, suffix):
+        key = hashlib.sha1(dish_name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, dish_name):
+        try:
+            with open(self._path(dish_name, '.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
             return None
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        image_tags = soup.find_all("img")
+    def put(self, dish_name, image_url, page=None):
+        if page is not None:
+            with gzip.open(self._path(dish_name, '.html.gz'), 'wt', encoding='utf-8') as f:
+                f.write(page)
+        entry = {'dish_name': dish_name, 'image_url': image_url, 'fetched_at': time.time()}
+        # 쓰는 도중 중단되어도 깨진 캐시가 남지 않도록 임시 파일 후 교체
+        path = self._path(dish_name, '.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+        return entry
+
 
-        if not image_tags:
-            print(f"No images found for {dish_name}")
+class ImageCrawler:
+    def __init__(self, fetch, cache, bucket, retries=3, base_delay=1.0, search_url=SEARCH_URL):
+        self.fetch = fetch
+        self.cache = cache
+        self.bucket = bucket
+        self.retries = retries
+        self.base_delay = base_delay
+        self.search_url = search_url
+        self.counters = dict.fromkeys(['fetched', 'cached', 'found', 'not_found', 'failed'], 0)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _fetch_page(self, dish_name):
+        url = self.search_url.format(query=quote(dish_name))
+
+        def attempt():
+            self.bucket.acquire()
+            status, text = self.fetch(url)
+            if status == 429 or status >= 500:
+                raise RetryableError(f"HTTP {status} for {dish_name}")
+            if status != 200:
+                raise ValueError(f"HTTP {status} for {dish_name}")
+            return text
+        return call_with_retries(attempt, self.retries, self.base_delay, retry_on=(OSError,))
+
+    # 반찬 하나의 이미지 URL (refresh=False 이면 캐시 우선)
+    def image_url(self, dish_name, refresh=False):
+        if not refresh:
+            entry = self.cache.get(dish_name)
+            if entry is not None:
+                self._count('cached')
+                return entry['image_url']
+        try:
+            page = self._fetch_page(dish_name)
+        except Exception as e:
+            logger.error(f"Error fetching image for {dish_name}: {e}")
+            self._count('failed')
             return None
+        self._count('fetched')
+        image_url = extract_image_url(page)
+        self._count('found' if image_url else 'not_found')
+        self.cache.put(dish_name, image_url, page)
+        return image_url
 
-        # 첫 번째 이미지 URL 반환
-        for img_tag in image_tags:
-            thumbnail_url = img_tag.get("src")
-            if thumbnail_url:
-                return thumbnail_url
-    except Exception as e:
-        print(f"Error fetching image for {dish_name}: {e}")
-    return None
+    # 작업자 여러 개로 수집 -> (반찬 이름, URL) 을 완료되는 순서대로 생성
+    def crawl(self, dish_names, workers=4, refresh=False):
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-crawler') as executor:
+            futures = {executor.submit(self.image_url, name, refresh): name for name in dish_names}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
 
-# 반찬 이미지 업데이트 및 CSV 파일 저장
-def update_dish_image(dish_name, writer):
-    image_url = fetch_image_url(dish_name)
-    if image_url:
+
+# 묶음 단위 UPDATE (batch_size 개마다 executemany + commit)
+class BatchUpdater:
+    def __init__(self, connection, batch_size=100):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.pending = []
+        self.updated = 0
+
+    def add(self, dish_name, image_url):
+        self.pending.append((image_url, dish_name))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        cursor = self.connection.cursor()
         try:
-            query = "UPDATE dishes SET image_url = %s WHERE name = %s"
-            cursor.execute(query, (image_url, dish_name))
-            db_connection.commit()
-            print(f"Updated image for {dish_name}: {image_url}")
+            cursor.executemany("UPDATE dishes SET image_url = %s WHERE name = %s", self.pending)
+            self.connection.commit()
+            self.updated += len(self.pending)
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.pending = []
+
+
+# 기존 결과 CSV -> {반찬 이름: URL} (파일 순서 유지, 파일이 없으면 빈 dict)
+def read_image_csv(path):
+    try:
+        with open(path, newline="", encoding="utf-8") as csvfile:
+            return {row["dish_name"]: row["image_url"] for row in csv.DictReader(csvfile) if row.get("dish_name")}
+    except FileNotFoundError:
+        return {}
+
+
+# 결과 CSV 를 임시 파일에 쓴 뒤 교체 (중간에 중단되어도 기존 파일이 남음)
+def write_image_csv(path, images):
+    with open(path + '.tmp', mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=["dish_name", "image_url"])
+        writer.writeheader()
+        for dish_name, image_url in images.items():
             writer.writerow({"dish_name": dish_name, "image_url": image_url})
-        except pymysql.MySQLError as e:
-            print(f"Database error while updating {dish_name}: {e}")
-    else:
-        print(f"No image found for {dish_name}")
+    os.replace(path + '.tmp', path)
+
+
+def update_dish_images(connection, crawler, output_file, workers=4, batch_size=100, refresh=False, crawl_all=False):
+    cursor = connection.cursor()
+    cursor.execute("SELECT name, image_url FROM dishes")
+    rows = cursor.fetchall()
+    cursor.close()
+
+    # 이미 올바른 이미지 URL 이 있는 반찬은 건너뜀
+    names = sorted({name for name, image_url in rows if crawl_all or not is_valid_image_url(image_url)})
+    logger.info(f"{len(names)} of {len(rows)} dishes need images")
 
-# CSV 파일 작성 및 데이터베이스 작업
-with open(output_file, mode="w", newline="", encoding="utf-8") as csvfile:
-    fieldnames = ["dish_name", "image_url"]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
+    # 건너뛴 반찬의 기존 결과가 사라지지 않도록 이번에 찾은 URL 을 기존 CSV 에 합쳐서 저장
+    images = read_image_csv(output_file)
+    updater = BatchUpdater(connection, batch_size)
+    for dish_name, image_url in crawler.crawl(names, workers, refresh):
+        if image_url:
+            updater.add(dish_name, image_url)
+            images[dish_name] = image_url
+        else:
+            logger.info(f"No image found for {dish_name}")
+    updater.flush()
+    write_image_csv(output_file, images)
+    return updater.updated
 
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Crawl dish images and update the dishes table")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1.0, help="requests per second")
+    parser.add_argument('--burst', type=int, default=2)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--cache-dir', default='data/image_cache')
+    parser.add_argument('--output', default='data/dish_images.csv')
+    parser.add_argument('--refresh', action='store_true', help="ignore cached search results")
+    parser.add_argument('--all', action='store_true', help="crawl dishes that already have a valid image_url")
+    args = parser.parse_args()
+
+    # 결과 저장 디렉토리
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    crawler = ImageCrawler(requests_fetcher(), CrawlCache(args.cache_dir), TokenBucket(args.rate, args.burst),
+                           retries=args.retries)
+
+    # MariaDB 연결 (풀에서 빌려 씀)
+    db_pool = pool_from_env(charset='utf8mb4')
+    db_connection = db_pool.acquire()
     try:
-        # 테이블에서 반찬 이름 가져오기
-        cursor.execute("SELECT name FROM dishes")
-        dish_names = cursor.fetchall()
-
-        # 각 반찬 이름에 대해 이미지 업데이트 및 CSV 저장
-        for dish in dish_names:
-            update_dish_image(dish[0], writer)
-            time.sleep(1)  # 요청 간 대기 시간
-    except pymysql.MySQLError as e:
-        print(f"Error fetching dishes from database: {e}")
-
-# DB 연결 종료
-cursor.close()
-db_connection.close()
-
-print(f"CSV file saved to: {output_file}")
+        started = time.perf_counter()
+        updated = update_dish_images(db_connection, crawler, args.output, args.workers, args.batch_size,
+                                     args.refresh, args.all)
+        logger.info(f"Updated {updated} dishes in {time.perf_counter() - started:.1f}s {crawler.counters}")
+    finally:
+        # DB 연결 종료
+        db_connection.close()
+        db_pool.close()
+
+    print(f"CSV file saved to: {args.output}")